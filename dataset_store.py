@@ -0,0 +1,269 @@
+import os
+import json
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# As in train_model.py; compiling a store needs only PIL and numpy
+EXPECTED_CLASSES = ["clean", "polluted"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+MANIFEST_NAME = "manifest.json"
+# How shard images were resized; stores written another way are rebuilt
+RESIZE_METHOD = "tf-bilinear"
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _bilinear_axis(out_size: int, in_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Source indices and weights along one axis, with half-pixel centers."""
+    src = (np.arange(out_size, dtype=np.float32) + 0.5) * np.float32(in_size / out_size) - 0.5
+    src = np.clip(src, 0, in_size - 1)
+    lower = np.floor(src).astype(np.int64)
+    upper = np.minimum(lower + 1, in_size - 1)
+    return lower, upper, (src - lower).astype(np.float32)
+
+
+def _load_resized(path: str, img_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Decoded and resized (no crop) to img_size (height, width) the way
+    train_model.make_dataset does: the full image, tf.image.resize's bilinear
+    (half-pixel centers, no antialiasing), rounded to uint8.
+    """
+    height, width = img_size
+    with Image.open(path) as img:
+        pixels = np.asarray(img.convert("RGB"), dtype=np.float32)
+    top, bottom, y_weight = _bilinear_axis(height, pixels.shape[0])
+    left, right, x_weight = _bilinear_axis(width, pixels.shape[1])
+    x_weight = x_weight[None, :, None]
+    upper_row = pixels[top][:, left] + (pixels[top][:, right] - pixels[top][:, left]) * x_weight
+    lower_row = pixels[bottom][:, left] + (pixels[bottom][:, right] - pixels[bottom][:, left]) * x_weight
+    resized = upper_row + (lower_row - upper_row) * y_weight[:, None, None]
+    return np.round(resized).astype(np.uint8)
+
+
+def scan_dataset(dataset_dir: str) -> Dict[str, int]:
+    """Relative path -> label (index of its class folder in sorted order)."""
+    class_names = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+    if set(class_names) != set(EXPECTED_CLASSES):
+        raise ValueError(f"Expected class folders 'clean' and 'polluted'. Found: {class_names}")
+    files = {}
+    for label, name in enumerate(class_names):
+        for f in sorted(os.listdir(os.path.join(dataset_dir, name))):
+            if f.lower().endswith(IMAGE_EXTENSIONS):
+                files[f"{name}/{f}"] = label
+    return files
+
+
+class DatasetStore:
+    """
+    The dataset decoded once into img_size uint8 shards (shard_NNNNN.npy, read
+    memory-mapped) plus manifest.json, which maps every source file to its
+    SHA-1, label and (shard, row).
+
+    compile() only decodes new or changed files; shards are never rewritten in
+    place. Rows of removed or changed files are dropped from the manifest, and
+    a shard less than half live has its live rows copied forward and is deleted.
+    """
+
+    def __init__(self, store_dir: str, img_size: Tuple[int, int] = (224, 224), shard_size: int = 512):
+        self.store_dir = store_dir
+        self.img_size = tuple(img_size)
+        self.shard_size = shard_size
+        self.files: Dict[str, Dict] = {}
+        self.shards: Dict[str, int] = {}
+        self.next_shard = 0
+        self._shard_cache: Dict[str, np.ndarray] = {}
+
+        manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.next_shard = manifest["next_shard"]
+            # A store compiled at another size or resize method is rebuilt from scratch by compile()
+            if tuple(manifest["img_size"]) == self.img_size and manifest.get("resize") == RESIZE_METHOD:
+                self.files = manifest["files"]
+                self.shards = manifest["shards"]
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def _shard_path(self, shard: str) -> str:
+        return os.path.join(self.store_dir, shard)
+
+    def _shard(self, shard: str) -> np.ndarray:
+        if shard not in self._shard_cache:
+            self._shard_cache[shard] = np.load(self._shard_path(shard), mmap_mode="r")
+        return self._shard_cache[shard]
+
+    def compile(self, dataset_dir: str) -> Dict[str, int]:
+        """
+        Brings the store up to date with dataset_dir and returns counts of
+        added, changed, unchanged, removed and carried-forward (compacted) images.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._shard_cache.clear()
+        sources = scan_dataset(dataset_dir)
+
+        stats = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0, "compacted": 0}
+        live: Dict[str, Dict] = {}
+        pending: List[Tuple[str, str, int, Optional[Tuple[str, int]]]] = []
+        for relpath, label in sources.items():
+            sha1 = _file_sha1(os.path.join(dataset_dir, relpath))
+            entry = self.files.get(relpath)
+            if entry is not None and entry["sha1"] == sha1 and entry["label"] == label:
+                live[relpath] = entry
+                stats["unchanged"] += 1
+            else:
+                pending.append((relpath, sha1, label, None))
+                stats["changed" if entry is not None else "added"] += 1
+        stats["removed"] = len(set(self.files) - set(sources))
+
+        # Copy the live rows of mostly dead shards forward, so removed images don't pile up on disk
+        live_rows: Dict[str, int] = {}
+        for entry in live.values():
+            live_rows[entry["shard"]] = live_rows.get(entry["shard"], 0) + 1
+        retired = [shard for shard, rows in self.shards.items() if live_rows.get(shard, 0) * 2 < rows]
+        for relpath, entry in list(live.items()):
+            if entry["shard"] in retired:
+                pending.append((relpath, entry["sha1"], entry["label"], (entry["shard"], entry["row"])))
+                del live[relpath]
+                stats["compacted"] += 1
+
+        shards = {shard: rows for shard, rows in self.shards.items() if shard not in retired}
+        for start in range(0, len(pending), self.shard_size):
+            chunk = pending[start:start + self.shard_size]
+            shard = f"shard_{self.next_shard:05d}.npy"
+            self.next_shard += 1
+            images = np.empty((len(chunk),) + self.img_size + (3,), dtype=np.uint8)
+            for row, (relpath, sha1, label, source) in enumerate(chunk):
+                if source is None:
+                    images[row] = _load_resized(os.path.join(dataset_dir, relpath), self.img_size)
+                else:
+                    images[row] = self._shard(source[0])[source[1]]
+                live[relpath] = {"sha1": sha1, "label": label, "shard": shard, "row": row}
+            np.save(self._shard_path(shard), images)
+            shards[shard] = len(chunk)
+
+        self.files = dict(sorted(live.items()))
+        self.shards = shards
+        self._write_manifest()
+
+        # Only once the manifest no longer points at them
+        self._shard_cache.clear()
+        for name in os.listdir(self.store_dir):
+            if name.startswith("shard_") and name.endswith(".npy") and name not in self.shards:
+                os.remove(self._shard_path(name))
+        return stats
+
+    def _write_manifest(self) -> None:
+        manifest = {"img_size": list(self.img_size), "resize": RESIZE_METHOD, "next_shard": self.next_shard,
+                    "shards": self.shards, "files": self.files}
+        tmp_path = os.path.join(self.store_dir, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.store_dir, MANIFEST_NAME))
+
+    def split(self, val_split: float) -> Tuple[List[str], List[str]]:
+        """(train ids, validation ids) split like train_model.list_split: per class, the first val_split fraction."""
+        train_ids, val_ids = [], []
+        for label in range(len(EXPECTED_CLASSES)):
+            ids = sorted(relpath for relpath, entry in self.files.items() if entry["label"] == label)
+            split = int(val_split * len(ids))
+            val_ids += ids[:split]
+            train_ids += ids[split:]
+        return train_ids, val_ids
+
+    def labels(self, ids: List[str]) -> np.ndarray:
+        return np.asarray([self.files[i]["label"] for i in ids], dtype=np.float32)
+
+    def images(self, ids: List[str]) -> np.ndarray:
+        """uint8 (N, H, W, 3) copy of the images, in ids order."""
+        out = np.empty((len(ids),) + self.img_size + (3,), dtype=np.uint8)
+        for n, i in enumerate(ids):
+            entry = self.files[i]
+            out[n] = self._shard(entry["shard"])[entry["row"]]
+        return out
+
+    def manifest_key(self, ids: List[str], *extra) -> str:
+        """Changes whenever one of the images or labels changes (content hashes, not mtimes)."""
+        entries = [[i, self.files[i]["sha1"], self.files[i]["label"]] for i in ids]
+        payload = json.dumps({"files": entries, "img_size": list(self.img_size), "resize": RESIZE_METHOD,
+                              "extra": list(extra)})
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def iter_examples(self, ids: List[str], seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, float]]:
+        """(image, label) pairs in ids order, or shuffled with seed."""
+        order = np.arange(len(ids))
+        if seed is not None:
+            np.random.default_rng(seed).shuffle(order)
+        for n in order:
+            entry = self.files[ids[n]]
+            yield self._shard(entry["shard"])[entry["row"]], float(entry["label"])
+
+    def as_dataset(self, ids: List[str], batch_size: int, training: bool, seed: int,
+                   augment: Optional[bool] = None):
+        """
+        tf.data pipeline over the shards, batched and scaled like
+        train_model.make_dataset; training reshuffles every epoch.
+        """
+        import tensorflow as tf
+        from train_model import finish_dataset
+
+        epochs = [0]
+
+        def generate():
+            shuffle_seed = None
+            if training:
+                shuffle_seed = seed + epochs[0]
+                epochs[0] += 1
+            yield from self.iter_examples(ids, shuffle_seed)
+
+        ds = tf.data.Dataset.from_generator(generate, output_signature=(
+            tf.TensorSpec(self.img_size + (3,), tf.uint8), tf.TensorSpec((), tf.float32)))
+        return finish_dataset(ds, batch_size, seed, training if augment is None else augment)
+
+    def representative_dataset(self, count: int = 200, seed: int = 0, ids: Optional[List[str]] = None):
+        """
+        Quantization calibration set for tf.lite.TFLiteConverter.representative_dataset:
+        count images drawn from ids (default: the whole store), scaled like predict.py.
+        """
+        ids = list(self.files) if ids is None else ids
+        rng = np.random.default_rng(seed)
+        chosen = [ids[i] for i in rng.choice(len(ids), size=min(count, len(ids)), replace=False)]
+
+        def generate():
+            for image, _ in self.iter_examples(chosen):
+                # mobilenet_v2.preprocess_input
+                yield [image[np.newaxis].astype(np.float32) / 127.5 - 1.0]
+
+        return generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile dataset_dir into pre-resized uint8 shards, re-processing only new or changed files")
+    parser.add_argument("--dataset_dir", type=str, default="dataset", help="Path with subfolders clean/ and polluted/")
+    parser.add_argument("--store_dir", type=str, default="dataset_store", help="Where the shards and manifest.json go")
+    parser.add_argument("--img_size", type=int, nargs=2, default=[224, 224], metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--shard_size", type=int, default=512, help="Images per shard file")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset_dir):
+        raise FileNotFoundError(f"Dataset directory not found: {args.dataset_dir}")
+
+    store = DatasetStore(args.store_dir, tuple(args.img_size), args.shard_size)
+    stats = store.compile(args.dataset_dir)
+    print(", ".join(f"{name}: {count}" for name, count in stats.items()))
+    print(f"{len(store)} images in {len(store.shards)} shards at {args.store_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import json
+import hashlib
+import argparse
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tensorflow.keras import layers, Model
+
+from predict import _load_model, _prepare_image
+from train_model import build_model, feature_extractor, pooling_index
+
+# A head is the Dense stack after the pooled features: [(kernel, bias, activation), ...]
+Head = List[Tuple[np.ndarray, np.ndarray, str]]
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "softmax": _softmax,
+}
+
+
+def split_model(model: Model) -> Tuple[Model, Head]:
+    """
+    Splits a train_model.build_model model into its backbone (image -> pooled
+    features) and its head. Dropout is a no-op at inference and is dropped.
+    """
+    pool = pooling_index(model)
+    backbone = feature_extractor(model)
+    head: Head = []
+    for layer in model.layers[pool + 1:]:
+        if isinstance(layer, layers.Dense):
+            kernel, bias = layer.get_weights()
+            head.append((kernel, bias, layer.get_config()["activation"]))
+        elif not isinstance(layer, layers.Dropout):
+            raise ValueError(f"Unsupported head layer {layer.name} ({type(layer).__name__}); only Dense and Dropout")
+    if not head:
+        raise ValueError("Model has no Dense layers after the pooled features")
+    return backbone, head
+
+
+def backbone_fingerprint(backbone: Model) -> str:
+    """Hash of the backbone weights; heads only fit features from the backbone they were trained on."""
+    digest = hashlib.sha1()
+    for weights in backbone.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+
+def save_head(path: str, head: Head, fingerprint: str, class_names: Optional[Sequence[str]] = None) -> None:
+    arrays = {}
+    for i, (kernel, bias, _) in enumerate(head):
+        arrays[f"kernel_{i}"] = kernel
+        arrays[f"bias_{i}"] = bias
+    meta = {"activations": [activation for _, _, activation in head], "fingerprint": fingerprint,
+            "class_names": list(class_names) if class_names else None}
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_head(path: str) -> Tuple[Head, str, Optional[List[str]]]:
+    """Returns (head, backbone fingerprint, class names) saved by save_head."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        head = [(data[f"kernel_{i}"], data[f"bias_{i}"], activation) for i, activation in enumerate(meta["activations"])]
+    return head, meta["fingerprint"], meta["class_names"]
+
+
+def apply_head(head: Head, features: np.ndarray) -> np.ndarray:
+    x = features
+    for kernel, bias, activation in head:
+        if activation not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported head activation: {activation}")
+        x = _ACTIVATIONS[activation](x @ kernel + bias)
+    return x
+
+
+class MultiHeadPredictor:
+    """
+    Runs the MobileNetV2 backbone once per image and evaluates every registered
+    head on the pooled features, so a shadow or extra head costs one Dense
+    layer instead of another CNN pass.
+
+    - backbone_path: model.h5 whose backbone is shared; None uses the frozen
+      ImageNet backbone of train_model.build_model (the one frozen-phase heads fit)
+    - cache_size: pooled feature vectors kept per image (LRU, keyed by path, size and mtime)
+
+    Extra heads come from train_model.py --head_output head.npz, which saves the
+    head as it was after the frozen phase; serve it with the default backbone:
+    multi_head.py --images a.jpg --head polluted=head.npz. Fine-tuning changes the
+    backbone, so a fine-tuned model.h5 is only usable as --backbone.
+    """
+
+    def __init__(self, backbone_path: Optional[str] = None, cache_size: int = 1024, batch_size: int = 32):
+        self.heads: Dict[str, Head] = OrderedDict()
+        self.class_names: Dict[str, Optional[List[str]]] = {}
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._features: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        if backbone_path is None:
+            self.backbone, _ = split_model(build_model(input_shape=(224, 224, 3)))
+        else:
+            self.backbone, head = split_model(_load_model(backbone_path))
+            self.heads[os.path.splitext(os.path.basename(backbone_path))[0]] = head
+        self.fingerprint = backbone_fingerprint(self.backbone)
+
+    def add_head(self, name: str, path: str, class_names: Optional[Sequence[str]] = None) -> None:
+        """
+        Registers a head from a build_model .h5 or a save_head .npz. Raises if its
+        backbone weights differ from the shared one (e.g. a fine-tuned model):
+        its features would not match.
+        """
+        if path.endswith(".npz"):
+            head, fingerprint, saved_names = load_head(path)
+            class_names = class_names or saved_names
+        else:
+            backbone, head = split_model(_load_model(path))
+            fingerprint = backbone_fingerprint(backbone)
+        if fingerprint != self.fingerprint:
+            raise ValueError(f"Head {name} was trained on a different backbone ({path}); "
+                             "only heads trained on the shared frozen backbone can reuse its features "
+                             "(save one with train_model.py --head_output)")
+        self.heads[name] = head
+        self.class_names[name] = list(class_names) if class_names else None
+
+    def _cache_key(self, image_path: str) -> Tuple:
+        stat = os.stat(image_path)
+        return os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns
+
+    def features(self, image_paths: Sequence[str]) -> np.ndarray:
+        """Pooled backbone features (N, 1280); only images missing from the cache are run."""
+        keys = [self._cache_key(path) for path in image_paths]
+        missing = [i for i, key in enumerate(keys) if key not in self._features]
+        self.cache_hits += len(keys) - len(missing)
+        self.cache_misses += len(missing)
+
+        computed = {}
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            batch = np.concatenate([_prepare_image(image_paths[i]) for i in chunk])
+            for i, vector in zip(chunk, self.backbone.predict(batch, verbose=0)):
+                computed[keys[i]] = vector
+
+        result = []
+        for key in keys:
+            vector = computed.get(key)
+            if vector is None:
+                vector = self._features[key]
+                self._features.move_to_end(key)
+            result.append(vector)
+        for key, vector in computed.items():
+            self._features[key] = vector
+        while len(self._features) > self.cache_size:
+            self._features.popitem(last=False)
+        return np.stack(result) if result else np.zeros((0, self.backbone.output_shape[-1]), dtype=np.float32)
+
+    def predict(self, image_paths: Sequence[str], heads: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Outputs of each head (default: all) for the images, from one backbone pass."""
+        features = self.features(image_paths)
+        return {name: apply_head(self.heads[name], features) for name in (heads or self.heads)}
+
+    def labels(self, name: str, outputs: np.ndarray) -> List[Tuple[str, float]]:
+        """(label, confidence) per image; single-unit heads are the clean/polluted sigmoid."""
+        if outputs.shape[-1] == 1:
+            probs = outputs.reshape(-1)
+            return [("polluted", float(p)) if p >= 0.5 else ("clean", 1.0 - float(p)) for p in probs]
+        names = self.class_names.get(name) or [str(i) for i in range(outputs.shape[-1])]
+        return [(names[int(row.argmax())], float(row.max())) for row in outputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score images with several heads on one shared MobileNetV2 backbone pass")
+    parser.add_argument("--images", nargs="+", required=True, help="Image files")
+    parser.add_argument("--backbone", default=None, help="Keras model (.h5) whose backbone and head are shared (default: frozen ImageNet backbone)")
+    parser.add_argument("--head", action="append", default=[], metavar="NAME=PATH",
+                        help="Extra head: a build_model .h5 or a head .npz (repeatable)")
+    parser.add_argument("--batch_size", type=int, default=32)
+    args = parser.parse_args()
+
+    predictor = MultiHeadPredictor(args.backbone, batch_size=args.batch_size)
+    for spec in args.head:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            raise ValueError(f"--head expects NAME=PATH, got {spec}")
+        predictor.add_head(name, path)
+    if not predictor.heads:
+        raise ValueError("No heads: pass --backbone with a trained model and/or --head")
+
+    outputs = predictor.predict(args.images)
+    for name, out in outputs.items():
+        for image_path, (label, conf) in zip(args.images, predictor.labels(name, out)):
+            print(f"{name}\t{image_path}\t{label}\t{round(conf, 4)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Admin API endpoints
+Token-protected diagnostics and operations: request profiling hook, stored
+profiles and the serving model version
+"""
+
+from flask import Blueprint, g, request, jsonify, make_response, send_file
+import os
+import hmac
+import logging
+from functools import wraps
+from typing import Callable, Optional
+
+from ..services.profiler import profile_store, request_profiler
+from ..services.model_manager import get_model_manager
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__)
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def is_admin_request() -> bool:
+    """True if the request carries the configured X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token')
+    return bool(ADMIN_TOKEN and token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(view):
+    """Reject requests without a valid admin token (all admin endpoints are off if ADMIN_TOKEN is unset)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled'}), 403
+        if not is_admin_request():
+            return jsonify({'error': 'Invalid admin token'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def profile_requested() -> bool:
+    """True if the request asks to be profiled: `X-Profile: 1` with a valid admin token"""
+    return request.headers.get('X-Profile') == '1' and is_admin_request()
+
+def profiled(view=None, *, runs_as_job: Optional[Callable[[], bool]] = None):
+    """
+    Profile the view with cProfile when asked to
+
+    A request is profiled if profile_requested(), or is picked by
+    PROFILE_SAMPLE_RATE. The profile id is returned in the X-Profile-Id response
+    header. Otherwise the view runs untouched.
+
+    For views that queue their work as a job, runs_as_job() tells whether this
+    request will. A sampled request that does runs unprofiled with
+    g.profile_job set, and the view asks the job handler to profile the work.
+    """
+    if view is None:
+        return lambda view: profiled(view, runs_as_job=runs_as_job)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        flagged = profile_requested()
+        if not flagged and not request_profiler.should_sample():
+            return view(*args, **kwargs)
+        if not flagged and runs_as_job is not None and runs_as_job():
+            g.profile_job = True
+            return view(*args, **kwargs)
+
+        metadata = {
+            'endpoint': request.url_rule.rule if request.url_rule is not None else request.path,
+            'method': request.method,
+            'trigger': 'header' if flagged else 'sample'
+        }
+        response, profile_id = request_profiler.run(view, metadata, *args, **kwargs)
+        if profile_id:
+            response = make_response(response)
+            response.headers['X-Profile-Id'] = profile_id
+            logger.info(f"Profiled {metadata['method']} {metadata['endpoint']}: {profile_id}")
+        return response
+    return wrapper
+
+@admin_bp.route('/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    """List recent request profiles, newest first"""
+    profiles = profile_store.list()
+    return jsonify({'profiles': profiles, 'count': len(profiles)})
+
+@admin_bp.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """Get a profile summary with its top functions by cumulative time"""
+    summary = profile_store.get(profile_id)
+    if not summary:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(summary)
+
+@admin_bp.route('/admin/profiles/<profile_id>/download', methods=['GET'])
+@require_admin
+def download_profile(profile_id):
+    """Download the pstats dump (open with pstats or snakeviz)"""
+    path = profile_store.pstats_path(profile_id)
+    if not path:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"{profile_id}.prof")
+
+@admin_bp.route('/admin/model', methods=['GET'])
+@require_admin
+def get_model_status():
+    """Serving model version, versions still draining, and the last version check"""
+    return jsonify(get_model_manager().status())
+
+@admin_bp.route('/admin/model/refresh', methods=['POST'])
+@require_admin
+def refresh_model():
+    """
+    Check the active ModelVersion now instead of waiting for the next poll
+
+    Loads and warms up a changed version before answering. Other worker
+    processes pick it up on their next poll (MODEL_POLL_SECONDS).
+    """
+    manager = get_model_manager()
+    swapped = manager.refresh()
+    return jsonify(dict(manager.status(), swapped=swapped))
+
+@admin_bp.route('/admin/model/versions/<version>/activate', methods=['POST'])
+@require_admin
+def activate_model_version(version):
+    """
+    Load and warm up a ModelVersion in this process, then mark it the only active
+    one and swap to it. If it fails to load, the active version is unchanged.
+    """
+    manager = get_model_manager()
+    try:
+        swapped = manager.activate(version)
+    except LookupError:
+        return jsonify({'error': 'Model version not found'}), 404
+    except Exception as e:
+        logger.error(f"Error activating model version {version}: {str(e)}")
+        return jsonify(dict(manager.status(), error='Model version failed to load; active version unchanged')), 500
+    return jsonify(dict(manager.status(), swapped=swapped))
@@ -0,0 +1,183 @@
+"""
+Async satellite API endpoints (ASGI)
+Served by asgi.py in front of the Flask app: fetch and analyze await the
+providers and the blocking pool instead of pinning a worker per request
+"""
+
+import time
+import logging
+from datetime import datetime
+from functools import wraps
+from typing import Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from ..services.admission import admission_controller, client_key, AsyncConcurrencyLimiter, Rejected
+from ..services.image_sizes import resolve_output_size
+from .jobs import job_service, JOB_QUEUE_RETRY_AFTER
+from .middleware import record_request
+
+logger = logging.getLogger(__name__)
+
+def async_endpoint(rule: str, name: str, max_concurrent: int, max_queue: int,
+                   exempt: Optional[Callable[[Request], Awaitable[bool]]] = None):
+    """
+    Admission control and request timing for an async handler
+
+    Limits come from ADMISSION_<NAME>_CONCURRENCY/_QUEUE as for the Flask
+    endpoints; the per-client token buckets are the same ones. Requests for
+    which exempt() is true are only charged to the token bucket, as with
+    admission_controlled.
+    """
+    def decorator(handler):
+        admission_controller.limiter(name, max_concurrent, max_queue, limiter_class=AsyncConcurrencyLimiter)
+
+        @wraps(handler)
+        async def wrapper(request: Request):
+            started = time.perf_counter()
+            remote_addr = request.client.host if request.client else None
+            client = client_key(request.headers, remote_addr)
+            limiter = None
+            try:
+                if exempt is not None and await exempt(request):
+                    admission_controller.charge(name, client)
+                else:
+                    limiter = await admission_controller.admit_async(name, client)
+            except Rejected as e:
+                logger.warning(f"Shed {request.method} {request.url.path} ({e.reason}, retry after {e.retry_after}s)")
+                response = JSONResponse(e.to_dict(), status_code=e.status,
+                                        headers={'Retry-After': str(e.retry_after)})
+            else:
+                admitted = time.perf_counter()
+                try:
+                    response = await handler(request)
+                finally:
+                    if limiter is not None:
+                        await limiter.release_async(time.perf_counter() - admitted)
+
+            record_request(rule, request.method, response.status_code, (time.perf_counter() - started) * 1000,
+                           request.headers.get('user-agent'), remote_addr)
+            return response
+        return wrapper
+    return decorator
+
+async def _runs_as_job(request: Request) -> bool:
+    """True if this fetch is queued as a job (the default) rather than awaited in the request"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return False
+    return isinstance(data, dict) and bool(data.get('async', True))
+
+@async_endpoint('/api/satellite/fetch', 'fetch_async', max_concurrent=256, max_queue=512, exempt=_runs_as_job)
+async def fetch_satellite_image(request: Request):
+    """
+    Fetch satellite image for given coordinates and date
+
+    Same payload and responses as the Flask endpoint. With "async": false the
+    provider fetch is awaited, so waiting on it costs no thread. Queued fetches
+    (the default) run like the Flask ones: on JobService's thread pool, through
+    the blocking SatelliteService.
+    """
+    try:
+        data = await request.json()
+
+        # Validate required fields
+        required_fields = ['latitude', 'longitude']
+        for field in required_fields:
+            if field not in data:
+                return JSONResponse({'error': f'Missing required field: {field}'}, status_code=400)
+
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+        date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
+        consumer = data.get('consumer')
+
+        try:
+            width, height = resolve_output_size(consumer)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        if data.get('async', True):
+            job_id = await run_in_threadpool(job_service.submit, 'satellite_fetch', {
+                'latitude': latitude,
+                'longitude': longitude,
+                'date': date,
+                'consumer': consumer
+            })
+            if not job_id:
+                return JSONResponse({'error': 'Job queue is full, retry later', 'retry_after': JOB_QUEUE_RETRY_AFTER},
+                                    status_code=503, headers={'Retry-After': str(JOB_QUEUE_RETRY_AFTER)})
+
+            logger.info(f"Queued satellite fetch job {job_id} for coordinates: {latitude}, {longitude}")
+            return JSONResponse({
+                'success': True,
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/api/jobs/{job_id}'
+            }, status_code=202, headers={'Location': f'/api/jobs/{job_id}'})
+
+        logger.info(f"Fetching satellite image for coordinates: {latitude}, {longitude}")
+
+        satellite = request.app.state.satellite
+        image_path = await satellite.fetch_satellite_image(latitude, longitude, date, consumer=consumer)
+
+        if not image_path:
+            return JSONResponse({
+                'error': 'Unable to fetch satellite imagery for this location',
+                'latitude': latitude,
+                'longitude': longitude,
+                'date': date
+            }, status_code=503)
+
+        image_id = await satellite.image_id_for(image_path)
+        return JSONResponse({
+            'success': True,
+            'image_path': image_path,
+            'image_id': image_id,
+            'image_url': f'/api/satellite/images/{image_id}' if image_id is not None else None,
+            'output_size': f"{width}x{height}",
+            'latitude': latitude,
+            'longitude': longitude,
+            'date': date,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Satellite fetch error: {str(e)}")
+        return JSONResponse({'error': 'Failed to fetch satellite image'}, status_code=500)
+
+@async_endpoint('/api/satellite/analyze', 'analyze_async', max_concurrent=8, max_queue=16)
+async def analyze_satellite_image(request: Request):
+    """Analyze satellite image for pollution detection (decoding runs on the blocking pool)"""
+    try:
+        data = await request.json()
+
+        if 'image_path' not in data:
+            return JSONResponse({'error': 'Missing required field: image_path'}, status_code=400)
+
+        image_path = data['image_path']
+        pollution_type = data.get('pollution_type', 'general')
+
+        logger.info(f"Analyzing satellite image: {image_path}")
+
+        analysis_result = await request.app.state.satellite.analyze_image(image_path, pollution_type)
+
+        return JSONResponse({
+            'success': True,
+            'analysis': analysis_result,
+            'image_path': image_path,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Satellite analysis error: {str(e)}")
+        return JSONResponse({'error': 'Failed to analyze satellite image'}, status_code=500)
+
+routes = [
+    Route('/api/satellite/fetch', fetch_satellite_image, methods=['POST']),
+    Route('/api/satellite/analyze', analyze_satellite_image, methods=['POST'])
+]
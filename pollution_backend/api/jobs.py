@@ -0,0 +1,108 @@
+"""
+Job API endpoints
+Submit background jobs and poll or long-poll their status
+"""
+
+from flask import Blueprint, request, jsonify
+import os
+import logging
+
+from ..services.job_service import JobService
+from ..services.verification_service import VerificationService
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs', __name__)
+job_service = JobService()
+
+JOB_MAX_WAIT_SECONDS = float(os.getenv('JOB_MAX_WAIT_SECONDS', 60))
+# Retry-After sent with 503 when JOB_QUEUE_LIMIT jobs are already pending
+JOB_QUEUE_RETRY_AFTER = int(os.getenv('JOB_QUEUE_RETRY_AFTER', 5))
+
+verification_service = VerificationService()
+
+def _verify_reports(report_ids):
+    """Job handler: verify a batch of reports"""
+    return verification_service.verify_reports(report_ids)
+
+def _rescore_verifications(confidence_threshold=None, category_match_threshold=None, dry_run=False):
+    """
+    Job handler: re-evaluate stored verifications under new thresholds
+
+    Runs on its own VerificationService, so the live thresholds are unchanged.
+    """
+    return VerificationService().rescore_history(confidence_threshold, category_match_threshold, dry_run=dry_run)
+
+job_service.register('verify_reports', _verify_reports)
+job_service.register('rescore_verifications', _rescore_verifications)
+
+def job_accepted_response(job_id: str):
+    """Build the 202 response returned for a newly queued job"""
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
+
+def job_queue_full_response():
+    """Build the 503 returned when the job queue is full"""
+    response = jsonify({'error': 'Job queue is full, retry later', 'retry_after': JOB_QUEUE_RETRY_AFTER})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(JOB_QUEUE_RETRY_AFTER)
+    return response
+
+@jobs_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit a background job
+
+    Expected JSON payload:
+    {
+        "kind": "verify_reports",
+        "params": {"report_ids": [1, 2, 3]}
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        kind = data.get('kind')
+        params = data.get('params', {})
+
+        if not kind or not job_service.has_handler(kind):
+            return jsonify({'error': f'Unknown job kind: {kind}'}), 400
+        if not isinstance(params, dict):
+            return jsonify({'error': 'params must be an object'}), 400
+
+        job_id = job_service.submit(kind, params)
+        if not job_id:
+            return job_queue_full_response()
+
+        return job_accepted_response(job_id)
+
+    except Exception as e:
+        logger.error(f"Job submit error: {str(e)}")
+        return jsonify({'error': 'Failed to submit job'}), 500
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get job status
+
+    Query parameters:
+        wait: seconds to long-poll for completion (capped by JOB_MAX_WAIT_SECONDS)
+    """
+    try:
+        wait = min(max(request.args.get('wait', 0, type=float), 0), JOB_MAX_WAIT_SECONDS)
+        job = job_service.wait_for_job(job_id, wait) if wait else job_service.get_job(job_id)
+
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify(job)
+
+    except Exception as e:
+        logger.error(f"Job status error: {str(e)}")
+        return jsonify({'error': 'Failed to get job status'}), 500
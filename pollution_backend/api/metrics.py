@@ -0,0 +1,55 @@
+"""
+Metrics API endpoints
+Per-endpoint latency quantiles and admission control state for this worker
+process, and the Prometheus scrape endpoint
+"""
+
+from flask import Blueprint, Response, jsonify
+import os
+import logging
+from datetime import datetime
+
+from ..services.request_metrics import latency_registry, get_usage_queue
+from ..services.stage_metrics import render_metrics
+from ..services.admission import admission_controller
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Registered without the /api prefix: scrapers expect GET /metrics
+prometheus_bp = Blueprint('prometheus', __name__)
+
+@prometheus_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage histograms and cache counters in the Prometheus text format"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@metrics_bp.route('/metrics/latency', methods=['GET'])
+def get_latency_metrics():
+    """
+    Get p50/p90/p99 response times per endpoint
+
+    Quantiles come from a streaming sketch (1% relative error) and cover the
+    requests served by this worker process since it started.
+    """
+    return jsonify({
+        'endpoints': latency_registry.summary(),
+        'since': latency_registry.started_at.isoformat(),
+        'pid': os.getpid(),
+        'usage_writer': get_usage_queue().stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@metrics_bp.route('/metrics/admission', methods=['GET'])
+def get_admission_metrics():
+    """
+    Get in-flight requests, queue depth and shed counts per admission-controlled
+    endpoint, and per-client rate limiting totals, for this worker process
+    """
+    return jsonify(dict(
+        admission_controller.stats(),
+        pid=os.getpid(),
+        timestamp=datetime.now().isoformat()
+    ))
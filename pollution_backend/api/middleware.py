@@ -0,0 +1,101 @@
+"""
+Request middleware
+Records endpoint, method, status and response time for every request without
+touching the database on the request path, and applies admission control to
+expensive endpoints
+"""
+
+import os
+import time
+import logging
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import g, request, jsonify
+
+from ..services.request_metrics import latency_registry, get_usage_queue
+from ..services.admission import admission_controller, client_key, Rejected
+from ..services.stage_metrics import HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+API_USAGE_TRACKING = os.getenv('API_USAGE_TRACKING', 'True').lower() == 'true'
+
+def init_request_timing(app):
+    """Register the timing hooks on the Flask app"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+
+        # Route templates keep cardinality bounded (/api/jobs/<job_id>, not every id)
+        endpoint = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        record_request(endpoint, request.method, response.status_code, (time.perf_counter() - started) * 1000,
+                       request.user_agent.string, request.remote_addr)
+
+        return response
+
+def record_request(endpoint: str, method: str, status_code: int, response_time_ms: float,
+                   user_agent: str = None, ip_address: str = None):
+    """Record one served request in the latency sketch, Prometheus and (buffered) api_usage"""
+    latency_registry.record(method, endpoint, response_time_ms)
+    HTTP_REQUEST_SECONDS.labels(endpoint, method).observe(response_time_ms / 1000)
+
+    if API_USAGE_TRACKING:
+        # Buffered; a background thread bulk-inserts into api_usage
+        get_usage_queue().enqueue({
+            'endpoint': endpoint[:100],
+            'method': method,
+            'response_time_ms': response_time_ms,
+            'status_code': status_code,
+            'user_agent': (user_agent or '')[:500] or None,
+            'ip_address': ip_address,
+            'timestamp': datetime.utcnow()
+        })
+
+def admission_controlled(name: str, max_concurrent: int, max_queue: int,
+                         exempt: Optional[Callable[[], bool]] = None):
+    """
+    Limit a view to max_concurrent requests per worker process with up to
+    max_queue more waiting, and charge each request to the client's token bucket
+
+    Requests for which exempt() is true are only charged to the token bucket,
+    e.g. ones the view hands to the job queue, which has its own bound.
+    Rejected requests get 429 (client over its rate) or 503 (endpoint saturated)
+    with a Retry-After header, without running the view.
+    """
+    def decorator(view):
+        admission_controller.limiter(name, max_concurrent, max_queue)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            client = client_key(request.headers, request.remote_addr)
+            limiter = None
+            try:
+                if exempt is not None and exempt():
+                    admission_controller.charge(name, client)
+                else:
+                    limiter = admission_controller.admit(name, client)
+            except Rejected as e:
+                logger.warning(f"Shed {request.method} {request.path} ({e.reason}, retry after {e.retry_after}s)")
+                response = jsonify(e.to_dict())
+                response.status_code = e.status
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            if limiter is None:
+                return view(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release(time.perf_counter() - started)
+        return wrapper
+    return decorator
@@ -3,18 +3,87 @@ Satellite data API endpoints
 Handles satellite imagery fetching and processing
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify, Response, send_file, stream_with_context
+import os
+import json
 import logging
+import threading
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from ..services.satellite_service import SatelliteService
+from ..services.satellite_service import get_satellite_service, analyze_image_file
+from ..services.image_sizes import resolve_output_size
+from ..services.profiler import request_profiler
+from .jobs import job_service, job_accepted_response, job_queue_full_response
+from .admin import profiled, profile_requested
+from .middleware import admission_controlled
 
 logger = logging.getLogger(__name__)
 
 satellite_bp = Blueprint('satellite', __name__)
-satellite_service = SatelliteService()
+
+# Batch analysis runs in a bounded process pool so numpy/PIL work is not serialized by the GIL
+ANALYZE_BATCH_WORKERS = int(os.getenv('ANALYZE_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+ANALYZE_BATCH_MAX_PATHS = int(os.getenv('ANALYZE_BATCH_MAX_PATHS', 500))
+
+# Browser/CDN cache lifetime for served images; the ETag covers revalidation after that
+SATELLITE_IMAGE_MAX_AGE = int(os.getenv('SATELLITE_IMAGE_MAX_AGE', 86400))
+
+def _image_reference(image_path: str) -> dict:
+    """id and URL the frontend uses to load a cached image"""
+    image_id = get_satellite_service().cache.image_id_for(image_path)
+    return {
+        'image_id': image_id,
+        'image_url': f'/api/satellite/images/{image_id}' if image_id is not None else None
+    }
+
+def _fetch(latitude: float, longitude: float, date: str, consumer: str = None):
+    """Fetch a satellite image through the provider chain; raises if every provider fails"""
+    image_path = get_satellite_service().fetch_satellite_image(latitude, longitude, date, consumer=consumer)
+    if not image_path:
+        raise RuntimeError('Unable to fetch satellite imagery for this location')
+    return dict(_image_reference(image_path), image_path=image_path,
+                latitude=latitude, longitude=longitude, date=date)
+
+def _fetch_job(latitude: float, longitude: float, date: str, consumer: str = None, profile: bool = False):
+    """
+    Job handler: fetch a satellite image through the provider chain
+
+    profile is set for fetches picked by PROFILE_SAMPLE_RATE; the profile id is
+    added to the job result.
+    """
+    if not profile:
+        return _fetch(latitude, longitude, date, consumer)
+
+    metadata = {'endpoint': '/api/satellite/fetch', 'method': 'POST', 'trigger': 'sample', 'job_kind': 'satellite_fetch'}
+    result, profile_id = request_profiler.run(_fetch, metadata, latitude, longitude, date, consumer)
+    return dict(result, profile_id=profile_id) if profile_id else result
+
+def _runs_as_job() -> bool:
+    """
+    True if this fetch is queued as a job (the default) rather than run in the
+    request: "async": false, or an explicit profile request, runs it inline
+    """
+    data = request.get_json(silent=True) or {}
+    return bool(data.get('async', True)) and not profile_requested()
+
+job_service.register('satellite_fetch', _fetch_job)
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """Get the shared analysis process pool, creating it on first use"""
+    global _analysis_pool
+    if _analysis_pool is None:
+        with _analysis_pool_lock:
+            if _analysis_pool is None:
+                _analysis_pool = ProcessPoolExecutor(max_workers=ANALYZE_BATCH_WORKERS)
+    return _analysis_pool
 
 @satellite_bp.route('/satellite/fetch', methods=['POST'])
+@admission_controlled('fetch', max_concurrent=4, max_queue=8, exempt=_runs_as_job)
+@profiled(runs_as_job=_runs_as_job)
 def fetch_satellite_image():
     """
     Fetch satellite image for given coordinates and date
@@ -23,8 +92,19 @@ def fetch_satellite_image():
     {
         "latitude": 40.7128,
         "longitude": -74.0060,
-        "date": "2025-01-20"
+        "date": "2025-01-20",
+        "consumer": "classifier",
+        "async": true
     }
+    
+    consumer selects the output size from the image size registry
+    ('classifier', 'heatmap', 'analysis' or 'preview').
+    
+    By default the fetch runs as a background job and the response is
+    202 with a job id to poll at /api/jobs/<job_id>. Pass "async": false
+    to block until the image is fetched. A request sent with X-Profile always
+    blocks, so its profile covers the provider chain rather than the job
+    submission; a sampled request is profiled inside its job.
     """
     try:
         data = request.get_json()
@@ -38,11 +118,33 @@ def fetch_satellite_image():
         latitude = float(data['latitude'])
         longitude = float(data['longitude'])
         date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
+        consumer = data.get('consumer')
+        
+        try:
+            width, height = resolve_output_size(consumer)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if _runs_as_job():
+            params = {
+                'latitude': latitude,
+                'longitude': longitude,
+                'date': date,
+                'consumer': consumer
+            }
+            if g.get('profile_job'):
+                params['profile'] = True
+            job_id = job_service.submit('satellite_fetch', params)
+            if not job_id:
+                return job_queue_full_response()
+            
+            logger.info(f"Queued satellite fetch job {job_id} for coordinates: {latitude}, {longitude}")
+            return job_accepted_response(job_id)
         
         logger.info(f"Fetching satellite image for coordinates: {latitude}, {longitude}")
         
         # Fetch satellite image
-        image_path = satellite_service.fetch_satellite_image(latitude, longitude, date)
+        image_path = get_satellite_service().fetch_satellite_image(latitude, longitude, date, consumer=consumer)
         
         if not image_path:
             return jsonify({
@@ -55,6 +157,8 @@ def fetch_satellite_image():
         return jsonify({
             'success': True,
             'image_path': image_path,
+            **_image_reference(image_path),
+            'output_size': f"{width}x{height}",
             'latitude': latitude,
             'longitude': longitude,
             'date': date,
@@ -66,6 +170,8 @@ def fetch_satellite_image():
         return jsonify({'error': 'Failed to fetch satellite image'}), 500
 
 @satellite_bp.route('/satellite/analyze', methods=['POST'])
+@admission_controlled('analyze', max_concurrent=8, max_queue=16)
+@profiled
 def analyze_satellite_image():
     """
     Analyze satellite image for pollution detection
@@ -88,7 +194,7 @@ def analyze_satellite_image():
         logger.info(f"Analyzing satellite image: {image_path}")
         
         # Analyze satellite image
-        analysis_result = satellite_service.analyze_image(image_path, pollution_type)
+        analysis_result = get_satellite_service().analyze_image(image_path, pollution_type)
         
         return jsonify({
             'success': True,
@@ -101,11 +207,99 @@ def analyze_satellite_image():
         logger.error(f"Satellite analysis error: {str(e)}")
         return jsonify({'error': 'Failed to analyze satellite image'}), 500
 
+@satellite_bp.route('/satellite/analyze/batch', methods=['POST'])
+def analyze_satellite_images_batch():
+    """
+    Analyze many satellite images in parallel, streaming results as NDJSON
+    
+    Expected JSON payload:
+    {
+        "image_paths": ["/path/to/a.jpg", "/path/to/b.jpg"],
+        "pollution_type": "plastic_pollution"
+    }
+    
+    Each response line is one JSON object, emitted in completion order:
+    {"index": 0, "image_path": "...", "success": true, "analysis": {...}}
+    """
+    data = request.get_json(silent=True) or {}
+    image_paths = data.get('image_paths')
+    
+    if not isinstance(image_paths, list) or not image_paths:
+        return jsonify({'error': 'Missing required field: image_paths (non-empty list)'}), 400
+    if len(image_paths) > ANALYZE_BATCH_MAX_PATHS:
+        return jsonify({'error': f'Too many image_paths (max {ANALYZE_BATCH_MAX_PATHS})'}), 413
+    
+    pollution_type = data.get('pollution_type', 'general')
+    logger.info(f"Analyzing batch of {len(image_paths)} satellite images")
+    
+    try:
+        pool = get_analysis_pool()
+        futures = {
+            pool.submit(analyze_image_file, path, pollution_type): (index, path)
+            for index, path in enumerate(image_paths)
+        }
+    except Exception as e:
+        logger.error(f"Satellite batch analysis error: {str(e)}")
+        return jsonify({'error': 'Failed to analyze satellite images'}), 500
+    
+    def generate():
+        try:
+            for future in as_completed(futures):
+                index, path = futures[future]
+                try:
+                    analysis = future.result()
+                    line = {
+                        'index': index,
+                        'image_path': path,
+                        'success': 'error' not in analysis,
+                        'analysis': analysis
+                    }
+                except Exception as e:
+                    logger.error(f"Satellite batch analysis error for {path}: {str(e)}")
+                    line = {'index': index, 'image_path': path, 'success': False, 'error': str(e)}
+                yield json.dumps(line) + '\n'
+        finally:
+            # Client went away: drop work that has not started yet
+            for future in futures:
+                future.cancel()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@satellite_bp.route('/satellite/images/<int:image_id>', methods=['GET'])
+def get_satellite_image(image_id):
+    """
+    Serve a cached satellite image
+    
+    The file is streamed by the WSGI server (sendfile under gunicorn, or X-Sendfile
+    when USE_X_SENDFILE is set). The response has a strong ETag (the content sha256)
+    and Cache-Control. It answers If-None-Match with 304 and Range with 206.
+    """
+    try:
+        image = get_satellite_service().cache.get_image(image_id)
+        if not image:
+            return jsonify({'error': 'Image not found'}), 404
+        
+        return send_file(
+            os.path.abspath(image['image_path']),
+            mimetype='image/jpeg',
+            conditional=True,
+            etag=image['content_hash'],
+            last_modified=image['timestamp'],
+            max_age=SATELLITE_IMAGE_MAX_AGE
+        )
+        
+    except FileNotFoundError:
+        # Evicted between the lookup and the read
+        return jsonify({'error': 'Image not found'}), 404
+    except Exception as e:
+        logger.error(f"Satellite image serving error: {str(e)}")
+        return jsonify({'error': 'Failed to serve satellite image'}), 500
+
 @satellite_bp.route('/satellite/health', methods=['GET'])
 def satellite_health():
     """Check satellite service health"""
     try:
-        health_status = satellite_service.check_health()
+        health_status = get_satellite_service().check_health()
         return jsonify(health_status)
     except Exception as e:
         logger.error(f"Satellite health check error: {str(e)}")
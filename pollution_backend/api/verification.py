@@ -0,0 +1,77 @@
+"""
+Verification API endpoints
+Verification history, exports and dashboard statistics
+"""
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import logging
+from datetime import datetime
+
+from ..services.verification_service import VerificationService
+from ..services.history_export import EXPORT_FORMATS, EXPORT_WRITERS, parquet_available
+
+logger = logging.getLogger(__name__)
+
+verification_bp = Blueprint('verification', __name__)
+verification_service = VerificationService()
+
+MAX_PAGE_SIZE = 1000
+
+@verification_bp.route('/verification/history', methods=['GET'])
+def get_verification_history():
+    """
+    Get verification history, newest first
+
+    Query parameters:
+        limit: page size (default 100, max 1000)
+        cursor: next_cursor from the previous page
+    """
+    try:
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+
+        try:
+            page = verification_service.get_verification_page(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify(page)
+
+    except Exception as e:
+        logger.error(f"Verification history error: {str(e)}")
+        return jsonify({'error': 'Failed to get verification history'}), 500
+
+@verification_bp.route('/verification/export', methods=['GET'])
+def export_verification_history():
+    """
+    Stream the full verification history, oldest first
+
+    Query parameters:
+        format: ndjson (default), csv or parquet (requires pyarrow)
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Parquet export requires pyarrow to be installed'}), 400
+
+    logger.info(f"Exporting verification history as {export_format}")
+
+    rows = verification_service.iter_verification_history()
+    chunks = EXPORT_WRITERS[export_format](rows)
+    filename = f"verification_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@verification_bp.route('/verification/stats', methods=['GET'])
+def get_verification_stats():
+    """Get verification statistics for the dashboard"""
+    stats = verification_service.get_verification_stats()
+    if 'error' in stats:
+        return jsonify(stats), 500
+    return jsonify(stats)
@@ -6,32 +6,75 @@ Flask API for satellite image verification and CNN-based pollution classificatio
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
+import sys
 from dotenv import load_dotenv
 import logging
 
 # Load environment variables
 load_dotenv()
 
+# The api/services/database modules use package-relative imports, so import them
+# through the pollution_backend package (also when started from this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Import modules
-from api.satellite import satellite_bp
-from database.connection import init_db
+from pollution_backend.api.satellite import satellite_bp
+from pollution_backend.api.jobs import jobs_bp, job_service
+from pollution_backend.api.verification import verification_bp
+from pollution_backend.api.metrics import metrics_bp, prometheus_bp
+from pollution_backend.api.admin import admin_bp
+from pollution_backend.api.middleware import init_request_timing
+from pollution_backend.services.model_manager import get_model_manager
+from pollution_backend.database.connection import (
+    DB_INIT_BACKGROUND, init_db, init_db_background, init_app as init_db_app, db_status, get_pool_stats
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
-    """Create and configure Flask application"""
+def create_app(recover_jobs: bool = True, start_model_poller: bool = True):
+    """
+    Create and configure Flask application
+    
+    Args:
+        recover_jobs: Re-queue unfinished jobs once the database is ready. A preloading
+                      server passes False and recovers in each worker after fork instead.
+        start_model_poller: Start following the active ModelVersion now. Gunicorn passes
+                            False and starts it in each worker (post_worker_init).
+    """
     app = Flask(__name__)
     
     # Enable CORS for frontend integration
     CORS(app)
     
+    # Let a front server that supports X-Sendfile send image files itself
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'False').lower() == 'true'
+    
     # Register blueprints
     app.register_blueprint(satellite_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(verification_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(prometheus_bp)
+    app.register_blueprint(admin_bp, url_prefix='/api')
     
-    # Initialize database
-    init_db()
+    # Time every request; usage rows are written in the background
+    init_request_timing(app)
+    
+    # Initialize database, then resume jobs interrupted by a restart.
+    # In the background by default, so the app can answer /health immediately
+    on_ready = job_service.recover_jobs if recover_jobs else None
+    if DB_INIT_BACKGROUND:
+        init_db_background(on_ready=on_ready)
+    else:
+        init_db()
+        if on_ready:
+            on_ready()
+    init_db_app(app)
+    
+    if start_model_poller:
+        get_model_manager().start_poller()
     
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -39,9 +82,17 @@ def create_app():
         return jsonify({
             'status': 'healthy',
             'service': 'pollution-verification-backend',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'database': db_status(),
+            'database_pool': get_pool_stats()
         })
     
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        """Readiness probe: 200 once the database is initialized"""
+        status = db_status()
+        return jsonify({'ready': status == 'ready', 'database': status}), 200 if status == 'ready' else 503
+    
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Endpoint not found'}), 404
@@ -0,0 +1,48 @@
+"""
+ASGI entry point
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+POST /api/satellite/fetch and /api/satellite/analyze are served by async
+handlers, so one process holds hundreds of provider fetches in flight without a
+thread each. Every other route is the Flask app, mounted through a WSGI adapter.
+"""
+
+import os
+import logging
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+
+from app import create_app
+from pollution_backend.api.async_satellite import routes
+from pollution_backend.database.connection import wait_for_db, DB_READY_TIMEOUT
+from pollution_backend.services.async_satellite_service import AsyncSatelliteService
+
+logger = logging.getLogger(__name__)
+
+# Threads serving the mounted Flask routes
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 10))
+
+flask_app = create_app()
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if not await run_in_threadpool(wait_for_db, DB_READY_TIMEOUT):
+        logger.error("Database was not ready at startup; async endpoints may fail until it is")
+    app.state.satellite = AsyncSatelliteService()
+    try:
+        yield
+    finally:
+        await app.state.satellite.aclose()
+
+app = Starlette(
+    routes=routes + [Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))],
+    # Flask-CORS only covers the mounted routes; this covers the async ones too
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
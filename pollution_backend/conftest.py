@@ -0,0 +1,46 @@
+"""
+Shared pytest fixtures
+Points the app at a throwaway SQLite database and cache directory before any
+pollution_backend module reads its configuration
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix='pollution-backend-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['SATELLITE_CACHE_DIR'] = os.path.join(_workdir, 'satellite_images')
+os.environ['DB_INIT_BACKGROUND'] = 'False'
+os.environ['MODEL_POLL_SECONDS'] = '0'
+os.environ['API_USAGE_TRACKING'] = 'False'
+
+# Same as app.py: the api/services/database modules import through the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app(recover_jobs=False, start_model_poller=False)
+    app.config['TESTING'] = True
+    yield app
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def db(app):
+    """Empty tables for each test"""
+    from pollution_backend.database.connection import Base, engine
+    from pollution_backend.services.verification_service import invalidate_stats_cache
+
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    invalidate_stats_cache()
+    yield
@@ -4,8 +4,12 @@ Supports PostgreSQL, MySQL, and SQLite
 """
 
 import os
+import time
 import logging
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 from contextlib import contextmanager
@@ -26,13 +30,75 @@ elif DATABASE_TYPE == 'mysql':
 else:  # SQLite (default)
     DATABASE_URL = DATABASE_URL or "sqlite:///./pollution_verification.db"
 
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 300))
+
+# SQLite tuning
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+class PoolMetrics:
+    """Time spent waiting to check a connection out of the pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+pool_metrics = PoolMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record(time.perf_counter() - started)
+
+_url = make_url(DATABASE_URL)
+_is_sqlite = _url.get_backend_name() == 'sqlite'
+_is_sqlite_memory = _is_sqlite and _url.database in (None, '', ':memory:')
+
+engine_options = {
+    'echo': os.getenv('DB_ECHO', 'False').lower() == 'true',
+    'pool_pre_ping': True,
+    'pool_recycle': DB_POOL_RECYCLE
+}
+if not _is_sqlite_memory:
+    # In-memory SQLite keeps SQLAlchemy's single-connection pool
+    engine_options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT
+    })
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=os.getenv('DB_ECHO', 'False').lower() == 'true',
-    pool_pre_ping=True,
-    pool_recycle=300
-)
+engine = create_engine(DATABASE_URL, **engine_options)
+
+if _is_sqlite:
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers proceed during writes; NORMAL sync is durable at checkpoints under WAL"""
+        cursor = dbapi_connection.cursor()
+        if not _is_sqlite_memory:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.close()
 
 # Create session factory
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
@@ -57,20 +123,121 @@ def get_db_context():
     finally:
         session.close()
 
+# Table creation can run in the background so a worker answers /health at once;
+# requests that need the database wait up to DB_READY_TIMEOUT for it
+DB_INIT_BACKGROUND = os.getenv('DB_INIT_BACKGROUND', 'True').lower() == 'true'
+DB_READY_TIMEOUT = float(os.getenv('DB_READY_TIMEOUT', 30))
+
+# Endpoints served before the database is ready
+DB_OPTIONAL_ENDPOINTS = {'health_check', 'readiness_check', 'prometheus.prometheus_metrics',
+                         'metrics.get_latency_metrics', 'metrics.get_admission_metrics'}
+
+_db_ready = threading.Event()
+_db_init_error = None
+
+def init_app(app):
+    """
+    Scope sessions to the request: release the thread's session when the app context ends.
+    Requests that need the database wait for it to be initialized.
+    """
+    from flask import request, jsonify
+    from ..services.stage_metrics import instrument_session_commits
+    instrument_session_commits(SessionLocal)
+
+    @app.before_request
+    def wait_for_database():
+        if _db_ready.is_set() or request.endpoint in DB_OPTIONAL_ENDPOINTS:
+            return None
+        if not wait_for_db(DB_READY_TIMEOUT):
+            return jsonify({'error': 'Database is not ready', 'database': db_status()}), 503
+        return None
+
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        SessionLocal.remove()
+
+def get_pool_stats():
+    """Connection pool occupancy and checkout wait metrics"""
+    pool = engine.pool
+    stats = {
+        'pool_class': type(pool).__name__,
+        'checkouts': pool_metrics.checkouts,
+        'checkout_wait_seconds_total': pool_metrics.wait_seconds_total,
+        'checkout_wait_seconds_max': pool_metrics.wait_seconds_max,
+        'checkout_wait_seconds_avg': (pool_metrics.wait_seconds_total / pool_metrics.checkouts) if pool_metrics.checkouts else 0.0
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': DB_MAX_OVERFLOW
+        })
+    return stats
+
+def reset_after_fork():
+    """
+    Drop pooled connections inherited from the parent process (call in the child after fork)
+    
+    close=False leaves the sockets to the parent instead of closing them from the child.
+    """
+    engine.dispose(close=False)
+
 def init_db():
     """Initialize database tables"""
+    global _db_init_error
     try:
         # Import all models to ensure they're registered
-        from .models import VerificationResult, TrainingHistory
+        from .models import VerificationResult, TrainingHistory, Job
+        
+        from .migrations import upgrade_schema
         
-        # Create all tables
+        # Create all tables, then bring existing ones up to the current models
         Base.metadata.create_all(bind=engine)
+        upgrade_schema(engine)
         logger.info("Database tables created successfully")
+        _db_init_error = None
+        _db_ready.set()
         
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
+        _db_init_error = str(e)
         raise
 
+def init_db_background(on_ready=None) -> threading.Thread:
+    """
+    Initialize database tables in a background thread
+    
+    Args:
+        on_ready: Called in that thread once the tables exist (e.g. job recovery)
+    """
+    def run():
+        try:
+            init_db()
+        except Exception:
+            return  # logged by init_db; requests get 503 and db_status() reports it
+        if on_ready:
+            try:
+                on_ready()
+            except Exception as e:
+                logger.error(f"Error after database initialization: {str(e)}")
+
+    thread = threading.Thread(target=run, name='db-init', daemon=True)
+    thread.start()
+    return thread
+
+def wait_for_db(timeout: float = DB_READY_TIMEOUT) -> bool:
+    """Block until the database is initialized; False on timeout or failed init"""
+    if _db_init_error is not None:
+        return False
+    return _db_ready.wait(timeout)
+
+def db_status() -> str:
+    """'ready', 'initializing' or 'failed'"""
+    if _db_ready.is_set():
+        return 'ready'
+    return 'failed' if _db_init_error is not None else 'initializing'
+
 def close_db():
     """Close database connections"""
     try:
@@ -83,7 +250,7 @@ def test_connection():
     """Test database connection"""
     try:
         with get_db_context() as session:
-            session.execute("SELECT 1")
+            session.execute(text("SELECT 1"))
         logger.info("Database connection test successful")
         return True
     except Exception as e:
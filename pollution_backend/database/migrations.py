@@ -0,0 +1,95 @@
+"""
+Schema upgrades for existing databases
+create_all only creates missing tables; columns and indexes added to tables that
+already exist are brought in here. Every step checks the live schema first, so
+upgrade_schema is safe to run on every start.
+"""
+
+import os
+import logging
+from typing import Dict, List
+
+from sqlalchemy import inspect, text
+
+from .connection import Base
+
+logger = logging.getLogger(__name__)
+
+# Columns added to existing tables after their first release
+ADDED_COLUMNS: Dict[str, List[str]] = {
+    'satellite_images': ['size_bytes', 'last_accessed', 'access_count', 'content_hash'],
+}
+
+# Indexes added to existing tables after their first release
+ADDED_INDEXES: Dict[str, List[str]] = {
+    'satellite_images': ['ix_satellite_images_image_path', 'ix_satellite_images_last_accessed'],
+    'verification_results': ['ix_verification_results_timestamp_id'],
+}
+
+def _column_ddl(column, dialect) -> str:
+    """ADD COLUMN clause; NOT NULL only when a constant default can fill existing rows"""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+def _add_columns(connection, table_name: str, column_names: List[str]) -> List[str]:
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    table = Base.metadata.tables[table_name]
+    added = []
+    for name in column_names:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {_column_ddl(table.c[name], connection.dialect)}"))
+            added.append(name)
+    return added
+
+def _create_indexes(connection, table_name: str, index_names: List[str]) -> List[str]:
+    existing = {index['name'] for index in inspect(connection).get_indexes(table_name)}
+    indexes = {index.name: index for index in Base.metadata.tables[table_name].indexes}
+    created = []
+    for name in index_names:
+        if name not in existing:
+            indexes[name].create(bind=connection)
+            created.append(name)
+    return created
+
+def _backfill_satellite_images(connection):
+    """Fill the cache bookkeeping columns of rows written before the cache manager"""
+    connection.execute(text("UPDATE satellite_images SET last_accessed = timestamp WHERE last_accessed IS NULL"))
+    connection.execute(text("UPDATE satellite_images SET access_count = 0 WHERE access_count IS NULL"))
+    # image_path becomes unique: keep the newest row per file
+    connection.execute(text(
+        "DELETE FROM satellite_images WHERE id NOT IN "
+        "(SELECT max_id FROM (SELECT MAX(id) AS max_id FROM satellite_images GROUP BY image_path) AS newest)"
+    ))
+    rows = connection.execute(text("SELECT id, image_path FROM satellite_images WHERE size_bytes IS NULL")).all()
+    for row_id, image_path in rows:
+        try:
+            size = os.path.getsize(image_path)
+        except OSError:
+            # The file is gone; the row would only skew the cache budget
+            connection.execute(text("DELETE FROM satellite_images WHERE id = :id"), {'id': row_id})
+            continue
+        connection.execute(text("UPDATE satellite_images SET size_bytes = :size WHERE id = :id"),
+                           {'size': size, 'id': row_id})
+
+BACKFILLS = {
+    'satellite_images': _backfill_satellite_images,
+}
+
+def upgrade_schema(engine):
+    """Add missing columns and indexes to existing tables, backfilling new columns"""
+    with engine.begin() as connection:
+        tables = set(inspect(connection).get_table_names())
+        for table_name in sorted(set(ADDED_COLUMNS) | set(ADDED_INDEXES)):
+            if table_name not in tables:
+                continue
+            added = _add_columns(connection, table_name, ADDED_COLUMNS.get(table_name, []))
+            if table_name in BACKFILLS:
+                BACKFILLS[table_name](connection)
+            created = _create_indexes(connection, table_name, ADDED_INDEXES.get(table_name, []))
+            if added or created:
+                logger.info(f"Upgraded {table_name}: added columns {added}, created indexes {created}")
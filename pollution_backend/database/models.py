@@ -2,7 +2,7 @@
 Database models for pollution verification system
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Text, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .connection import Base
@@ -10,6 +10,10 @@ from .connection import Base
 class VerificationResult(Base):
     """Model for storing verification results"""
     __tablename__ = 'verification_results'
+    __table_args__ = (
+        # Supports keyset pagination over (timestamp, id)
+        Index('ix_verification_results_timestamp_id', 'timestamp', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     report_id = Column(Integer, nullable=False, index=True)
@@ -26,6 +30,22 @@ class VerificationResult(Base):
     def __repr__(self):
         return f"<VerificationResult(id={self.id}, report_id={self.report_id}, verified={self.verified})>"
 
+class VerificationStatsRollup(Base):
+    """Model for per-day verification counts, maintained incrementally for dashboard stats"""
+    __tablename__ = 'verification_stats_rollup'
+    __table_args__ = (
+        UniqueConstraint('day', 'user_category', 'verified', name='uq_verification_stats_rollup_key'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_category = Column(String(50), nullable=False)
+    verified = Column(Boolean, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<VerificationStatsRollup(day={self.day}, category={self.user_category}, verified={self.verified}, count={self.count})>"
+
 class TrainingHistory(Base):
     """Model for storing training history"""
     __tablename__ = 'training_history'
@@ -55,10 +75,14 @@ class SatelliteImage(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     date = Column(String(10), nullable=False)  # YYYY-MM-DD format
-    image_path = Column(String(500), nullable=False)
+    image_path = Column(String(500), nullable=False, unique=True, index=True)
     source = Column(String(50), nullable=False)  # 'google_earth', 'sentinel_hub', 'landsat'
     resolution = Column(String(20), nullable=True)
     cloud_coverage = Column(Float, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the file, served as the ETag
+    last_accessed = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    access_count = Column(Integer, default=0, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     def __repr__(self):
@@ -97,3 +121,21 @@ class APIUsage(Base):
     
     def __repr__(self):
         return f"<APIUsage(id={self.id}, endpoint={self.endpoint}, status={self.status_code})>"
+
+
+class Job(Base):
+    """Model for tracking asynchronous background jobs"""
+    __tablename__ = 'jobs'
+    
+    id = Column(String(36), primary_key=True)  # UUID4 hex string
+    kind = Column(String(50), nullable=False, index=True)  # 'satellite_fetch', 'verify_reports'
+    status = Column(String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    params = Column(Text, nullable=False)  # JSON string of handler arguments
+    result = Column(Text, nullable=True)  # JSON string of handler result
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
@@ -0,0 +1,84 @@
+"""
+Gunicorn configuration
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import gc
+import os
+import sys
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+# Admission control queues requests inside the worker, so each worker needs a
+# thread for every request its limiters can hold (fetch 4 + 8, analyze 8 + 16 by
+# default) plus some to spare for /health and the cheap endpoints. With sync
+# workers, or too few threads, overload waits in the listen backlog instead,
+# where it is never shed and /health times out behind it
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 48))
+
+# Load the app (and TensorFlow's modules, see wsgi.py) once in the master and fork
+# workers from it, so code and lookup tables are shared copy-on-write. The model
+# is loaded per worker in post_worker_init: TensorFlow's runtime is not fork-safe
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Prometheus multiprocess mode: workers write samples to this directory and
+# GET /metrics aggregates them, so any worker can answer a scrape
+prometheus_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Start every deployment with an empty metrics directory. This runs here, not in
+# on_starting: preload_app imports the app (and creates its metric files) before
+# on_starting is called. A config reload (HUP) re-reads this file in the same
+# master, whose workers still write to the directory, so it is only reset once.
+if prometheus_multiproc_dir and os.environ.get('_PROMETHEUS_MULTIPROC_DIR_RESET') != str(os.getpid()):
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+    os.environ['_PROMETHEUS_MULTIPROC_DIR_RESET'] = str(os.getpid())
+
+def when_ready(server):
+    """
+    Check the admission limits fit in the worker's threads, then move everything
+    allocated while preloading into the permanent GC generation. Otherwise the
+    first collection in each worker writes to every object header and un-shares
+    the pages.
+    """
+    admission = sys.modules.get('pollution_backend.services.admission')
+    if admission is not None and admission.admission_controller.capacity() >= threads:
+        server.log.warning(
+            f"GUNICORN_THREADS={threads} cannot hold the {admission.admission_controller.capacity()} "
+            "requests the admission limits admit per worker; overload will not be shed"
+        )
+
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+def post_fork(server, worker):
+    """Don't reuse the master's database connections in the worker"""
+    connection = sys.modules.get('pollution_backend.database.connection')
+    if connection is not None:
+        connection.reset_after_fork()
+
+def post_worker_init(worker):
+    """
+    Load the model and start following the active ModelVersion, then re-queue
+    unfinished jobs; claiming is atomic, so each job runs in one worker
+    """
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        wsgi.load_worker_model()
+    model_manager = sys.modules.get('pollution_backend.services.model_manager')
+    if model_manager is not None:
+        model_manager.get_model_manager().start_poller()
+    jobs = sys.modules.get('pollution_backend.api.jobs')
+    if jobs is not None:
+        jobs.job_service.recover_jobs()
+
+def child_exit(server, worker):
+    """Drop the exited worker's live samples from the aggregated metrics"""
+    if prometheus_multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Concurrent fetch benchmark: gunicorn (WSGI) vs uvicorn (ASGI)
+
+Starts a local stand-in for Sentinel Hub that answers every request with a
+small JPEG after a fixed delay. It then fires concurrent uncached
+POST /api/satellite/fetch requests ("async": false) at each server and
+reports throughput and latency. Fetches spend nearly all their time waiting
+on the provider; gunicorn runs at most ADMISSION_FETCH_CONCURRENCY of them per
+worker, each holding a thread, while the ASGI app keeps them all in flight on
+one event loop.
+
+Usage:
+    python scripts/benchmark_async_fetch.py --requests 400 --concurrency 200 --latency-ms 500
+    python scripts/benchmark_async_fetch.py --servers asgi --asgi-workers 1
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def stand_in_jpeg() -> bytes:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (224, 224), (40, 90, 160)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+def serve_provider(port: int, latency_seconds: float):
+    """Sentinel Hub / NASA stand-in: any POST or GET returns a JPEG after latency_seconds"""
+    content = stand_in_jpeg()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency_seconds)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = _reply
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 1024
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+def start_provider(latency_seconds: float):
+    """Run the stand-in in its own process, away from the load generator's GIL"""
+    port = free_port()
+    provider = multiprocessing.Process(target=serve_provider, args=(port, latency_seconds), daemon=True)
+    provider.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', port)) == 0:
+                return provider, port
+        time.sleep(0.05)
+    raise RuntimeError('Provider stand-in did not start')
+
+def server_command(kind: str, port: int, args) -> list:
+    if kind == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(args.wsgi_workers), '--backlog', '2048', 'wsgi:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(args.asgi_workers), '--backlog', '2048', '--log-level', 'warning']
+
+async def wait_ready(base_url: str, process, timeout: float = 60):
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if (await client.get(f'{base_url}/ready')).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+async def run_load(base_url: str, total: int, concurrency: int, run_id: int) -> dict:
+    """concurrency simulated clients, each on its own connection, share total requests"""
+    import httpx
+    latencies, statuses = [], {}
+    remaining = iter(range(total))
+
+    async def client_loop():
+        async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=1)) as client:
+            for i in remaining:
+                # Distinct coordinates per request (and per run), so every fetch misses the cache
+                payload = {'latitude': round(10 + run_id + i * 0.0001, 4), 'longitude': 20.0,
+                           'date': '2025-01-20', 'async': False}
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f'{base_url}/api/satellite/fetch', json=payload)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)}
+    }
+
+def benchmark(kind: str, provider_url: str, run_id: int, args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix=f'fetch_bench_{kind}_')
+    port = free_port()
+    env = dict(os.environ,
+               SENTINEL_HUB_URL=provider_url, SENTINEL_HUB_TOKEN='stand-in',
+               DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+               SATELLITE_CACHE_DIR=os.path.join(work_dir, 'satellite_images'),
+               GOOGLE_EARTH_ENGINE_KEY='', NASA_API_KEY='',
+               # The load comes from one address: take per-client rate limiting out of the measurement
+               CLIENT_RATE_PER_SECOND='0',
+               ADMISSION_FETCH_QUEUE=str(args.concurrency), ADMISSION_FETCH_ASYNC_QUEUE=str(args.concurrency),
+               ADMISSION_QUEUE_TIMEOUT_MS='600000',
+               # Every queued fetch holds a gunicorn thread
+               GUNICORN_THREADS=str(args.concurrency + 8),
+               PRELOAD_MODEL='False', GUNICORN_TIMEOUT='300')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+    process = subprocess.Popen(server_command(kind, port, args), cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        asyncio.run(wait_ready(base_url, process))
+        return asyncio.run(run_load(base_url, args.requests, args.concurrency, run_id))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent satellite fetches, WSGI vs ASGI')
+    parser.add_argument('--requests', type=int, default=400, help='Fetches per server')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight from the client')
+    parser.add_argument('--latency-ms', type=float, default=500, help='Stand-in provider response delay')
+    parser.add_argument('--servers', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+    parser.add_argument('--wsgi-workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--asgi-workers', type=int, default=1, help='uvicorn processes')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    provider, provider_port = start_provider(args.latency_ms / 1000)
+    provider_url = f'http://127.0.0.1:{provider_port}/api/v1/process'
+
+    results = {}
+    for run_id, kind in enumerate(args.servers):
+        results[kind] = benchmark(kind, provider_url, run_id, args)
+    provider.terminate()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.requests} uncached fetches, {args.concurrency} concurrent, provider latency {args.latency_ms:.0f} ms")
+    print(f"{'server':<28}{'req/s':>8}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+    labels = {'wsgi': f'gunicorn {args.wsgi_workers} workers', 'asgi': f'uvicorn {args.asgi_workers} process'}
+    for kind, result in results.items():
+        print(f"{labels[kind]:<28}{result['requests_per_second']:>8}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+              f"  {result['statuses']}")
+    if 'wsgi' in results and 'asgi' in results:
+        print(f"\nASGI throughput: {results['asgi']['requests_per_second'] / results['wsgi']['requests_per_second']:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: time from interpreter start to the first /health response
+
+Runs the app in fresh interpreters under `python -X importtime`, reports the
+slowest imports, and exits non-zero if startup exceeds the budget or a heavy
+dependency (Earth Engine, TensorFlow, numpy, PIL, pyarrow) is imported before
+the first request.
+
+Usage:
+    python scripts/benchmark_cold_start.py --runs 5 --max-seconds 1.5
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['ee', 'tensorflow', 'numpy', 'PIL', 'pyarrow']
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as backend
+imported = time.perf_counter()
+application = backend.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/health')
+answered = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_seconds': imported - started,
+    'create_app_seconds': created - imported,
+    'first_health_seconds': answered - created,
+    'total_seconds': answered - started,
+    'modules': sorted({name.split('.')[0] for name in sys.modules}),
+}))
+'''
+
+def parse_importtime(stderr: str, max_depth: int = 2):
+    """(cumulative_us, depth, module) from -X importtime output, down to max_depth levels of nesting"""
+    entries = []
+    for line in stderr.splitlines():
+        parts = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level under the module that triggered them
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        if depth <= max_depth:
+            entries.append((int(parts[1]), depth, parts[2].strip()))
+    return entries
+
+def run_once(env):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"App failed to start:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1]), parse_importtime(result.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pollution_backend cold start')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+    parser.add_argument('--max-seconds', type=float, default=float(os.getenv('COLD_START_MAX_SECONDS', 2.0)),
+                        help='Fail if the median time to first /health exceeds this')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    parser.add_argument('--allow', nargs='*', default=[], help='Heavy modules allowed at startup')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='cold_start_')
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(work_dir, 'cold_start.db')}")
+    env.setdefault('SATELLITE_CACHE_DIR', os.path.join(work_dir, 'satellite_images'))
+
+    runs = []
+    for _ in range(args.runs):
+        runs.append(run_once(env))
+
+    totals = [timings['total_seconds'] for timings, _ in runs]
+    timings, imports = runs[-1]
+    median = statistics.median(totals)
+
+    print(f"Cold start over {args.runs} runs: median {median:.3f}s, min {min(totals):.3f}s, max {max(totals):.3f}s")
+    print(f"  import app:    {timings['import_seconds']:.3f}s")
+    print(f"  create_app:    {timings['create_app_seconds']:.3f}s")
+    print(f"  first /health: {timings['first_health_seconds']:.3f}s")
+
+    print("\nSlowest imports (cumulative, up to two levels below the app):")
+    for cumulative_us, depth, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    failures = []
+    if timings['status'] != 200:
+        failures.append(f"/health returned {timings['status']}")
+    if median > args.max_seconds:
+        failures.append(f"median cold start {median:.3f}s exceeds {args.max_seconds:.3f}s")
+    loaded = [name for name in HEAVY_MODULES if name in timings['modules'] and name not in args.allow]
+    if loaded:
+        failures.append(f"heavy modules imported before the first request: {', '.join(loaded)}")
+
+    if failures:
+        print('\nFAIL: ' + '; '.join(failures))
+        sys.exit(1)
+    print('\nOK')
+
+if __name__ == '__main__':
+    main()
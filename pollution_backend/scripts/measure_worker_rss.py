@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory of a running gunicorn server (Linux)
+
+Reads /proc/<pid>/smaps_rollup for the master and each worker. RSS counts shared
+pages in every process; PSS splits them between the processes sharing them, so
+the PSS total is what the server really costs. Compare a preloaded server with
+GUNICORN_PRELOAD=False to see what copy-on-write sharing saves.
+
+Usage:
+    python scripts/measure_worker_rss.py --pid <gunicorn master pid>
+    python scripts/measure_worker_rss.py --pidfile /tmp/gunicorn.pid --json
+"""
+
+import os
+import sys
+import json
+import argparse
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+def read_smaps_rollup(pid: int) -> dict:
+    """Memory counters of one process, in KiB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+def child_pids(pid: int) -> list:
+    """Direct children of pid"""
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(name))
+        except (FileNotFoundError, IndexError, ValueError):
+            continue
+    return sorted(children)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure gunicorn master and worker memory')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pid', type=int, help='gunicorn master pid')
+    group.add_argument('--pidfile', help='gunicorn --pid file')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    master = args.pid
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            master = int(f.read().strip())
+
+    processes = [('master', master)] + [('worker', pid) for pid in child_pids(master)]
+    rows = []
+    for role, pid in processes:
+        try:
+            rows.append(dict(read_smaps_rollup(pid), role=role, pid=pid))
+        except FileNotFoundError:
+            continue
+
+    workers = [row for row in rows if row['role'] == 'worker']
+    summary = {
+        'workers': len(workers),
+        'total_rss_kib': sum(row.get('Rss', 0) for row in rows),
+        'total_pss_kib': sum(row.get('Pss', 0) for row in rows),
+        'avg_worker_rss_kib': sum(row.get('Rss', 0) for row in workers) / len(workers) if workers else 0,
+        'avg_worker_private_kib': sum(row.get('Private_Clean', 0) + row.get('Private_Dirty', 0)
+                                      for row in workers) / len(workers) if workers else 0
+    }
+
+    if args.json:
+        print(json.dumps({'processes': rows, 'summary': summary}, indent=2))
+        return
+
+    print(f"{'role':<8}{'pid':>8}{'RSS MiB':>10}{'PSS MiB':>10}{'shared MiB':>12}{'private MiB':>13}")
+    for row in rows:
+        shared = row.get('Shared_Clean', 0) + row.get('Shared_Dirty', 0)
+        private = row.get('Private_Clean', 0) + row.get('Private_Dirty', 0)
+        print(f"{row['role']:<8}{row['pid']:>8}{row.get('Rss', 0) / 1024:>10.1f}{row.get('Pss', 0) / 1024:>10.1f}"
+              f"{shared / 1024:>12.1f}{private / 1024:>13.1f}")
+    print(f"\n{summary['workers']} workers: total RSS {summary['total_rss_kib'] / 1024:.1f} MiB, "
+          f"total PSS {summary['total_pss_kib'] / 1024:.1f} MiB, "
+          f"avg worker private {summary['avg_worker_private_kib'] / 1024:.1f} MiB")
+
+if __name__ == '__main__':
+    if not sys.platform.startswith('linux'):
+        sys.exit('smaps_rollup is only available on Linux')
+    main()
@@ -0,0 +1,293 @@
+"""
+Admission control for expensive endpoints
+Per-endpoint concurrency limits with a bounded wait queue, and per-client token
+buckets, so overload is shed quickly instead of piling up behind slow providers
+"""
+
+import os
+import math
+import asyncio
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .stage_metrics import ADMISSION_IN_FLIGHT, ADMISSION_WAITING, ADMISSION_SHED
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 2000))
+CLIENT_RATE_PER_SECOND = float(os.getenv('CLIENT_RATE_PER_SECOND', 5))
+CLIENT_BURST = float(os.getenv('CLIENT_BURST', 20))
+CLIENT_BUCKETS_MAX = int(os.getenv('CLIENT_BUCKETS_MAX', 10000))
+
+# Behind a trusted proxy, name the header carrying the client address (e.g. X-Forwarded-For)
+CLIENT_ID_HEADER = os.getenv('CLIENT_ID_HEADER')
+# Number of trusted proxies that append to CLIENT_ID_HEADER
+TRUSTED_PROXY_HOPS = max(int(os.getenv('TRUSTED_PROXY_HOPS', 1)), 1)
+
+def client_key(headers, remote_addr: Optional[str]) -> str:
+    """
+    Key for the per-client token bucket
+    
+    Each proxy appends the address it received the request from, and entries to
+    its left are whatever the client sent, so the client is the entry
+    TRUSTED_PROXY_HOPS from the right (the rightmost one behind a single proxy).
+    """
+    if CLIENT_ID_HEADER:
+        entries = [entry.strip() for entry in headers.get(CLIENT_ID_HEADER, '').split(',') if entry.strip()]
+        if entries:
+            return entries[max(len(entries) - TRUSTED_PROXY_HOPS, 0)]
+    return remote_addr or 'unknown'
+
+class Rejected(Exception):
+    """Request not admitted; status is 429 or 503 and retry_after is in seconds"""
+
+    def __init__(self, reason: str, status: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Response body for the rejection"""
+        return {
+            'error': 'Too many requests' if self.status == 429 else 'Service overloaded',
+            'reason': self.reason,
+            'retry_after': self.retry_after
+        }
+
+class ConcurrencyLimiter:
+    """
+    At most max_concurrent requests run at once; up to max_queue more wait for a
+    slot (for at most queue_timeout seconds), the rest are rejected immediately
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        # Moving average of service time, for Retry-After estimates
+        self._service_seconds = 1.0
+
+    def _retry_after(self) -> int:
+        """Rough time for the current backlog to drain"""
+        backlog = (self.waiting + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    # Bookkeeping shared by the thread and coroutine limiters; callers hold their lock
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+
+    def _try_admit(self) -> bool:
+        """Take a free slot, unless others are already queued for one"""
+        if self.in_flight < self.max_concurrent and not self.waiting:
+            self._admit()
+            return True
+        return False
+
+    def _enqueue(self):
+        """Join the wait queue; raises Rejected when it is full"""
+        if self.waiting >= self.max_queue:
+            self.shed_queue_full += 1
+            ADMISSION_SHED.labels(self.name, 'queue_full').inc()
+            raise Rejected('queue_full', 503, self._retry_after())
+        self.waiting += 1
+        ADMISSION_WAITING.labels(self.name).inc()
+
+    def _dequeue(self):
+        self.waiting -= 1
+        ADMISSION_WAITING.labels(self.name).dec()
+
+    def _remaining(self, deadline: float) -> float:
+        """Seconds left to wait for a slot; raises Rejected once the queue timeout is up"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.shed_timeout += 1
+            ADMISSION_SHED.labels(self.name, 'queue_timeout').inc()
+            raise Rejected('queue_timeout', 503, self._retry_after())
+        return remaining
+
+    def _release(self, service_seconds: Optional[float]):
+        self.in_flight -= 1
+        if service_seconds is not None:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * service_seconds
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises Rejected when overloaded"""
+        with self._condition:
+            if self._try_admit():
+                return
+            self._enqueue()
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.in_flight >= self.max_concurrent:
+                    self._condition.wait(self._remaining(deadline))
+            finally:
+                self._dequeue()
+            self._admit()
+
+    def release(self, service_seconds: Optional[float] = None):
+        with self._condition:
+            self._release(service_seconds)
+            self._condition.notify()
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout_seconds': self.queue_timeout,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_timeout': self.shed_timeout,
+                'avg_service_seconds': round(self._service_seconds, 4)
+            }
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    ConcurrencyLimiter for coroutines on one event loop: queued requests wait on
+    the loop instead of holding a thread, so the limits can be in the hundreds
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Created on first use so it belongs to the serving loop
+        self._async_condition: Optional[asyncio.Condition] = None
+
+    async def acquire_async(self):
+        if self._async_condition is None:
+            self._async_condition = asyncio.Condition()
+        async with self._async_condition:
+            if self._try_admit():
+                return
+            self._enqueue()
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.in_flight >= self.max_concurrent:
+                    try:
+                        await asyncio.wait_for(self._async_condition.wait(), self._remaining(deadline))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._dequeue()
+            self._admit()
+
+    async def release_async(self, service_seconds: Optional[float] = None):
+        async with self._async_condition:
+            self._release(service_seconds)
+            self._async_condition.notify()
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+
+class ClientRateLimiter:
+    """Token bucket per client: `rate` requests per second sustained, bursts up to `burst`"""
+
+    def __init__(self, rate: float = CLIENT_RATE_PER_SECOND, burst: float = CLIENT_BURST,
+                 max_clients: int = CLIENT_BUCKETS_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        # client -> (tokens, last refill); least recently seen clients are dropped first
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self.limited = 0
+
+    def take(self, client: str) -> Tuple[bool, int]:
+        """
+        Spend one token for client
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else max(1, math.ceil((1 - tokens) / self.rate))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'rate_limited': self.limited
+            }
+
+class AdmissionController:
+    """Named limiters plus the shared per-client buckets"""
+
+    def __init__(self, rate_limiter: Optional[ClientRateLimiter] = None):
+        self.rate_limiter = rate_limiter or ClientRateLimiter()
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    def limiter(self, name: str, default_concurrent: int, default_queue: int,
+                limiter_class=ConcurrencyLimiter) -> ConcurrencyLimiter:
+        """Get or create the limiter for an endpoint; ADMISSION_<NAME>_CONCURRENCY/_QUEUE override the defaults"""
+        if name not in self.limiters:
+            prefix = f"ADMISSION_{name.upper()}"
+            self.limiters[name] = limiter_class(
+                name,
+                int(os.getenv(f'{prefix}_CONCURRENCY', default_concurrent)),
+                int(os.getenv(f'{prefix}_QUEUE', default_queue))
+            )
+        return self.limiters[name]
+
+    def charge(self, name: str, client: str):
+        """Spend one of the client's tokens; raises Rejected (429) when it has none"""
+        allowed, retry_after = self.rate_limiter.take(client)
+        if not allowed:
+            ADMISSION_SHED.labels(name, 'rate_limited').inc()
+            raise Rejected('rate_limited', 429, retry_after)
+
+    def admit(self, name: str, client: str) -> ConcurrencyLimiter:
+        """Rate-limit the client, then take a slot on the endpoint's limiter"""
+        self.charge(name, client)
+        limiter = self.limiters[name]
+        limiter.acquire()
+        return limiter
+
+    async def admit_async(self, name: str, client: str) -> AsyncConcurrencyLimiter:
+        """admit() for an AsyncConcurrencyLimiter; token buckets are shared with the sync endpoints"""
+        self.charge(name, client)
+        limiter = self.limiters[name]
+        await limiter.acquire_async()
+        return limiter
+
+    def capacity(self) -> int:
+        """Requests the limiters can hold at once, running or queued"""
+        return sum(limiter.max_concurrent + limiter.max_queue for limiter in self.limiters.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'endpoints': {name: limiter.stats() for name, limiter in self.limiters.items()},
+            'clients': self.rate_limiter.stats()
+        }
+
+admission_controller = AdmissionController()
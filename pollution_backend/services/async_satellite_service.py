@@ -0,0 +1,175 @@
+"""
+Async satellite imagery fetching
+Awaits provider responses with httpx, so one process can hold hundreds of
+fetches in flight; request building, caching and analysis are SatelliteService's
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple
+
+from .satellite_service import SatelliteService, get_satellite_service, analyze_image_file
+from .image_sizes import resolve_output_size
+from .stage_metrics import SATELLITE_FETCH_SECONDS
+from .tracing import start_span, bind_context
+
+logger = logging.getLogger(__name__)
+
+ASYNC_PROVIDER_CONNECTIONS = int(os.getenv('ASYNC_PROVIDER_CONNECTIONS', 256))
+# httpx pool bookkeeping grows with the connections in one client, so the
+# connections are spread over several small clients
+CONNECTIONS_PER_CLIENT = 16
+ASYNC_BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', 16))
+PROVIDER_TIMEOUT_SECONDS = float(os.getenv('PROVIDER_TIMEOUT_SECONDS', 30))
+
+class AsyncSatelliteService:
+    """
+    Same provider chain as SatelliteService.fetch_satellite_image, awaiting the
+    provider instead of blocking a thread on it
+
+    Work that blocks (cache lookups and writes, Earth Engine's client, image
+    decoding) runs on a small thread pool. Create one per event loop.
+    """
+
+    def __init__(self, service: Optional[SatelliteService] = None):
+        import httpx
+
+        self.service = service or get_satellite_service()
+        self.clients = [
+            httpx.AsyncClient(timeout=PROVIDER_TIMEOUT_SECONDS,
+                              limits=httpx.Limits(max_connections=CONNECTIONS_PER_CLIENT,
+                                                  max_keepalive_connections=CONNECTIONS_PER_CLIENT))
+            for _ in range(max(1, -(-ASYNC_PROVIDER_CONNECTIONS // CONNECTIONS_PER_CLIENT)))
+        ]
+        self._next_client = itertools.cycle(self.clients)
+        self._blocking = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS,
+                                            thread_name_prefix='satellite-blocking')
+
+    @property
+    def client(self):
+        """Provider HTTP client for the next request (round robin)"""
+        return next(self._next_client)
+
+    async def _run_blocking(self, func, *args):
+        """Run func on the blocking pool, keeping the caller's trace context"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._blocking, bind_context(functools.partial(func, *args)))
+
+    async def fetch_satellite_image(self, latitude: float, longitude: float, date: str,
+                                    consumer: Optional[str] = None,
+                                    size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        """
+        Fetch satellite image for given coordinates and date
+
+        Returns:
+            Path to saved satellite image or None if failed
+        """
+        service = self.service
+        try:
+            size = resolve_output_size(consumer, size)
+
+            with start_span('satellite.cache_lookup') as span:
+                cached_path = await self._run_blocking(
+                    service.cache.lookup, *service._cache_candidates(latitude, longitude, date, size)
+                )
+                span.set_attribute('hit', bool(cached_path))
+            if cached_path:
+                return cached_path
+
+            # Earth Engine's client is blocking; it gets a pool thread
+            if service.ee_initialized:
+                image_path = await self._timed_fetch(
+                    'gee', functools.partial(self._run_blocking, service._fetch_from_google_earth_engine),
+                    latitude, longitude, date, size
+                )
+                if image_path:
+                    return image_path
+
+            image_path = await self._timed_fetch('sentinel', self._fetch_from_sentinel_hub,
+                                                 latitude, longitude, date, size)
+            if image_path:
+                return image_path
+
+            return await self._timed_fetch('landsat', self._fetch_from_landsat,
+                                           latitude, longitude, date, size)
+
+        except Exception as e:
+            logger.error(f"Error fetching satellite image: {str(e)}")
+            return None
+
+    async def _timed_fetch(self, source: str, fetch, *args) -> Optional[str]:
+        """Await a provider fetch and record its latency by source and outcome"""
+        started = time.perf_counter()
+        with start_span('satellite.provider_fetch', source=source) as span:
+            image_path = await fetch(*args)
+            span.set_attribute('success', bool(image_path))
+        SATELLITE_FETCH_SECONDS.labels(source, 'success' if image_path else 'failure').observe(
+            time.perf_counter() - started
+        )
+        return image_path
+
+    async def _fetch_from_sentinel_hub(self, latitude: float, longitude: float, date: str,
+                                       size: Tuple[int, int]) -> Optional[str]:
+        """Fetch image from Sentinel Hub"""
+        service = self.service
+        try:
+            if not service.sentinel_hub_token:
+                logger.warning("Sentinel Hub token not provided")
+                return None
+
+            response = await self.client.post(**service._sentinel_hub_request(latitude, longitude, date, size))
+
+            if response.status_code == 200:
+                filepath = await self._run_blocking(service._store_provider_image, 'sentinel', 'sentinel_hub',
+                                                    response.content, latitude, longitude, date, size)
+                logger.info(f"Sentinel Hub image saved: {filepath}")
+                return filepath
+
+            logger.error(f"Sentinel Hub request failed: {response.status_code}")
+            return None
+
+        except Exception as e:
+            logger.error(f"Error fetching from Sentinel Hub: {str(e)}")
+            return None
+
+    async def _fetch_from_landsat(self, latitude: float, longitude: float, date: str,
+                                  size: Tuple[int, int]) -> Optional[str]:
+        """Fetch image from Landsat (NASA's free API)"""
+        service = self.service
+        try:
+            nasa_api_key = os.getenv('NASA_API_KEY')
+            if not nasa_api_key:
+                logger.warning("NASA API key not provided")
+                return None
+
+            response = await self.client.get(**service._landsat_request(latitude, longitude, date, nasa_api_key))
+
+            if response.status_code == 200:
+                filepath = await self._run_blocking(service._store_landsat_image, response.content,
+                                                    latitude, longitude, date, size)
+                logger.info(f"Landsat image saved: {filepath}")
+                return filepath
+
+            logger.error(f"Landsat API request failed: {response.status_code}")
+            return None
+
+        except Exception as e:
+            logger.error(f"Error fetching from Landsat: {str(e)}")
+            return None
+
+    async def analyze_image(self, image_path: str, pollution_type: str = 'general') -> Dict[str, Any]:
+        """Analyze satellite image for pollution detection"""
+        return await self._run_blocking(analyze_image_file, image_path, pollution_type)
+
+    async def image_id_for(self, image_path: str) -> Optional[int]:
+        return await self._run_blocking(self.service.cache.image_id_for, image_path)
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
+        self._blocking.shutdown(wait=False)
@@ -0,0 +1,184 @@
+"""
+Batch verification engine
+Verifies many reports at once: bulk report load, concurrent imagery fetch,
+batched classification and a single bulk insert of the results
+"""
+
+import os
+import time
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..database.models import VerificationResult
+from .classifier_service import ClassifierService
+from .model_manager import ServingModel, get_model_manager
+from .report_repository import ReportRepository
+from .satellite_service import SatelliteService, get_satellite_service
+from .tracing import start_span, submit_in_context, traced
+
+logger = logging.getLogger(__name__)
+
+FETCH_CONCURRENCY = int(os.getenv('VERIFICATION_FETCH_CONCURRENCY', 8))
+
+class BatchVerificationEngine:
+    def __init__(self, verification_service, satellite_service: Optional[SatelliteService] = None,
+                 classifier: Optional[ClassifierService] = None,
+                 reports: Optional[ReportRepository] = None,
+                 fetch_concurrency: int = FETCH_CONCURRENCY):
+        self.verification_service = verification_service
+        self.satellite_service = satellite_service or get_satellite_service()
+        # An explicit classifier is used as-is; otherwise each batch leases the active model version
+        self.classifier = ServingModel('injected', classifier) if classifier is not None else None
+        self.reports = reports or ReportRepository()
+        self.fetch_concurrency = fetch_concurrency
+
+    def _model_lease(self):
+        return nullcontext(self.classifier) if self.classifier is not None else get_model_manager().lease()
+
+    def _fetch_images(self, report: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """Resolve the user photo and fetch the matching satellite image for one report"""
+        with start_span('verification.fetch_report', report_id=report['id']):
+            user_image = self.reports.get_user_image(report)
+            satellite_image = self.satellite_service.fetch_satellite_image(
+                report['latitude'], report['longitude'],
+                report.get('date') or datetime.now().strftime('%Y-%m-%d'),
+                consumer='classifier'
+            )
+            return user_image, satellite_image
+
+    def _failure(self, report_id: int, reason: str) -> Dict[str, Any]:
+        return {
+            'report_id': report_id,
+            'verified': False,
+            'reason': reason,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    @traced('verification.verify_reports')
+    def verify_reports(self, report_ids: Sequence[int]) -> Dict[str, Any]:
+        """
+        Verify a batch of reports
+
+        Returns:
+            {
+                'results': one dict per report id, in input order,
+                'count': number of reports,
+                'persisted': number of results saved,
+                'model_version': version that classified the batch (None if nothing was classified),
+                'reports_per_minute': end-to-end throughput,
+                'timing': seconds spent per stage
+            }
+        """
+        started = time.perf_counter()
+        timing: Dict[str, float] = {}
+        report_ids = list(dict.fromkeys(int(report_id) for report_id in report_ids))
+        results: Dict[int, Dict[str, Any]] = {}
+
+        # Stage 1: load all report details with one query
+        stage = time.perf_counter()
+        with start_span('verification.load', reports=len(report_ids)):
+            reports = self.reports.get_reports(report_ids)
+        timing['load'] = time.perf_counter() - stage
+        for report_id in report_ids:
+            if report_id not in reports:
+                results[report_id] = self._failure(report_id, 'Report not found')
+
+        # Stage 2: fetch user and satellite imagery with bounded concurrency
+        stage = time.perf_counter()
+        images: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        pending = [reports[report_id] for report_id in report_ids if report_id in reports]
+        if pending:
+            # Fetch threads run in this context so their spans nest under the batch
+            workers = max(1, min(self.fetch_concurrency, len(pending)))
+            with start_span('verification.fetch', reports=len(pending)), ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {report['id']: submit_in_context(executor, self._fetch_images, report) for report in pending}
+                for report_id, future in futures.items():
+                    try:
+                        user_image, satellite_image = future.result()
+                    except Exception as e:
+                        logger.error(f"Error fetching imagery for report {report_id}: {str(e)}")
+                        results[report_id] = self._failure(report_id, f'Imagery fetch error: {str(e)}')
+                        continue
+                    if not user_image:
+                        results[report_id] = self._failure(report_id, 'User image unavailable')
+                    elif not satellite_image:
+                        results[report_id] = self._failure(report_id, 'Satellite imagery unavailable')
+                    else:
+                        images[report_id] = (user_image, satellite_image)
+        timing['fetch'] = time.perf_counter() - stage
+
+        # Stage 3: classify every distinct image in batched model calls
+        stage = time.perf_counter()
+        predictions: Dict[str, Dict[str, Any]] = {}
+        model_version = None
+        paths = list(dict.fromkeys(path for pair in images.values() for path in pair))
+        if paths:
+            try:
+                # The whole batch runs on one model version, even if a new one is swapped in meanwhile
+                with start_span('verification.classify', images=len(paths)) as span, self._model_lease() as serving:
+                    model_version = serving.version
+                    span.set_attribute('model.version', model_version)
+                    predictions = dict(zip(paths, serving.classifier.classify_batch(paths)))
+            except Exception as e:
+                logger.error(f"Error classifying batch: {str(e)}")
+                for report_id in images:
+                    results[report_id] = self._failure(report_id, f'Classification error: {str(e)}')
+                images = {}
+        timing['classify'] = time.perf_counter() - stage
+
+        # Stage 4: compare predictions
+        stage = time.perf_counter()
+        records: List[VerificationResult] = []
+        with start_span('verification.compare', reports=len(images)):
+            for report_id, (user_image, satellite_image) in images.items():
+                user_prediction = predictions.get(user_image, {})
+                satellite_prediction = predictions.get(satellite_image, {})
+                # Undecodable images: nothing to compare, and nothing worth storing
+                error = user_prediction.get('error') or satellite_prediction.get('error')
+                if error:
+                    results[report_id] = self._failure(report_id, f'Classification error: {error}')
+                    continue
+                comparison = self.verification_service.compare_predictions(user_prediction, satellite_prediction)
+                record = VerificationResult(
+                    report_id=report_id,
+                    user_image_path=user_image,
+                    satellite_image_path=satellite_image,
+                    user_category=user_prediction.get('category') or 'unknown',
+                    satellite_category=satellite_prediction.get('category'),
+                    user_confidence=float(user_prediction.get('confidence', 0)),
+                    satellite_confidence=satellite_prediction.get('confidence'),
+                    verified=comparison['verified'],
+                    reason=comparison['reason']
+                )
+                records.append(record)
+                results[report_id] = {
+                    'report_id': report_id,
+                    'verified': comparison['verified'],
+                    'reason': comparison['reason'],
+                    'user_prediction': user_prediction,
+                    'satellite_prediction': satellite_prediction,
+                    'timestamp': datetime.now().isoformat()
+                }
+        timing['compare'] = time.perf_counter() - stage
+
+        # Stage 5: persist all results in one transaction
+        stage = time.perf_counter()
+        with start_span('verification.persist', records=len(records)):
+            persisted = self.verification_service.save_verifications(records) if records else 0
+        timing['persist'] = time.perf_counter() - stage
+
+        elapsed = time.perf_counter() - started
+        timing['total'] = elapsed
+        logger.info(f"Verified {len(report_ids)} reports in {elapsed:.2f}s")
+
+        return {
+            'results': [results[report_id] for report_id in report_ids],
+            'count': len(report_ids),
+            'persisted': persisted,
+            'reports_per_minute': (len(report_ids) / elapsed * 60) if elapsed > 0 else None,
+            'model_version': model_version,
+            'timing': {name: round(seconds, 4) for name, seconds in timing.items()}
+        }
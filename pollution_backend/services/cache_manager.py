@@ -0,0 +1,286 @@
+"""
+Cache manager for downloaded satellite imagery
+Keeps SATELLITE_CACHE_DIR within a byte budget using LRU/TTL eviction
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+
+from sqlalchemy import func
+
+from ..database.models import SatelliteImage
+from ..database.connection import get_db_context
+from .stage_metrics import SATELLITE_CACHE_HITS, SATELLITE_CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# Serving an image refreshes its LRU position at most this often
+TOUCH_INTERVAL = timedelta(seconds=int(os.getenv('SATELLITE_CACHE_TOUCH_SECONDS', 3600)))
+
+class SatelliteCacheManager:
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, sweep_interval: Optional[float] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('SATELLITE_CACHE_MAX_BYTES', 1024 ** 3))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('SATELLITE_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+        self.sweep_interval = sweep_interval if sweep_interval is not None else float(os.getenv('SATELLITE_CACHE_SWEEP_SECONDS', 300))
+        # Evict down to this fraction of the budget so every store doesn't trigger a sweep
+        self.low_watermark = 0.9
+
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, filename: str) -> str:
+        """Sharded path for a cache file: <cache_dir>/ab/cd/<filename>"""
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest[2:4], filename)
+
+    def lookup(self, *filenames: str) -> Optional[str]:
+        """
+        Return the cached path of the first filename present and record the access
+        
+        Counts as a single hit or miss however many candidate names are given.
+        """
+        for filename in filenames:
+            path = self.path_for(filename)
+            if os.path.isfile(path):
+                with self._lock:
+                    self.hits += 1
+                SATELLITE_CACHE_HITS.inc()
+                self.touch(path)
+                return path
+
+        with self._lock:
+            self.misses += 1
+        SATELLITE_CACHE_MISSES.inc()
+        return None
+
+    def touch(self, path: str):
+        """Record an access so LRU eviction keeps recently used images"""
+        try:
+            with get_db_context() as session:
+                session.query(SatelliteImage).filter(SatelliteImage.image_path == path).update({
+                    'last_accessed': datetime.utcnow(),
+                    'access_count': SatelliteImage.access_count + 1
+                }, synchronize_session=False)
+        except Exception as e:
+            logger.error(f"Error recording cache access for {path}: {str(e)}")
+
+    def store(self, filename: str, content: bytes, latitude: float, longitude: float,
+              date: str, source: str, resolution: Optional[str] = None) -> str:
+        """Write image bytes into the cache and record them in satellite_images"""
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        self._record(path, latitude, longitude, date, source, resolution, len(content),
+                     hashlib.sha256(content).hexdigest())
+        if self.max_bytes and self.occupancy_bytes() > self.max_bytes:
+            self._wake.set()
+        return path
+
+    def adopt(self, old_path: str, filename: str, latitude: float, longitude: float,
+              date: str, source: str, resolution: Optional[str] = None) -> Optional[str]:
+        """
+        Move a file cached under an older layout to its sharded path and record it
+
+        Returns the new path, or None if another process moved it first.
+        """
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(old_path, path)
+        except FileNotFoundError:
+            return None
+        try:
+            with get_db_context() as session:
+                # Rows recorded under the old path follow the file (its id stays valid)
+                old_rows = session.query(SatelliteImage).filter(SatelliteImage.image_path == old_path)
+                if session.query(SatelliteImage.id).filter(SatelliteImage.image_path == path).first() is None:
+                    old_rows.update({'image_path': path}, synchronize_session=False)
+                else:
+                    old_rows.delete(synchronize_session=False)
+        except Exception as e:
+            logger.error(f"Error moving cache records of {old_path}: {str(e)}")
+        # get_image hashes it on first serve
+        self._record(path, latitude, longitude, date, source, resolution, os.path.getsize(path), None)
+        return path
+
+    def _record(self, path: str, latitude: float, longitude: float, date: str, source: str,
+                resolution: Optional[str], size_bytes: int, content_hash: Optional[str]):
+        """Insert or refresh the satellite_images row of a cached file"""
+        now = datetime.utcnow()
+        try:
+            with get_db_context() as session:
+                record = session.query(SatelliteImage).filter(SatelliteImage.image_path == path).first()
+                if record is None:
+                    record = SatelliteImage(image_path=path, access_count=0)
+                    session.add(record)
+                record.latitude = latitude
+                record.longitude = longitude
+                record.date = date
+                record.source = source
+                record.resolution = resolution
+                record.size_bytes = size_bytes
+                record.content_hash = content_hash
+                record.last_accessed = now
+                record.timestamp = now
+        except Exception as e:
+            logger.error(f"Error recording cached image {path}: {str(e)}")
+
+    def image_id_for(self, path: str) -> Optional[int]:
+        """satellite_images id of a cached file, for building its serving URL"""
+        try:
+            with get_db_context() as session:
+                return session.query(SatelliteImage.id).filter(SatelliteImage.image_path == path).scalar()
+        except Exception as e:
+            logger.error(f"Error looking up cached image {path}: {str(e)}")
+            return None
+
+    def get_image(self, image_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Path and content hash of a cached image, or None if unknown or evicted
+
+        Rows cached before content hashes were recorded are hashed once here.
+        Access is recorded at most every TOUCH_INTERVAL, so repeat views don't
+        turn into a database write per request.
+        """
+        with get_db_context() as session:
+            record = session.query(SatelliteImage).filter(SatelliteImage.id == image_id).first()
+            if record is None or not os.path.isfile(record.image_path):
+                return None
+            if not record.content_hash:
+                digest = hashlib.sha256()
+                with open(record.image_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                record.content_hash = digest.hexdigest()
+            if record.last_accessed is None or datetime.utcnow() - record.last_accessed > TOUCH_INTERVAL:
+                record.last_accessed = datetime.utcnow()
+                record.access_count = (record.access_count or 0) + 1
+            return {
+                'id': record.id,
+                'image_path': record.image_path,
+                'content_hash': record.content_hash,
+                'size_bytes': record.size_bytes,
+                'timestamp': record.timestamp
+            }
+
+    def occupancy_bytes(self) -> int:
+        with get_db_context() as session:
+            return int(session.query(func.coalesce(func.sum(SatelliteImage.size_bytes), 0)).scalar())
+
+    def _evict(self, session, record: SatelliteImage):
+        try:
+            os.remove(record.image_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error evicting cached image {record.image_path}: {str(e)}")
+            return False
+        session.delete(record)
+        self.evictions += 1
+        return True
+
+    def sweep(self) -> int:
+        """Evict expired images, then least recently used ones until under budget"""
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+
+        evicted = 0
+        try:
+            with get_db_context() as session:
+                if self.ttl_seconds:
+                    expired_before = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+                    expired = session.query(SatelliteImage).filter(
+                        SatelliteImage.last_accessed < expired_before
+                    ).all()
+                    evicted += sum(1 for record in expired if self._evict(session, record))
+                    session.flush()
+
+                if self.max_bytes:
+                    total = int(session.query(func.coalesce(func.sum(SatelliteImage.size_bytes), 0)).scalar())
+                    target = int(self.max_bytes * self.low_watermark)
+                    if total > self.max_bytes:
+                        lru = session.query(SatelliteImage).order_by(
+                            SatelliteImage.last_accessed.asc()
+                        ).yield_per(500)
+                        for record in lru:
+                            if total <= target:
+                                break
+                            size = record.size_bytes or 0
+                            if self._evict(session, record):
+                                total -= size
+                                evicted += 1
+
+            if evicted:
+                logger.info(f"Satellite cache sweep evicted {evicted} images")
+            return evicted
+
+        except Exception as e:
+            logger.error(f"Error sweeping satellite cache: {str(e)}")
+            return evicted
+        finally:
+            self._sweep_lock.release()
+
+    def _sweep_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.sweep_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.sweep()
+
+    def start_sweeper(self):
+        """Start the background sweeper thread (idempotent)"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name='satellite-cache-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        self._wake.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache occupancy and hit-rate metrics"""
+        with get_db_context() as session:
+            files, total = session.query(
+                func.count(SatelliteImage.id),
+                func.coalesce(func.sum(SatelliteImage.size_bytes), 0)
+            ).one()
+
+        lookups = self.hits + self.misses
+        return {
+            'files': int(files),
+            'bytes': int(total),
+            'max_bytes': self.max_bytes,
+            'utilization': (int(total) / self.max_bytes) if self.max_bytes else None,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else None,
+            'evictions': self.evictions,
+            'sweeper_running': bool(self._sweeper and self._sweeper.is_alive())
+        }
@@ -0,0 +1,141 @@
+"""
+Classifier Service for CNN pollution classification
+Loads the Keras model once and classifies images in batches
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .image_sizes import CLASSIFIER_INPUT_SIZE
+from .stage_metrics import IMAGE_DECODE_SECONDS, MODEL_INFERENCE_SECONDS, observe_seconds
+from .tracing import start_span, traced
+
+logger = logging.getLogger(__name__)
+
+class ClassifierService:
+    def __init__(self, model_path: Optional[str] = None, class_names: Optional[List[str]] = None,
+                 input_size: Optional[Tuple[int, int]] = None):
+        self.model_path = model_path or os.getenv('MODEL_PATH', './models/pollution_cnn.h5')
+        self.input_size = input_size or (CLASSIFIER_INPUT_SIZE, CLASSIFIER_INPUT_SIZE)
+        self.batch_size = int(os.getenv('CLASSIFIER_BATCH_SIZE', 32))
+        self._class_names = class_names or self._class_names_from_env()
+        self._model = None
+        self._model_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _class_names_from_env(self) -> Optional[List[str]]:
+        raw = os.getenv('MODEL_CLASS_NAMES')
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return [name.strip() for name in raw.split(',') if name.strip()]
+
+    def get_model(self):
+        """Load the model on first use in this process"""
+        if self._model is None or self._model_pid != os.getpid():
+            with self._lock:
+                if self._model is None or self._model_pid != os.getpid():
+                    if self._model is not None:
+                        # TensorFlow's thread pools don't survive fork: inference on an inherited model hangs
+                        logger.warning("Classifier model was loaded before fork; reloading it in this process")
+                    if not os.path.isfile(self.model_path):
+                        raise FileNotFoundError(f"Model file not found: {self.model_path}")
+                    import tensorflow as tf
+                    self._model = tf.keras.models.load_model(self.model_path)
+                    self._model_pid = os.getpid()
+                    logger.info(f"Classifier model loaded from {self.model_path}")
+        return self._model
+
+    def class_names(self, num_outputs: int) -> List[str]:
+        if self._class_names and len(self._class_names) == max(num_outputs, 2):
+            return self._class_names
+        if num_outputs == 1:
+            # Binary sigmoid model from train_model.py
+            return ['clean_water', 'polluted']
+        from .verification_service import POLLUTION_CATEGORIES
+        return POLLUTION_CATEGORIES[:num_outputs]
+
+    @traced('classifier.prepare_image')
+    def prepare_image(self, image_path: str) -> np.ndarray:
+        """Center-crop, resize and scale to [-1, 1] as in predict.py"""
+        with start_span('image.decode', consumer='classifier'), observe_seconds(IMAGE_DECODE_SECONDS.labels('classifier')):
+            image = Image.open(image_path)
+            image.draft('RGB', self.input_size)
+            image = image.convert('RGB')
+        width, height = image.size
+        side = min(width, height)
+        left = (width - side) // 2
+        top = (height - side) // 2
+        image = image.crop((left, top, left + side, top + side)).resize(self.input_size)
+        # Equivalent to mobilenet_v2.preprocess_input, without importing TensorFlow
+        return np.asarray(image, dtype=np.float32) / 127.5 - 1.0
+
+    def predict_arrays(self, batch: np.ndarray) -> np.ndarray:
+        """Raw model outputs for a prepared batch"""
+        model = self.get_model()
+        with start_span('model.inference', batch_size=len(batch)), observe_seconds(MODEL_INFERENCE_SECONDS):
+            return model.predict(batch, verbose=0)
+
+    def _to_prediction(self, output: np.ndarray) -> Dict[str, Any]:
+        output = np.atleast_1d(output)
+        names = self.class_names(output.shape[-1])
+        if output.shape[-1] == 1:
+            prob_polluted = float(output[0])
+            if prob_polluted >= 0.5:
+                return {'category': names[1], 'confidence': prob_polluted}
+            return {'category': names[0], 'confidence': 1.0 - prob_polluted}
+        index = int(np.argmax(output))
+        return {'category': names[index], 'confidence': float(output[index])}
+
+    def classify_batch(self, image_paths: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Classify many images, batching model calls
+
+        Returns:
+            One dict per path: {'category', 'confidence'} or {'error'}
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(image_paths)
+        prepared = []
+        for index, path in enumerate(image_paths):
+            try:
+                prepared.append((index, self.prepare_image(path)))
+            except Exception as e:
+                logger.error(f"Error preparing image {path}: {str(e)}")
+                results[index] = {'error': str(e)}
+
+        for start in range(0, len(prepared), self.batch_size):
+            chunk = prepared[start:start + self.batch_size]
+            outputs = self.predict_arrays(np.stack([array for _, array in chunk]))
+            for (index, _), output in zip(chunk, outputs):
+                results[index] = self._to_prediction(output)
+
+        return results
+
+    def is_loaded(self) -> bool:
+        return self._model is not None and self._model_pid == os.getpid()
+
+    def unload(self):
+        """Drop the model; the next use loads it again"""
+        with self._lock:
+            self._model = None
+
+
+_classifier_service: Optional[ClassifierService] = None
+_classifier_service_lock = threading.Lock()
+
+def get_classifier_service() -> ClassifierService:
+    """Get the process-wide ClassifierService (each process loads its own model)"""
+    global _classifier_service
+    if _classifier_service is None:
+        with _classifier_service_lock:
+            if _classifier_service is None:
+                _classifier_service = ClassifierService()
+    return _classifier_service
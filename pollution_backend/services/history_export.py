@@ -0,0 +1,116 @@
+"""
+Chunked writers for exporting verification history
+Each writer consumes an iterator of row dicts and yields encoded chunks, so a
+full-history export never holds more than one chunk in memory
+"""
+
+import io
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .verification_service import HISTORY_COLUMNS
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def parquet_available() -> bool:
+    """Parquet export needs the optional pyarrow package"""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _batched(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def export_ndjson(rows: Iterable[Dict[str, Any]], chunk_size: int = 1000) -> Iterator[bytes]:
+    for batch in _batched(rows, chunk_size):
+        yield ''.join(json.dumps(row) + '\n' for row in batch).encode('utf-8')
+
+def export_csv(rows: Iterable[Dict[str, Any]], chunk_size: int = 1000) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=HISTORY_COLUMNS)
+    writer.writeheader()
+    for batch in _batched(rows, chunk_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken as they are produced"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def export_parquet(rows: Iterable[Dict[str, Any]], chunk_size: int = 10000) -> Iterator[bytes]:
+    """One Parquet row group per chunk; bytes are emitted as each row group is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('report_id', pa.int64()),
+        ('user_image_path', pa.string()),
+        ('satellite_image_path', pa.string()),
+        ('user_category', pa.string()),
+        ('satellite_category', pa.string()),
+        ('user_confidence', pa.float64()),
+        ('satellite_confidence', pa.float64()),
+        ('verified', pa.bool_()),
+        ('reason', pa.string()),
+        ('timestamp', pa.string()),
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _batched(rows, chunk_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+EXPORT_WRITERS = {
+    'ndjson': export_ndjson,
+    'csv': export_csv,
+    'parquet': export_parquet,
+}
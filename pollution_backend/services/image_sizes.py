@@ -0,0 +1,55 @@
+"""
+Output size registry for satellite imagery
+Maps each image consumer to the pixel dimensions it actually uses, so providers
+are asked for exactly that many pixels instead of a fixed 512x512
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+# verify_report.py passes OUTPUT_SIZES to satdata_client's SentinelClient; keep this module dependency-free
+CLASSIFIER_INPUT_SIZE = int(os.getenv('CLASSIFIER_INPUT_SIZE', 224))
+HEATMAP_STRIDE = int(os.getenv('HEATMAP_STRIDE', 112))
+HEATMAP_WINDOWS_PER_SIDE = int(os.getenv('HEATMAP_WINDOWS_PER_SIDE', 3))
+ANALYSIS_SIZE = int(os.getenv('ANALYSIS_SIZE', 256))
+PREVIEW_SIZE = int(os.getenv('PREVIEW_SIZE', 512))
+
+DEFAULT_CONSUMER = os.getenv('SATELLITE_DEFAULT_CONSUMER', 'classifier')
+
+def heatmap_size(windows_per_side: int = HEATMAP_WINDOWS_PER_SIDE,
+                 window: int = CLASSIFIER_INPUT_SIZE, stride: int = HEATMAP_STRIDE) -> int:
+    """Side length covered exactly by a grid of sliding windows"""
+    return window + stride * (windows_per_side - 1)
+
+OUTPUT_SIZES: Dict[str, Tuple[int, int]] = {
+    # The classifier center-crops to a square and resizes to its input size
+    'classifier': (CLASSIFIER_INPUT_SIZE, CLASSIFIER_INPUT_SIZE),
+    # Sliding-window heatmaps need a whole number of strides past the first window
+    'heatmap': (heatmap_size(), heatmap_size()),
+    # Color analysis only needs enough pixels for stable channel statistics
+    'analysis': (ANALYSIS_SIZE, ANALYSIS_SIZE),
+    'preview': (PREVIEW_SIZE, PREVIEW_SIZE),
+}
+
+def resolve_output_size(consumer: Optional[str] = None,
+                        size: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+    """
+    Resolve the (width, height) to request from a provider
+
+    Args:
+        consumer: Registered consumer name (defaults to SATELLITE_DEFAULT_CONSUMER)
+        size: Explicit (width, height), overrides the consumer
+
+    Returns:
+        (width, height) in pixels
+    """
+    if size is not None:
+        width, height = int(size[0]), int(size[1])
+        if width <= 0 or height <= 0 or max(width, height) > 2500:
+            raise ValueError(f"Invalid output size: {width}x{height}")
+        return width, height
+
+    consumer = consumer or DEFAULT_CONSUMER
+    if consumer not in OUTPUT_SIZES:
+        raise ValueError(f"Unknown image consumer: {consumer}")
+    return OUTPUT_SIZES[consumer]
@@ -0,0 +1,204 @@
+"""
+Job Service for running slow operations in the background
+Jobs are persisted in the database and executed by a bounded local worker pool
+"""
+
+import os
+import json
+import uuid
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..database.models import Job
+from ..database.connection import get_db_context
+from .tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+class JobService:
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', 4))
+        self.max_pending = max_pending or int(os.getenv('JOB_QUEUE_LIMIT', 100))
+        self.stale_after = timedelta(seconds=int(os.getenv('JOB_STALE_SECONDS', 600)))
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._finished = threading.Condition()
+        self._pending = 0
+        self._pending_pid: Optional[int] = None
+
+    def register(self, kind: str, handler: Callable[..., Any]):
+        """Register a handler; it is called with the job params as keyword arguments"""
+        self._handlers[kind] = handler
+
+    def has_handler(self, kind: str) -> bool:
+        return kind in self._handlers
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Worker threads don't survive fork: a preloaded service gets a fresh pool per process
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='job-worker'
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _reserve(self) -> bool:
+        """Reserve a slot in the local worker queue"""
+        with self._lock:
+            # Jobs pending in the process this one was forked from don't run here
+            if self._pending_pid != os.getpid():
+                self._pending = 0
+                self._pending_pid = os.getpid()
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Optional[str]:
+        """
+        Persist a new job and queue it for execution
+
+        Returns:
+            Job id, or None if the worker queue is full
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        if not self._reserve():
+            logger.warning(f"Job queue full, rejecting {kind} job")
+            return None
+
+        job_id = uuid.uuid4().hex
+        try:
+            with get_db_context() as session:
+                session.add(Job(id=job_id, kind=kind, status='queued', params=json.dumps(params)))
+        except Exception:
+            self._release()
+            raise
+
+        self._get_executor().submit(self._run, job_id)
+        return job_id
+
+    def _claim(self, job_id: str) -> Optional[Job]:
+        """Atomically move a job from queued to running so only one worker executes it"""
+        with get_db_context() as session:
+            claimed = session.query(Job).filter(
+                Job.id == job_id, Job.status == 'queued'
+            ).update({'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False)
+            if not claimed:
+                return None
+            job = session.query(Job).filter(Job.id == job_id).first()
+            session.expunge(job)
+            return job
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with get_db_context() as session:
+            session.query(Job).filter(Job.id == job_id).update({
+                'status': status,
+                'result': json.dumps(result) if result is not None else None,
+                'error': error,
+                'finished_at': datetime.utcnow()
+            }, synchronize_session=False)
+
+    def _run(self, job_id: str):
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                return
+
+            try:
+                handler = self._handlers[job.kind]
+                with start_span(f'job.{job.kind}', job_id=job_id):
+                    result = handler(**json.loads(job.params))
+                self._finish(job_id, 'succeeded', result=result)
+                logger.info(f"Job {job_id} ({job.kind}) succeeded")
+            except Exception as e:
+                logger.error(f"Job {job_id} ({job.kind}) failed: {str(e)}")
+                self._finish(job_id, 'failed', error=str(e))
+        except Exception as e:
+            logger.error(f"Error running job {job_id}: {str(e)}")
+        finally:
+            self._release()
+            with self._finished:
+                self._finished.notify_all()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job status and result"""
+        try:
+            with get_db_context() as session:
+                job = session.query(Job).filter(Job.id == job_id).first()
+                return self._to_dict(job) if job else None
+        except Exception as e:
+            logger.error(f"Error getting job {job_id}: {str(e)}")
+            return None
+
+    def wait_for_job(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll a job until it finishes or the timeout expires
+
+        Local completions wake waiters immediately; the periodic re-read covers
+        jobs executed by other worker processes.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(min(remaining, 1.0))
+
+    def recover_jobs(self) -> int:
+        """Re-queue jobs left unfinished by a previous process"""
+        try:
+            stale_before = datetime.utcnow() - self.stale_after
+            with get_db_context() as session:
+                session.query(Job).filter(
+                    Job.status == 'running', Job.started_at < stale_before
+                ).update({'status': 'queued', 'started_at': None}, synchronize_session=False)
+                job_ids = [
+                    row.id for row in session.query(Job.id).filter(
+                        Job.status == 'queued', Job.kind.in_(list(self._handlers))
+                    ).order_by(Job.created_at)
+                ]
+
+            recovered = 0
+            for job_id in job_ids:
+                if not self._reserve():
+                    break
+                self._get_executor().submit(self._run, job_id)
+                recovered += 1
+            if recovered:
+                logger.info(f"Recovered {recovered} unfinished jobs")
+            return recovered
+
+        except Exception as e:
+            logger.error(f"Error recovering jobs: {str(e)}")
+            return 0
+
+    def _to_dict(self, job: Job) -> Dict[str, Any]:
+        return {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'params': json.loads(job.params),
+            'result': json.loads(job.result) if job.result else None,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
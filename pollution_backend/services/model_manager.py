@@ -0,0 +1,317 @@
+"""
+Model manager
+Serves the ModelVersion marked is_active: a new version is loaded and warmed up
+off the request path, swapped in atomically, and the old model is released once
+the batches using it have finished
+"""
+
+import os
+import gc
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from ..database.models import ModelVersion
+from ..database.connection import get_db_context
+
+# classifier_service pulls in numpy and PIL; the admin API imports this module at startup
+if TYPE_CHECKING:
+    from .classifier_service import ClassifierService
+
+logger = logging.getLogger(__name__)
+
+MODEL_POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', 30))
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'True').lower() == 'true'
+# Label of the MODEL_PATH model served until a ModelVersion is active
+MODEL_VERSION = os.getenv('MODEL_VERSION', 'default')
+
+class ServingModel:
+    """A loaded model version and the number of batches using it"""
+
+    def __init__(self, version: str, classifier: 'ClassifierService', key: Optional[Tuple] = None):
+        self.version = version
+        self.classifier = classifier
+        # (id, version, model_path) of the ModelVersion row it was loaded from
+        self.key = key
+        self.loaded_at = datetime.utcnow()
+        self.leases = 0
+        self.retired = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'model_path': self.classifier.model_path,
+            'loaded': self.classifier.is_loaded(),
+            'loaded_at': self.loaded_at.isoformat(),
+            'leases': self.leases
+        }
+
+class ModelManager:
+    """
+    Hands out leases on the serving model and follows ModelVersion.is_active
+
+    A background thread checks the active version every poll_seconds (refresh()
+    checks immediately). A changed version is loaded and warmed up in that
+    thread while the current model keeps serving, then swapped in under a lock.
+    Batches that took their lease before the swap finish on the old model; it
+    is unloaded when the last of them ends.
+    """
+
+    def __init__(self, fallback: Optional['ClassifierService'] = None, poll_seconds: float = MODEL_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._fallback = fallback
+        self._current: Optional[ServingModel] = None
+        self._retiring: List[ServingModel] = []
+        self._lock = threading.Lock()
+        # One refresh at a time, so a version is never loaded twice concurrently
+        self._refresh_lock = threading.Lock()
+        self._poller_lock = threading.Lock()
+        self._poller_pid: Optional[int] = None
+        self._failed_key: Optional[Tuple] = None
+        self.swaps = 0
+        self.last_checked: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def _serving_locked(self) -> ServingModel:
+        if self._current is None:
+            from .classifier_service import get_classifier_service
+            self._current = ServingModel(MODEL_VERSION, self._fallback or get_classifier_service())
+        return self._current
+
+    def serving(self) -> ServingModel:
+        """The model new leases get (without taking a lease)"""
+        with self._lock:
+            return self._serving_locked()
+
+    @contextmanager
+    def lease(self):
+        """
+        Use the serving model for one batch
+
+        Usage:
+            with model_manager.lease() as serving:
+                predictions = serving.classifier.classify_batch(paths)
+        """
+        self.start_poller()
+        with self._lock:
+            serving = self._serving_locked()
+            serving.leases += 1
+        try:
+            yield serving
+        finally:
+            with self._lock:
+                serving.leases -= 1
+                release = serving.retired and serving.leases == 0
+            if release:
+                self._release(serving)
+
+    def refresh(self) -> bool:
+        """
+        Check the active ModelVersion now and swap to it if it changed
+
+        Returns:
+            True if a new version was swapped in
+        """
+        with self._refresh_lock:
+            self.last_checked = datetime.utcnow()
+            try:
+                row = self._active_version()
+            except Exception as e:
+                self.last_error = f"version check: {str(e)}"
+                logger.error(f"Model version check failed: {str(e)}")
+                return False
+            if row is None:
+                return False
+            key = self._key(row)
+            if key == self.serving().key or key == self._failed_key:
+                return False
+
+            logger.info(f"Loading model version {row['version']} from {row['model_path']}")
+            try:
+                candidate = self._load(row, key)
+            except Exception as e:
+                # Keep serving the current model; retry only once the active row changes
+                self._failed_key = key
+                self.last_error = f"{row['version']}: {str(e)}"
+                logger.error(f"Failed to load model version {row['version']}: {str(e)}")
+                return False
+
+            self._failed_key = None
+            self.last_error = None
+            self._swap(candidate)
+            return True
+
+    def activate(self, version: str) -> bool:
+        """
+        Load and warm up a ModelVersion here, then make it the only active row and swap to it
+
+        is_active changes only once the version has loaded, so a version that
+        cannot serve is never picked up by the other workers' polls.
+
+        Returns:
+            True if a new version was swapped in (False if it was already serving)
+
+        Raises:
+            LookupError: No such version
+            Exception: The version failed to load or warm up; nothing was changed
+        """
+        with self._refresh_lock:
+            row = self._version_row(ModelVersion.version == version)
+            if row is None:
+                raise LookupError(f"Model version {version} not found")
+            key = self._key(row)
+
+            candidate = None
+            if key != self.serving().key:
+                logger.info(f"Loading model version {row['version']} from {row['model_path']}")
+                try:
+                    candidate = self._load(row, key)
+                except Exception as e:
+                    self.last_error = f"{row['version']}: {str(e)}"
+                    logger.error(f"Failed to load model version {row['version']}: {str(e)}")
+                    raise
+
+            try:
+                with get_db_context() as session:
+                    session.query(ModelVersion).filter(ModelVersion.id != row['id']).update(
+                        {'is_active': False}, synchronize_session=False
+                    )
+                    session.query(ModelVersion).filter(ModelVersion.id == row['id']).update(
+                        {'is_active': True}, synchronize_session=False
+                    )
+            except Exception:
+                if candidate is not None:
+                    candidate.classifier.unload()
+                raise
+
+            self._failed_key = None
+            self.last_error = None
+            if candidate is None:
+                return False
+            self._swap(candidate)
+            return True
+
+    @staticmethod
+    def _key(row: Dict[str, Any]) -> Tuple:
+        return row['id'], row['version'], row['model_path']
+
+    def _active_version(self) -> Optional[Dict[str, Any]]:
+        return self._version_row(ModelVersion.is_active.is_(True))
+
+    def _version_row(self, *criteria) -> Optional[Dict[str, Any]]:
+        """Newest ModelVersion matching criteria, as a plain dict"""
+        with get_db_context() as session:
+            row = (session.query(ModelVersion)
+                   .filter(*criteria)
+                   .order_by(ModelVersion.created_at.desc(), ModelVersion.id.desc())
+                   .first())
+            if row is None:
+                return None
+            return {
+                'id': row.id,
+                'version': row.version,
+                'model_path': row.model_path,
+                'class_names': row.class_names,
+                'input_size': row.input_size
+            }
+
+    def _load(self, row: Dict[str, Any], key: Tuple) -> ServingModel:
+        """Load and warm up a version; raises if it cannot serve"""
+        try:
+            class_names = json.loads(row['class_names']) if row['class_names'] else None
+        except ValueError:
+            class_names = [name.strip() for name in row['class_names'].split(',') if name.strip()]
+        width, height = (int(value) for value in row['input_size'].lower().split('x'))
+
+        from .classifier_service import ClassifierService
+        classifier = ClassifierService(model_path=row['model_path'], class_names=class_names,
+                                       input_size=(width, height))
+        classifier.get_model()
+        if MODEL_WARMUP:
+            self._warm_up(classifier, class_names)
+        return ServingModel(row['version'], classifier, key)
+
+    @staticmethod
+    def _warm_up(classifier: 'ClassifierService', class_names: Optional[List[str]]):
+        """
+        Run one full-size batch so the first real batch doesn't pay for graph
+        tracing and buffer allocation, and check the outputs match the class names
+        """
+        import numpy as np
+
+        width, height = classifier.input_size
+        outputs = classifier.predict_arrays(np.zeros((classifier.batch_size, height, width, 3), dtype=np.float32))
+        num_outputs = outputs.shape[-1]
+        if class_names and len(class_names) != max(num_outputs, 2):
+            raise ValueError(f"Model has {num_outputs} outputs but {len(class_names)} class names")
+
+    def _swap(self, candidate: ServingModel):
+        with self._lock:
+            previous = self._serving_locked()
+            self._current = candidate
+            self.swaps += 1
+            previous.retired = True
+            release = previous.leases == 0
+            if not release:
+                self._retiring.append(previous)
+        logger.info(f"Serving model version {candidate.version} (was {previous.version})")
+        if release:
+            self._release(previous)
+
+    def _release(self, serving: ServingModel):
+        with self._lock:
+            if serving in self._retiring:
+                self._retiring.remove(serving)
+        serving.classifier.unload()
+        gc.collect()
+        logger.info(f"Released model version {serving.version}")
+
+    def start_poller(self):
+        """
+        Start the polling thread in this process, if not already running
+
+        Called at app start, in each gunicorn worker after fork (threads don't
+        survive it), and on every lease as a fallback.
+        """
+        if self.poll_seconds <= 0 or self._poller_pid == os.getpid():
+            return
+        with self._poller_lock:
+            if self._poller_pid != os.getpid():
+                self._poller_pid = os.getpid()
+                threading.Thread(target=self._poll, name='model-poller', daemon=True).start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model refresh failed: {str(e)}")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'serving': self._serving_locked().to_dict(),
+                'retiring': [serving.to_dict() for serving in self._retiring],
+                'swaps': self.swaps,
+                'poll_seconds': self.poll_seconds,
+                'last_checked': self.last_checked.isoformat() if self.last_checked else None,
+                'last_error': self.last_error,
+                'pid': os.getpid()
+            }
+
+_model_manager: Optional[ModelManager] = None
+_model_manager_lock = threading.Lock()
+
+def get_model_manager() -> ModelManager:
+    """Get the process-wide ModelManager, creating it on first use"""
+    global _model_manager
+    if _model_manager is None:
+        with _model_manager_lock:
+            if _model_manager is None:
+                _model_manager = ModelManager()
+    return _model_manager
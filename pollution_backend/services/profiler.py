@@ -0,0 +1,168 @@
+"""
+Opt-in request profiling
+Runs cProfile around selected requests and keeps the most recent profiles
+(pstats dumps plus a JSON summary) in a bounded directory
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import pstats
+import random
+import logging
+import cProfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', './data/profiles')
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 25))
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+class ProfileStore:
+    """Directory of recent profiles, pruned to the newest max_files"""
+
+    def __init__(self, profile_dir: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.profile_dir = profile_dir
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.profile_dir, f"{profile_id}.{extension}")
+
+    def save(self, profiler: cProfile.Profile, metadata: Dict[str, Any]) -> str:
+        """
+        Write a profile and its summary
+
+        Returns:
+            The profile id
+        """
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(self._path(profile_id, 'prof'))
+
+        summary = dict(metadata, id=profile_id, top_functions=self._top_functions(stats))
+        with open(self._path(profile_id, 'json'), 'w') as f:
+            json.dump(summary, f)
+
+        self._prune()
+        return profile_id
+
+    @staticmethod
+    def _top_functions(stats: pstats.Stats) -> List[Dict[str, Any]]:
+        """Functions with the most cumulative time"""
+        rows = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'total_seconds': round(total, 6),
+                'cumulative_seconds': round(cumulative, 6)
+            })
+        rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+        return rows[:PROFILE_TOP_FUNCTIONS]
+
+    def _prune(self):
+        with self._lock:
+            ids = self._ids()
+            for profile_id in ids[:-self.max_files] if self.max_files > 0 else ids:
+                for extension in ('prof', 'json'):
+                    try:
+                        os.remove(self._path(profile_id, extension))
+                    except FileNotFoundError:
+                        pass
+
+    def _ids(self) -> List[str]:
+        """Profile ids, oldest first (ids start with a UTC timestamp)"""
+        try:
+            names = os.listdir(self.profile_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith('.json'))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of stored profiles, newest first, without the function tables"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            summary = self.get(profile_id)
+            if summary:
+                summary.pop('top_functions', None)
+                profiles.append(summary)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, 'json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def pstats_path(self, profile_id: str) -> Optional[str]:
+        """Path of the pstats dump, or None if the id is unknown"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self._path(profile_id, 'prof')
+        return path if os.path.isfile(path) else None
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and runs them under cProfile
+
+    At most one request is profiled at a time; others run unprofiled, so a burst
+    of flagged requests cannot multiply the profiling overhead.
+    """
+
+    def __init__(self, store: ProfileStore, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.store = store
+        self.sample_rate = sample_rate
+        self._active = threading.Lock()
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, func, metadata: Dict[str, Any], *args, **kwargs):
+        """
+        Call func under cProfile
+
+        Returns:
+            (result, profile_id); profile_id is None if another profile was in progress
+        """
+        if not self._active.acquire(blocking=False):
+            return func(*args, **kwargs), None
+
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                elapsed = time.perf_counter() - started
+        finally:
+            self._active.release()
+
+        try:
+            profile_id = self.store.save(profiler, dict(
+                metadata,
+                duration_seconds=round(elapsed, 6),
+                created_at=datetime.utcnow().isoformat()
+            ))
+        except Exception as e:
+            logger.error(f"Failed to save profile: {str(e)}")
+            profile_id = None
+        return result, profile_id
+
+profile_store = ProfileStore()
+request_profiler = RequestProfiler(profile_store)
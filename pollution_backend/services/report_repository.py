@@ -0,0 +1,90 @@
+"""
+Report Repository for reading pollution reports from the reporting app's database
+Reports are created by the Node/Supabase backend; this side only reads them
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from sqlalchemy import MetaData, Table, create_engine, select
+
+from ..database.connection import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+REPORTS_TABLE = os.getenv('REPORTS_TABLE', 'reports')
+REPORTS_DATABASE_URL = os.getenv('REPORTS_DATABASE_URL')
+REPORT_IMAGE_DIR = os.getenv('REPORT_IMAGE_DIR', './data/report_images')
+
+class ReportRepository:
+    def __init__(self):
+        self.engine = create_engine(REPORTS_DATABASE_URL, pool_pre_ping=True) if REPORTS_DATABASE_URL else default_engine
+        self.image_dir = REPORT_IMAGE_DIR
+        self._table: Optional[Table] = None
+        self._lock = threading.Lock()
+
+    def _get_table(self) -> Table:
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = Table(REPORTS_TABLE, MetaData(), autoload_with=self.engine)
+        return self._table
+
+    def get_reports(self, report_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Load many reports with one query, keyed by report id"""
+        report_ids = list(report_ids)
+        if not report_ids:
+            return {}
+
+        table = self._get_table()
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(table).where(table.c.id.in_(report_ids))).mappings().all()
+
+        reports = {}
+        for row in rows:
+            created_at = row.get('created_at')
+            if hasattr(created_at, 'strftime'):
+                report_date = created_at.strftime('%Y-%m-%d')
+            else:
+                report_date = str(created_at)[:10] if created_at else None
+            reports[row['id']] = {
+                'id': row['id'],
+                'latitude': float(row['lat']),
+                'longitude': float(row['lng']),
+                'pollution_type': row.get('pollution_type') or 'unknown',
+                'image_path': row.get('photo_url') or '',
+                'date': report_date
+            }
+        return reports
+
+    def get_user_image(self, report: Dict[str, Any]) -> Optional[str]:
+        """Local path of the report photo, downloading it once if it is a URL"""
+        image_path = report.get('image_path')
+        if not image_path:
+            return None
+
+        parsed = urlparse(image_path)
+        if parsed.scheme not in ('http', 'https'):
+            return image_path if os.path.isfile(image_path) else None
+
+        extension = os.path.splitext(parsed.path)[1] or '.jpg'
+        local_path = os.path.join(self.image_dir, f"report_{report['id']}{extension}")
+        if os.path.isfile(local_path):
+            return local_path
+
+        import requests
+        
+        os.makedirs(self.image_dir, exist_ok=True)
+        response = requests.get(image_path, timeout=30)
+        if response.status_code != 200:
+            logger.error(f"Report image download failed for report {report['id']}: {response.status_code}")
+            return None
+
+        tmp_path = f"{local_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, local_path)
+        return local_path
@@ -0,0 +1,129 @@
+"""
+Request metrics: streaming latency quantiles and buffered API usage records
+"""
+
+import os
+import math
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from ..database.models import APIUsage
+from ..database.connection import get_db_context, wait_for_db
+from .write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with bounded relative error (DDSketch-style)
+
+    Values are counted in logarithmic buckets, so memory depends on the dynamic
+    range of the data rather than the number of observations, and any quantile
+    is answered within `relative_accuracy` of the true value.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(k-1), gamma^k] in relative terms
+                return 2 * self.gamma ** key / (1 + self.gamma)
+        return self.max
+
+    def merge(self, other: 'QuantileSketch'):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+class LatencyRegistry:
+    """Per-endpoint latency sketches for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        self.started_at = datetime.utcnow()
+
+    def record(self, method: str, endpoint: str, response_time_ms: float):
+        with self._lock:
+            sketch = self._sketches.get((method, endpoint))
+            if sketch is None:
+                sketch = self._sketches[(method, endpoint)] = QuantileSketch()
+            sketch.add(response_time_ms)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._sketches.items())
+            rows = []
+            for (method, endpoint), sketch in sorted(items):
+                rows.append({
+                    'endpoint': endpoint,
+                    'method': method,
+                    'count': sketch.count,
+                    'mean_ms': sketch.total / sketch.count if sketch.count else None,
+                    'p50_ms': sketch.quantile(0.50),
+                    'p90_ms': sketch.quantile(0.90),
+                    'p99_ms': sketch.quantile(0.99),
+                    'max_ms': sketch.max
+                })
+        return rows
+
+def persist_api_usage(rows: List[Dict[str, Any]]):
+    """Bulk-insert buffered API usage rows"""
+    # Requests can finish (e.g. /health) before the tables exist
+    wait_for_db()
+    with get_db_context() as session:
+        session.execute(insert(APIUsage), rows)
+
+latency_registry = LatencyRegistry()
+
+_usage_queue: Optional[WriteBehindQueue] = None
+_usage_queue_lock = threading.Lock()
+
+def get_usage_queue() -> WriteBehindQueue:
+    """Get the process-wide API usage write-behind queue"""
+    global _usage_queue
+    if _usage_queue is None:
+        with _usage_queue_lock:
+            if _usage_queue is None:
+                _usage_queue = WriteBehindQueue(
+                    persist_api_usage,
+                    name='api-usage-writer',
+                    max_batch_rows=int(os.getenv('API_USAGE_BATCH_ROWS', 500)),
+                    flush_interval_ms=float(os.getenv('API_USAGE_FLUSH_MS', 1000)),
+                    max_queue=int(os.getenv('API_USAGE_QUEUE_SIZE', 50000))
+                )
+    return _usage_queue
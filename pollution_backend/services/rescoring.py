@@ -0,0 +1,157 @@
+"""
+Vectorized re-scoring of stored verifications
+Re-applies the compare_predictions decision rules to the whole history with numpy,
+so threshold changes can be evaluated against millions of rows in seconds
+"""
+
+import os
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import update
+
+from ..database.models import VerificationResult
+from ..database.connection import get_db_session
+
+logger = logging.getLogger(__name__)
+
+RESCORE_CHUNK_SIZE = int(os.getenv('RESCORE_CHUNK_SIZE', 100000))
+
+class CategoryCodes:
+    """Growing category vocabulary with a matching pairwise similarity matrix"""
+
+    def __init__(self, verification_service):
+        self.verification_service = verification_service
+        self.codes: Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def encode(self, categories: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Map an object array of category names to integer codes
+
+        Returns:
+            (codes, valid) where valid is False for missing/empty categories
+        """
+        names = np.where(categories == None, '', categories).astype(str)  # noqa: E711
+        uniques, inverse = np.unique(names, return_inverse=True)
+
+        new = [name for name in uniques if name not in self.codes]
+        if new:
+            for name in new:
+                self.codes[name] = len(self.codes)
+            self._rebuild_matrix()
+
+        lookup = np.array([self.codes[name] for name in uniques], dtype=np.int64)
+        return lookup[inverse], names != ''
+
+    def _rebuild_matrix(self):
+        names = sorted(self.codes, key=self.codes.get)
+        similarity = self.verification_service._calculate_category_similarity
+        self.matrix = np.array(
+            [[similarity(a, b) for b in names] for a in names], dtype=np.float32
+        )
+
+def decide(codes: CategoryCodes, user_codes: np.ndarray, satellite_codes: np.ndarray, valid: np.ndarray,
+           user_confidence: np.ndarray, satellite_confidence: np.ndarray,
+           confidence_threshold: float, category_match_threshold: float) -> np.ndarray:
+    """Vectorized equivalent of VerificationService.compare_predictions' verdict"""
+    confident = (user_confidence >= confidence_threshold) & (satellite_confidence >= confidence_threshold)
+    similar = codes.matrix[user_codes, satellite_codes] >= category_match_threshold
+    return valid & confident & ((user_codes == satellite_codes) | similar)
+
+def rescore_verifications(verification_service, dry_run: bool = False,
+                          chunk_size: int = RESCORE_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Re-evaluate all verification results with the service's current thresholds
+
+    Rows are read in id order, chunk_size at a time, as column arrays. Only rows
+    whose verdict changes are written back, in one bulk UPDATE per chunk.
+
+    Returns:
+        Summary with rows scanned, verdict changes and throughput
+    """
+    started = time.perf_counter()
+    confidence_threshold = verification_service.confidence_threshold
+    category_match_threshold = verification_service.category_match_threshold
+    codes = CategoryCodes(verification_service)
+
+    scanned = 0
+    newly_verified = 0
+    newly_rejected = 0
+    last_id = 0
+
+    session = get_db_session()
+    try:
+        while True:
+            rows = session.query(
+                VerificationResult.id,
+                VerificationResult.user_category,
+                VerificationResult.satellite_category,
+                VerificationResult.user_confidence,
+                VerificationResult.satellite_confidence,
+                VerificationResult.verified
+            ).filter(VerificationResult.id > last_id).order_by(VerificationResult.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            ids, user_categories, satellite_categories, user_confidence, satellite_confidence, stored = (
+                np.array(column, dtype=object) for column in zip(*rows)
+            )
+            last_id = int(ids[-1])
+            scanned += len(rows)
+
+            user_codes, user_valid = codes.encode(user_categories)
+            satellite_codes, satellite_valid = codes.encode(satellite_categories)
+            # Missing confidences count as 0, as in compare_predictions
+            user_confidence = np.where(user_confidence == None, 0.0, user_confidence).astype(np.float64)  # noqa: E711
+            satellite_confidence = np.where(satellite_confidence == None, 0.0, satellite_confidence).astype(np.float64)  # noqa: E711
+
+            verdicts = decide(codes, user_codes, satellite_codes, user_valid & satellite_valid,
+                              user_confidence, satellite_confidence,
+                              confidence_threshold, category_match_threshold)
+            changed = np.flatnonzero(verdicts != stored.astype(bool))
+            if not len(changed):
+                continue
+
+            newly_verified += int(verdicts[changed].sum())
+            newly_rejected += int(len(changed) - verdicts[changed].sum())
+            if dry_run:
+                continue
+
+            # Reasons are only regenerated for the (usually few) rows that flipped
+            updates: List[Dict[str, Any]] = []
+            for index in changed:
+                comparison = verification_service.compare_predictions(
+                    {'category': user_categories[index], 'confidence': user_confidence[index]},
+                    {'category': satellite_categories[index], 'confidence': satellite_confidence[index]}
+                )
+                updates.append({
+                    'id': int(ids[index]),
+                    'verified': bool(verdicts[index]),
+                    'reason': comparison['reason']
+                })
+            session.execute(update(VerificationResult), updates)
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    elapsed = time.perf_counter() - started
+    changed_total = newly_verified + newly_rejected
+    logger.info(f"Rescored {scanned} verifications in {elapsed:.2f}s, {changed_total} verdicts changed")
+
+    return {
+        'confidence_threshold': confidence_threshold,
+        'category_match_threshold': category_match_threshold,
+        'dry_run': dry_run,
+        'rows_scanned': scanned,
+        'changed': changed_total,
+        'newly_verified': newly_verified,
+        'newly_rejected': newly_rejected,
+        'seconds': round(elapsed, 4),
+        'rows_per_second': (scanned / elapsed) if elapsed > 0 else None
+    }
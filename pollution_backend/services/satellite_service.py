@@ -4,27 +4,47 @@ Supports Google Earth Engine and Sentinel Hub APIs
 """
 
 import os
+import re
 import logging
-import requests
 import json
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-import ee
-from PIL import Image
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 import io
 
+# ee, requests, PIL and numpy are imported where they are used: together they
+# dominate import time, and most processes touch only some of them
+if TYPE_CHECKING:
+    import numpy as np
+
+from .cache_manager import SatelliteCacheManager
+from .image_sizes import resolve_output_size, ANALYSIS_SIZE
+from .stage_metrics import (
+    SATELLITE_FETCH_SECONDS, IMAGE_DECODE_SECONDS, ANALYZE_IMAGE_SECONDS, observe_seconds
+)
+from .tracing import start_span
+
 logger = logging.getLogger(__name__)
 
+# Cache file names before per-size names and sharded directories: <cache_dir>/<prefix>_<lat>_<lon>_<YYYYMMDD>.jpg
+FLAT_CACHE_NAME = re.compile(r'^(satellite|sentinel|landsat)_(-?\d+(?:\.\d+)?)_(-?\d+(?:\.\d+)?)_(\d{8})\.jpg$')
+PREFIX_SOURCES = {'satellite': 'google_earth', 'sentinel': 'sentinel_hub', 'landsat': 'landsat'}
+
 class SatelliteService:
     def __init__(self):
         self.ee_initialized = False
         self.sentinel_hub_url = os.getenv('SENTINEL_HUB_URL', 'https://services.sentinel-hub.com/api/v1/process')
         self.sentinel_hub_token = os.getenv('SENTINEL_HUB_TOKEN')
+        self.landsat_url = os.getenv('NASA_EARTH_IMAGERY_URL', 'https://api.nasa.gov/planetary/earth/imagery')
         self.google_earth_engine_key = os.getenv('GOOGLE_EARTH_ENGINE_KEY')
         self.satellite_cache_dir = os.getenv('SATELLITE_CACHE_DIR', './data/satellite_images')
         
-        # Create cache directory
-        os.makedirs(self.satellite_cache_dir, exist_ok=True)
+        # Cache manager creates the cache directory and keeps it within budget
+        self.cache = SatelliteCacheManager(self.satellite_cache_dir)
+        self.cache.start_sweeper()
+        if self._flat_cache_files():
+            threading.Thread(target=self.migrate_flat_cache, name='satellite-cache-migrate', daemon=True).start()
         
         # Initialize Google Earth Engine if key is provided
         if self.google_earth_engine_key:
@@ -33,6 +53,8 @@ class SatelliteService:
     def _initialize_google_earth_engine(self):
         """Initialize Google Earth Engine"""
         try:
+            import ee
+            
             # Set up authentication (this would need to be configured properly)
             # ee.Authenticate()  # This requires user interaction
             # ee.Initialize()
@@ -42,7 +64,9 @@ class SatelliteService:
             logger.error(f"Failed to initialize Google Earth Engine: {str(e)}")
             self.ee_initialized = False
     
-    def fetch_satellite_image(self, latitude: float, longitude: float, date: str) -> Optional[str]:
+    def fetch_satellite_image(self, latitude: float, longitude: float, date: str,
+                              consumer: Optional[str] = None,
+                              size: Optional[Tuple[int, int]] = None) -> Optional[str]:
         """
         Fetch satellite image for given coordinates and date
         
@@ -50,36 +74,119 @@ class SatelliteService:
             latitude: Latitude coordinate
             longitude: Longitude coordinate  
             date: Date in YYYY-MM-DD format
+            consumer: Who will read the image ('classifier', 'heatmap', 'analysis', 'preview');
+                      providers are asked for exactly the pixels that consumer uses
+            size: Explicit (width, height), overrides consumer
             
         Returns:
             Path to saved satellite image or None if failed
         """
         try:
+            size = resolve_output_size(consumer, size)
+            
+            # Serve from cache if any provider already fetched this image
+            with start_span('satellite.cache_lookup') as span:
+                cached_path = self.cache.lookup(*self._cache_candidates(latitude, longitude, date, size))
+                span.set_attribute('hit', bool(cached_path))
+            if cached_path:
+                return cached_path
+            
             # Try Google Earth Engine first
             if self.ee_initialized:
-                image_path = self._fetch_from_google_earth_engine(latitude, longitude, date)
+                image_path = self._timed_fetch('gee', self._fetch_from_google_earth_engine,
+                                               latitude, longitude, date, size)
                 if image_path:
                     return image_path
             
             # Fallback to Sentinel Hub
-            image_path = self._fetch_from_sentinel_hub(latitude, longitude, date)
+            image_path = self._timed_fetch('sentinel', self._fetch_from_sentinel_hub,
+                                           latitude, longitude, date, size)
             if image_path:
                 return image_path
             
             # Fallback to Landsat (free option)
-            image_path = self._fetch_from_landsat(latitude, longitude, date)
+            image_path = self._timed_fetch('landsat', self._fetch_from_landsat,
+                                           latitude, longitude, date, size)
             return image_path
             
         except Exception as e:
             logger.error(f"Error fetching satellite image: {str(e)}")
             return None
     
-    def _fetch_from_google_earth_engine(self, latitude: float, longitude: float, date: str) -> Optional[str]:
+    def _timed_fetch(self, source: str, fetch, *args) -> Optional[str]:
+        """Call a provider fetch and record its latency by source and outcome"""
+        started = time.perf_counter()
+        with start_span('satellite.provider_fetch', source=source) as span:
+            image_path = fetch(*args)
+            span.set_attribute('success', bool(image_path))
+        SATELLITE_FETCH_SECONDS.labels(source, 'success' if image_path else 'failure').observe(
+            time.perf_counter() - started
+        )
+        return image_path
+    
+    def _cache_filename(self, prefix: str, latitude: float, longitude: float, date: str,
+                        size: Tuple[int, int]) -> str:
+        """Cache file name for an image from a given provider at a given output size"""
+        return f"{prefix}_{latitude}_{longitude}_{date.replace('-', '')}_{size[0]}x{size[1]}.jpg"
+    
+    def _flat_cache_files(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.satellite_cache_dir)
+                if FLAT_CACHE_NAME.match(entry.name) and entry.is_file()]
+    
+    def migrate_flat_cache(self) -> int:
+        """
+        Move images cached directly in the cache directory (the layout before
+        sharding and size-specific names) to their current names, so lookups
+        and eviction see them. Runs once in the background when such files exist.
+        
+        Returns:
+            Number of files moved
+        """
+        from PIL import Image
+        
+        moved = 0
+        for entry in self._flat_cache_files():
+            prefix, latitude, longitude, day = FLAT_CACHE_NAME.match(entry.name).groups()
+            try:
+                with Image.open(entry.path) as image:
+                    size = image.size
+            except Exception as e:
+                logger.warning(f"Leaving unreadable cached image {entry.path}: {str(e)}")
+                continue
+            date = f"{day[:4]}-{day[4:6]}-{day[6:]}"
+            filename = self._cache_filename(prefix, float(latitude), float(longitude), date, size)
+            if self.cache.adopt(entry.path, filename, float(latitude), float(longitude), date,
+                                PREFIX_SOURCES[prefix], resolution=f"{size[0]}x{size[1]}"):
+                moved += 1
+        if moved:
+            logger.info(f"Moved {moved} cached images to the sharded cache layout")
+        return moved
+    
+    def _cache_candidates(self, latitude: float, longitude: float, date: str,
+                          size: Tuple[int, int]) -> List[str]:
+        """Cache file names any provider may have stored this image under"""
+        return [
+            self._cache_filename(prefix, latitude, longitude, date, size)
+            for prefix in ('satellite', 'sentinel', 'landsat')
+        ]
+    
+    def _store_provider_image(self, prefix: str, source: str, content: bytes, latitude: float,
+                              longitude: float, date: str, size: Tuple[int, int]) -> str:
+        """Cache a provider response body under its provider-specific name"""
+        filename = self._cache_filename(prefix, latitude, longitude, date, size)
+        return self.cache.store(filename, content, latitude, longitude, date, source=source,
+                                resolution=f"{size[0]}x{size[1]}")
+    
+    def _fetch_from_google_earth_engine(self, latitude: float, longitude: float, date: str,
+                                        size: Tuple[int, int]) -> Optional[str]:
         """Fetch image from Google Earth Engine"""
         try:
             if not self.ee_initialized:
                 return None
             
+            import ee
+            import requests
+            
             # Define point of interest
             point = ee.Geometry.Point(longitude, latitude)
             
@@ -105,18 +212,15 @@ class SatelliteService:
             # Get image URL
             url = rgb_image.getThumbURL({
                 'region': region,
-                'dimensions': 512,
+                'dimensions': f"{size[0]}x{size[1]}",
                 'format': 'jpg'
             })
             
             # Download and save image
             response = requests.get(url)
             if response.status_code == 200:
-                filename = f"satellite_{latitude}_{longitude}_{date.replace('-', '')}.jpg"
-                filepath = os.path.join(self.satellite_cache_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                filepath = self._store_provider_image('satellite', 'google_earth', response.content,
+                                                      latitude, longitude, date, size)
                 
                 logger.info(f"Satellite image saved: {filepath}")
                 return filepath
@@ -127,75 +231,75 @@ class SatelliteService:
             logger.error(f"Error fetching from Google Earth Engine: {str(e)}")
             return None
     
-    def _fetch_from_sentinel_hub(self, latitude: float, longitude: float, date: str) -> Optional[str]:
+    def _sentinel_hub_request(self, latitude: float, longitude: float, date: str,
+                              size: Tuple[int, int]) -> Dict[str, Any]:
+        """url, json and headers of a Sentinel Hub process API request, for requests or httpx"""
+        # Define bounding box (small area around the point)
+        buffer = 0.01  # ~1km buffer
+        bbox = [
+            longitude - buffer,  # minX
+            latitude - buffer,   # minY
+            longitude + buffer,  # maxX
+            latitude + buffer    # maxY
+        ]
+        
+        # Sentinel Hub request
+        request_body = {
+            "input": {
+                "bounds": {
+                    "bbox": bbox,
+                    "properties": {
+                        "crs": "http://www.opengis.net/def/crs/EPSG/0/4326"
+                    }
+                },
+                "data": [{
+                    "type": "sentinel-2-l2a",
+                    "dataFilter": {
+                        "timeRange": {
+                            "from": f"{date}T00:00:00Z",
+                            "to": f"{date}T23:59:59Z"
+                        }
+                    }
+                }]
+            },
+            "output": {
+                "width": size[0],
+                "height": size[1],
+                "responses": [{
+                    "identifier": "default",
+                    "format": {
+                        "type": "image/jpeg"
+                    }
+                }]
+            },
+            "evalscript": """
+                // Return RGB composite
+                return [B04, B03, B02];
+            """
+        }
+        
+        headers = {
+            'Authorization': f'Bearer {self.sentinel_hub_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        return {'url': self.sentinel_hub_url, 'json': request_body, 'headers': headers}
+    
+    def _fetch_from_sentinel_hub(self, latitude: float, longitude: float, date: str,
+                                 size: Tuple[int, int]) -> Optional[str]:
         """Fetch image from Sentinel Hub"""
         try:
             if not self.sentinel_hub_token:
                 logger.warning("Sentinel Hub token not provided")
                 return None
             
-            # Define bounding box (small area around the point)
-            buffer = 0.01  # ~1km buffer
-            bbox = [
-                longitude - buffer,  # minX
-                latitude - buffer,   # minY
-                longitude + buffer,  # maxX
-                latitude + buffer    # maxY
-            ]
+            import requests
             
-            # Sentinel Hub request
-            request_body = {
-                "input": {
-                    "bounds": {
-                        "bbox": bbox,
-                        "properties": {
-                            "crs": "http://www.opengis.net/def/crs/EPSG/0/4326"
-                        }
-                    },
-                    "data": [{
-                        "type": "sentinel-2-l2a",
-                        "dataFilter": {
-                            "timeRange": {
-                                "from": f"{date}T00:00:00Z",
-                                "to": f"{date}T23:59:59Z"
-                            }
-                        }
-                    }]
-                },
-                "output": {
-                    "width": 512,
-                    "height": 512,
-                    "responses": [{
-                        "identifier": "default",
-                        "format": {
-                            "type": "image/jpeg"
-                        }
-                    }]
-                },
-                "evalscript": """
-                    // Return RGB composite
-                    return [B04, B03, B02];
-                """
-            }
-            
-            headers = {
-                'Authorization': f'Bearer {self.sentinel_hub_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                self.sentinel_hub_url,
-                json=request_body,
-                headers=headers,
-                timeout=30
-            )
+            response = requests.post(**self._sentinel_hub_request(latitude, longitude, date, size), timeout=30)
             
             if response.status_code == 200:
-                filename = f"sentinel_{latitude}_{longitude}_{date.replace('-', '')}.jpg"
-                filepath = os.path.join(self.satellite_cache_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                filepath = self._store_provider_image('sentinel', 'sentinel_hub', response.content,
+                                                      latitude, longitude, date, size)
                 
                 logger.info(f"Sentinel Hub image saved: {filepath}")
                 return filepath
@@ -207,7 +311,30 @@ class SatelliteService:
             logger.error(f"Error fetching from Sentinel Hub: {str(e)}")
             return None
     
-    def _fetch_from_landsat(self, latitude: float, longitude: float, date: str) -> Optional[str]:
+    def _landsat_request(self, latitude: float, longitude: float, date: str, nasa_api_key: str) -> Dict[str, Any]:
+        """url and params of a NASA Earth imagery request"""
+        return {
+            'url': self.landsat_url,
+            'params': {
+                'lat': latitude,
+                'lon': longitude,
+                'date': date,
+                'api_key': nasa_api_key,
+                'dim': 0.1  # 0.1 degree area
+            }
+        }
+    
+    def _store_landsat_image(self, content: bytes, latitude: float, longitude: float, date: str,
+                             size: Tuple[int, int]) -> str:
+        """
+        Cache a Landsat image; the NASA API has no output-size parameter, so
+        downscale once before caching rather than on every read
+        """
+        return self._store_provider_image('landsat', 'landsat', self._fit_to_size(content, size),
+                                          latitude, longitude, date, size)
+    
+    def _fetch_from_landsat(self, latitude: float, longitude: float, date: str,
+                            size: Tuple[int, int]) -> Optional[str]:
         """Fetch image from Landsat (NASA's free API)"""
         try:
             nasa_api_key = os.getenv('NASA_API_KEY')
@@ -215,24 +342,12 @@ class SatelliteService:
                 logger.warning("NASA API key not provided")
                 return None
             
-            # NASA Landsat API
-            url = "https://api.nasa.gov/planetary/earth/imagery"
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'date': date,
-                'api_key': nasa_api_key,
-                'dim': 0.1  # 0.1 degree area
-            }
+            import requests
             
-            response = requests.get(url, params=params, timeout=30)
+            response = requests.get(**self._landsat_request(latitude, longitude, date, nasa_api_key), timeout=30)
             
             if response.status_code == 200:
-                filename = f"landsat_{latitude}_{longitude}_{date.replace('-', '')}.jpg"
-                filepath = os.path.join(self.satellite_cache_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                filepath = self._store_landsat_image(response.content, latitude, longitude, date, size)
                 
                 logger.info(f"Landsat image saved: {filepath}")
                 return filepath
@@ -244,45 +359,29 @@ class SatelliteService:
             logger.error(f"Error fetching from Landsat: {str(e)}")
             return None
     
+    def _fit_to_size(self, content: bytes, size: Tuple[int, int]) -> bytes:
+        """Downscale encoded image bytes to fit within size; returns content unchanged if already small enough"""
+        from PIL import Image
+        
+        image = Image.open(io.BytesIO(content))
+        if image.width <= size[0] and image.height <= size[1]:
+            return content
+        image.draft('RGB', size)
+        image = image.convert('RGB')
+        image.thumbnail(size)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        return buffer.getvalue()
+    
     def analyze_image(self, image_path: str, pollution_type: str = 'general') -> Dict[str, Any]:
         """Analyze satellite image for pollution detection"""
-        try:
-            # This is a simplified analysis
-            # In a real implementation, you would use computer vision techniques
-            
-            # Load image
-            image = Image.open(image_path)
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Get image properties
-            width, height = image.size
-            image_array = np.array(image)
-            
-            # Simple color analysis for different pollution types
-            analysis_result = {
-                'image_size': f"{width}x{height}",
-                'pollution_type': pollution_type,
-                'analysis_method': 'color_analysis',
-                'confidence': 0.7,  # Placeholder
-                'detected_pollution': self._detect_pollution_by_color(image_array, pollution_type),
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            return analysis_result
-            
-        except Exception as e:
-            logger.error(f"Error analyzing image {image_path}: {str(e)}")
-            return {
-                'error': str(e),
-                'pollution_type': pollution_type,
-                'timestamp': datetime.now().isoformat()
-            }
+        return analyze_image_file(image_path, pollution_type)
     
-    def _detect_pollution_by_color(self, image_array: np.ndarray, pollution_type: str) -> Dict[str, Any]:
+    @staticmethod
+    def _detect_pollution_by_color(image_array: 'np.ndarray', pollution_type: str) -> Dict[str, Any]:
         """Simple color-based pollution detection"""
+        import numpy as np
+        
         # This is a simplified example
         # Real implementation would use more sophisticated computer vision
         
@@ -303,7 +402,7 @@ class SatelliteService:
         detected = pollution_indicators.get(pollution_type, False)
         
         return {
-            'detected': detected,
+            'detected': bool(detected),
             'confidence': 0.6 if detected else 0.3,
             'color_analysis': {
                 'avg_r': float(avg_r),
@@ -320,6 +419,7 @@ class SatelliteService:
             'sentinel_hub': bool(self.sentinel_hub_token),
             'nasa_landsat': bool(os.getenv('NASA_API_KEY')),
             'cache_directory': self.satellite_cache_dir,
+            'cache': self.cache.stats(),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -329,3 +429,70 @@ class SatelliteService:
             health_status['error'] = 'No satellite data services configured'
         
         return health_status
+
+
+_satellite_service: Optional[SatelliteService] = None
+_satellite_service_lock = threading.Lock()
+
+def get_satellite_service() -> SatelliteService:
+    """Get the process-wide SatelliteService, creating it on first use"""
+    global _satellite_service
+    if _satellite_service is None:
+        with _satellite_service_lock:
+            if _satellite_service is None:
+                _satellite_service = SatelliteService()
+    return _satellite_service
+
+
+def analyze_image_file(image_path: str, pollution_type: str = 'general') -> Dict[str, Any]:
+    """
+    Analyze a satellite image file for pollution detection
+    
+    Module-level so it can be shipped to worker processes without
+    constructing a SatelliteService there.
+    """
+    with start_span('image.analyze', pollution_type=pollution_type), observe_seconds(ANALYZE_IMAGE_SECONDS):
+        return _analyze_image_file(image_path, pollution_type)
+
+def _analyze_image_file(image_path: str, pollution_type: str) -> Dict[str, Any]:
+    import numpy as np
+    from PIL import Image
+    
+    try:
+        # This is a simplified analysis
+        # In a real implementation, you would use computer vision techniques
+        
+        with start_span('image.decode', consumer='analysis'), observe_seconds(IMAGE_DECODE_SECONDS.labels('analysis')):
+            # Load image
+            image = Image.open(image_path)
+            width, height = image.size
+            
+            # Channel averages don't need full resolution: let JPEG decode at a reduced scale
+            image.draft('RGB', (ANALYSIS_SIZE, ANALYSIS_SIZE))
+            
+            # Convert to RGB if necessary
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            image_array = np.array(image)
+        
+        # Simple color analysis for different pollution types
+        analysis_result = {
+            'image_size': f"{width}x{height}",
+            'analysis_size': f"{image.width}x{image.height}",
+            'pollution_type': pollution_type,
+            'analysis_method': 'color_analysis',
+            'confidence': 0.7,  # Placeholder
+            'detected_pollution': SatelliteService._detect_pollution_by_color(image_array, pollution_type),
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        return analysis_result
+        
+    except Exception as e:
+        logger.error(f"Error analyzing image {image_path}: {str(e)}")
+        return {
+            'error': str(e),
+            'pollution_type': pollution_type,
+            'timestamp': datetime.now().isoformat()
+        }
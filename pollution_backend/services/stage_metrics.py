@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for pipeline stages
+Histograms for request latency, provider fetch, image decode, analysis, model inference
+and DB commit, plus satellite cache counters. Served in-process by GET /metrics.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) before
+the workers start so every worker writes its samples there and /metrics aggregates them.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+    logger.warning("prometheus_client not installed; /metrics will be empty")
+
+# Second-scale buckets: cache hits and decodes land in the low ms, provider fetches in seconds
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+class _NoopMetric:
+    """Stand-in used when prometheus_client is missing"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUEST_SECONDS = Histogram(
+        'http_request_seconds', 'Request latency by route template', ['endpoint', 'method'],
+        buckets=FAST_BUCKETS + SLOW_BUCKETS[6:]
+    )
+    SATELLITE_FETCH_SECONDS = Histogram(
+        'satellite_fetch_seconds', 'Time to fetch an image from a satellite provider',
+        ['source', 'outcome'], buckets=SLOW_BUCKETS
+    )
+    IMAGE_DECODE_SECONDS = Histogram(
+        'image_decode_seconds', 'Time to decode an image file into pixels',
+        ['consumer'], buckets=FAST_BUCKETS
+    )
+    ANALYZE_IMAGE_SECONDS = Histogram(
+        'analyze_image_seconds', 'Time for analyze_image on one image', buckets=FAST_BUCKETS
+    )
+    MODEL_INFERENCE_SECONDS = Histogram(
+        'model_inference_seconds', 'Time for one batched model predict call', buckets=SLOW_BUCKETS
+    )
+    DB_COMMIT_SECONDS = Histogram(
+        'db_commit_seconds', 'Time to flush and commit a database session', buckets=FAST_BUCKETS
+    )
+    SATELLITE_CACHE_HITS = Counter('satellite_cache_hits', 'Satellite image cache hits')
+    SATELLITE_CACHE_MISSES = Counter('satellite_cache_misses', 'Satellite image cache misses')
+    # livesum: gauges of dead workers drop out, live workers are summed
+    ADMISSION_IN_FLIGHT = Gauge('admission_in_flight', 'Requests being served by admission-controlled endpoints',
+                                ['endpoint'], multiprocess_mode='livesum')
+    ADMISSION_WAITING = Gauge('admission_waiting', 'Requests queued for a slot', ['endpoint'],
+                              multiprocess_mode='livesum')
+    ADMISSION_SHED = Counter('admission_shed', 'Requests rejected by admission control', ['endpoint', 'reason'])
+else:
+    HTTP_REQUEST_SECONDS = _NoopMetric()
+    SATELLITE_FETCH_SECONDS = IMAGE_DECODE_SECONDS = ANALYZE_IMAGE_SECONDS = _NoopMetric()
+    MODEL_INFERENCE_SECONDS = DB_COMMIT_SECONDS = _NoopMetric()
+    SATELLITE_CACHE_HITS = SATELLITE_CACHE_MISSES = _NoopMetric()
+    ADMISSION_IN_FLIGHT = ADMISSION_WAITING = ADMISSION_SHED = _NoopMetric()
+
+@contextmanager
+def observe_seconds(histogram):
+    """Observe the wall time of the with-block on a (labelled) histogram"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+def _before_commit(session):
+    session.info['commit_started'] = time.perf_counter()
+
+def _after_commit(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+def _after_rollback(session):
+    session.info.pop('commit_started', None)
+
+def instrument_session_commits(session_factory):
+    """Time every commit (including its flush) made through session_factory"""
+    from sqlalchemy import event
+
+    if event.contains(session_factory, 'before_commit', _before_commit):
+        return
+    event.listen(session_factory, 'before_commit', _before_commit)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_rollback', _after_rollback)
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text exposition format
+
+    Returns:
+        (body, content_type)
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b'', CONTENT_TYPE_LATEST
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Aggregate the per-worker sample files of every gunicorn worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,264 @@
+"""
+Lightweight in-process tracing
+Context-propagated spans (threads and asyncio included) exported as JSON lines
+or OTLP/JSON, so a slow verification can be broken down stage by stage
+"""
+
+import os
+import json
+import time
+import random
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from .write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False').lower() == 'true'
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 1.0))
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'jsonl')
+TRACE_FILE = os.getenv('TRACE_FILE', './data/traces/spans.jsonl')
+OTLP_ENDPOINT = os.getenv('OTLP_ENDPOINT')
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'pollution-verification-backend')
+
+class Span:
+    """A timed operation; children started while it is current are linked to it"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'status', 'error', 'thread')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            'status': self.status,
+            'error': self.error,
+            'thread': self.thread,
+            'attributes': self.attributes
+        }
+
+class _NonRecordingSpan:
+    """Returned when tracing is off or the trace was not sampled; children stay unsampled"""
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+def current_span():
+    """The active span in this context, or None outside any trace"""
+    return _current_span.get()
+
+@contextmanager
+def start_span(name: str, **attributes):
+    """
+    Time a block as a span, child of the current span if there is one
+
+    Usage:
+        with start_span('satellite.fetch', source='sentinel') as span:
+            ...
+            span.set_attribute('bytes', len(content))
+    """
+    parent = _current_span.get()
+    if not TRACING_ENABLED or parent is NON_RECORDING_SPAN:
+        yield NON_RECORDING_SPAN
+        return
+    if parent is None and random.random() >= TRACE_SAMPLE_RATE:
+        # Unsampled root: mark the context so nested spans are skipped too
+        token = _current_span.set(NON_RECORDING_SPAN)
+        try:
+            yield NON_RECORDING_SPAN
+        finally:
+            _current_span.reset(token)
+        return
+
+    trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+    span = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_ns = time.time_ns()
+        get_span_queue().enqueue(span)
+
+def traced(name: Optional[str] = None, **attributes):
+    """Decorator form of start_span, for plain and async functions"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind_context(func: Callable) -> Callable:
+    """
+    Bind func to the caller's context so spans it starts in another thread
+    are children of the caller's current span
+
+    asyncio tasks copy the context on creation and need no wrapping.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return wrapper
+
+def submit_in_context(executor, func: Callable, *args, **kwargs):
+    """executor.submit that carries the current trace into the worker thread"""
+    return executor.submit(bind_context(func), *args, **kwargs)
+
+# Exporters
+
+class JsonLinesExporter:
+    """One JSON object per span, appended to a local file"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+class OTLPJsonExporter:
+    """
+    OTLP/HTTP JSON export
+
+    POSTs to an OTLP collector's /v1/traces when an endpoint is configured;
+    otherwise appends one ExportTraceServiceRequest per line to a local file.
+    """
+
+    def __init__(self, endpoint: Optional[str] = OTLP_ENDPOINT, path: str = TRACE_FILE,
+                 service_name: str = TRACE_SERVICE_NAME):
+        self.endpoint = endpoint
+        self.path = path
+        self.service_name = service_name
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service_name}}
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [{
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(span.start_ns),
+                        'endTimeUnixNano': str(span.end_ns),
+                        'attributes': [
+                            {'key': key, 'value': _otlp_value(value)}
+                            for key, value in dict(span.attributes, **{'thread.name': span.thread}).items()
+                        ],
+                        'status': {'code': 2, 'message': span.error} if span.status == 'error' else {'code': 1}
+                    } for span in spans]
+                }]
+            }]
+        }
+
+    def export(self, spans: List[Span]):
+        payload = self._payload(spans)
+        if self.endpoint:
+            import requests
+            response = requests.post(f"{self.endpoint.rstrip('/')}/v1/traces", json=payload, timeout=10)
+            response.raise_for_status()
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(payload) + '\n')
+
+EXPORTERS = {
+    'jsonl': JsonLinesExporter,
+    'otlp': OTLPJsonExporter
+}
+
+_span_queue: Optional[WriteBehindQueue] = None
+_span_queue_lock = threading.Lock()
+
+def get_span_queue() -> WriteBehindQueue:
+    """Finished spans are exported in batches by a background thread"""
+    global _span_queue
+    if _span_queue is None:
+        with _span_queue_lock:
+            if _span_queue is None:
+                if TRACE_EXPORTER not in EXPORTERS:
+                    raise ValueError(f"Unknown TRACE_EXPORTER '{TRACE_EXPORTER}' (expected one of {', '.join(EXPORTERS)})")
+                exporter = EXPORTERS[TRACE_EXPORTER]()
+                _span_queue = WriteBehindQueue(
+                    exporter.export,
+                    name='span-exporter',
+                    max_batch_rows=int(os.getenv('TRACE_EXPORT_BATCH', 512)),
+                    flush_interval_ms=float(os.getenv('TRACE_EXPORT_INTERVAL_MS', 1000)),
+                    max_queue=int(os.getenv('TRACE_QUEUE_SIZE', 20000))
+                )
+    return _span_queue
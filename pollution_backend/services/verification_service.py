@@ -2,19 +2,153 @@
 Verification Service for comparing user and satellite image predictions
 """
 
+import os
+import time
+import base64
 import logging
-from typing import Dict, Optional, List
-from datetime import datetime
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional, List, Iterable, Iterator, Tuple
+from datetime import datetime, date
 
-from ..database.models import VerificationResult
+from sqlalchemy import func, and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from ..database.models import VerificationResult, VerificationStatsRollup
 from ..database.connection import get_db_session
+from .write_behind import WriteBehindQueue
+from .tracing import start_span
 
 logger = logging.getLogger(__name__)
 
+POLLUTION_CATEGORIES = ['plastic_pollution', 'oil_spill', 'algae_bloom',
+                        'sewage_discharge', 'turbidity', 'clean_water']
+
+# Similarity groups used when user and satellite categories differ
+SIMILARITY_GROUPS = {
+    'water_pollution': ['sewage_discharge', 'turbidity', 'algae_bloom'],
+    'surface_pollution': ['plastic_pollution', 'oil_spill'],
+    'clean': ['clean_water']
+}
+CATEGORY_GROUP = {category: group for group, categories in SIMILARITY_GROUPS.items() for category in categories}
+
+CONFIDENCE_THRESHOLD = float(os.getenv('VERIFICATION_CONFIDENCE_THRESHOLD', 0.7))
+CATEGORY_MATCH_THRESHOLD = float(os.getenv('VERIFICATION_CATEGORY_MATCH_THRESHOLD', 0.8))
+
+STATS_CACHE_TTL_SECONDS = float(os.getenv('VERIFICATION_STATS_CACHE_TTL', 5))
+
+WRITE_BEHIND_ENABLED = os.getenv('VERIFICATION_WRITE_BEHIND', 'False').lower() == 'true'
+
+# Dashboard stats cache shared by all service instances in this process
+_stats_cache = {'value': None, 'expires': 0.0}
+_stats_cache_lock = threading.Lock()
+
+# Columns exported for history pages and bulk exports, in output order
+HISTORY_COLUMNS = ['id', 'report_id', 'user_image_path', 'satellite_image_path', 'user_category',
+                   'satellite_category', 'user_confidence', 'satellite_confidence', 'verified',
+                   'reason', 'timestamp']
+
+def verification_to_dict(row) -> Dict[str, Any]:
+    """Serialize a VerificationResult (or a row of HISTORY_COLUMNS) to a JSON-safe dict"""
+    data = {column: getattr(row, column) for column in HISTORY_COLUMNS}
+    if data['timestamp'] is not None:
+        data['timestamp'] = data['timestamp'].isoformat()
+    return data
+
+def encode_history_cursor(timestamp: datetime, record_id: int) -> str:
+    """Opaque keyset cursor for the position after (timestamp, id)"""
+    raw = f"{timestamp.isoformat()}|{record_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_history_cursor; raises ValueError on malformed cursors"""
+    try:
+        timestamp, record_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def invalidate_stats_cache():
+    """Drop cached dashboard stats so the next read sees fresh rollups"""
+    with _stats_cache_lock:
+        _stats_cache['value'] = None
+        _stats_cache['expires'] = 0.0
+
+def bump_stats_rollup(session, records: Iterable[VerificationResult]):
+    """
+    Add verification records to the per-day rollup inside the caller's transaction
+    
+    Records must already be flushed so their timestamps are populated.
+    """
+    increments = Counter(
+        ((record.timestamp or datetime.utcnow()).date(), record.user_category, bool(record.verified))
+        for record in records
+    )
+    
+    for (day, category, verified), count in increments.items():
+        key = (
+            VerificationStatsRollup.day == day,
+            VerificationStatsRollup.user_category == category,
+            VerificationStatsRollup.verified == verified
+        )
+        updated = session.query(VerificationStatsRollup).filter(*key).update(
+            {'count': VerificationStatsRollup.count + count}, synchronize_session=False
+        )
+        if updated:
+            continue
+        
+        try:
+            with session.begin_nested():
+                session.add(VerificationStatsRollup(day=day, user_category=category, verified=verified, count=count))
+        except IntegrityError:
+            # Another writer created the row first
+            session.query(VerificationStatsRollup).filter(*key).update(
+                {'count': VerificationStatsRollup.count + count}, synchronize_session=False
+            )
+
+def persist_verifications(records: List[VerificationResult]):
+    """Insert verification records and their rollup increments in one transaction"""
+    session = get_db_session()
+    try:
+        with start_span('db.write', table='verification_results', rows=len(records)):
+            session.add_all(records)
+            session.flush()
+            bump_stats_rollup(session, records)
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    invalidate_stats_cache()
+
+_write_queue: Optional[WriteBehindQueue] = None
+_write_queue_lock = threading.Lock()
+
+def _rejection_reason(write_queue: WriteBehindQueue) -> str:
+    return 'closed (shutting down)' if write_queue.closed else 'full'
+
+def get_verification_write_queue() -> WriteBehindQueue:
+    """Get the process-wide write-behind queue for verification results"""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteBehindQueue(
+                    persist_verifications,
+                    name='verification-writer',
+                    max_batch_rows=int(os.getenv('VERIFICATION_WRITE_BATCH_ROWS', 500)),
+                    flush_interval_ms=float(os.getenv('VERIFICATION_WRITE_FLUSH_MS', 200)),
+                    max_queue=int(os.getenv('VERIFICATION_WRITE_QUEUE_SIZE', 10000))
+                )
+    return _write_queue
+
 class VerificationService:
-    def __init__(self):
-        self.confidence_threshold = 0.7
-        self.category_match_threshold = 0.8
+    def __init__(self, write_behind: Optional[bool] = None):
+        self.confidence_threshold = CONFIDENCE_THRESHOLD
+        self.category_match_threshold = CATEGORY_MATCH_THRESHOLD
+        self.write_behind = WRITE_BEHIND_ENABLED if write_behind is None else write_behind
+        self._batch_engine = None
     
     def compare_predictions(self, user_prediction: Dict, satellite_prediction: Dict) -> Dict:
         """
@@ -90,22 +224,9 @@ class VerificationService:
     
     def _calculate_category_similarity(self, category1: str, category2: str) -> float:
         """Calculate similarity between two pollution categories"""
-        # Define similarity groups
-        similarity_groups = {
-            'water_pollution': ['sewage_discharge', 'turbidity', 'algae_bloom'],
-            'surface_pollution': ['plastic_pollution', 'oil_spill'],
-            'clean': ['clean_water']
-        }
-        
         # Find which group each category belongs to
-        group1 = None
-        group2 = None
-        
-        for group, categories in similarity_groups.items():
-            if category1 in categories:
-                group1 = group
-            if category2 in categories:
-                group2 = group
+        group1 = CATEGORY_GROUP.get(category1)
+        group2 = CATEGORY_GROUP.get(category2)
         
         # If both categories are in the same group, they're similar
         if group1 and group2 and group1 == group2:
@@ -119,20 +240,66 @@ class VerificationService:
         return 0.4
     
     def save_verification(self, verification_record: VerificationResult) -> bool:
-        """Save verification result to database"""
+        """
+        Save verification result to database
+        
+        With write-behind enabled the record is queued for the next group commit
+        and False means the queue is full (backpressure) or shutting down, not a
+        database error.
+        """
         try:
-            session = get_db_session()
-            session.add(verification_record)
-            session.commit()
-            session.close()
+            report_id = verification_record.report_id
+            
+            if self.write_behind:
+                write_queue = get_verification_write_queue()
+                if not write_queue.enqueue(verification_record):
+                    logger.warning(f"Verification write queue {_rejection_reason(write_queue)}, "
+                                   f"rejected result for report {report_id}")
+                    return False
+                return True
+            
+            persist_verifications([verification_record])
             
-            logger.info(f"Verification result saved for report {verification_record.report_id}")
+            logger.info(f"Verification result saved for report {report_id}")
             return True
             
         except Exception as e:
             logger.error(f"Error saving verification: {str(e)}")
             return False
     
+    def save_verifications(self, verification_records: List[VerificationResult]) -> int:
+        """
+        Save many verification results with one bulk insert
+        
+        Returns:
+            Number of records saved (or queued, with write-behind enabled)
+        """
+        try:
+            if self.write_behind:
+                write_queue = get_verification_write_queue()
+                accepted = sum(1 for record in verification_records if write_queue.enqueue(record))
+                if accepted < len(verification_records):
+                    logger.warning(f"Verification write queue {_rejection_reason(write_queue)}, "
+                                   f"rejected {len(verification_records) - accepted} results")
+                return accepted
+            
+            persist_verifications(verification_records)
+            logger.info(f"Saved {len(verification_records)} verification results")
+            return len(verification_records)
+            
+        except Exception as e:
+            logger.error(f"Error saving verifications: {str(e)}")
+            return 0
+    
+    def flush_verifications(self):
+        """Block until queued verification results are committed"""
+        if _write_queue is not None:
+            _write_queue.flush()
+    
+    def get_write_queue_stats(self) -> Optional[Dict[str, Any]]:
+        """Write-behind queue depth and backpressure counters, or None if unused"""
+        return _write_queue.stats() if _write_queue is not None else None
+    
     def get_verification(self, report_id: int) -> Optional[VerificationResult]:
         """Get verification result for a specific report"""
         try:
@@ -163,28 +330,103 @@ class VerificationService:
             logger.error(f"Error getting verification history: {str(e)}")
             return []
     
-    def get_verification_stats(self) -> Dict:
-        """Get verification statistics"""
+    def get_verification_page(self, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of verification history, newest first, using keyset pagination
+        
+        Args:
+            limit: Page size
+            cursor: next_cursor from the previous page, or None for the first page
+            
+        Returns:
+            {'items': [...], 'next_cursor': str or None}
+        """
+        session = get_db_session()
         try:
-            session = get_db_session()
+            columns = [getattr(VerificationResult, column) for column in HISTORY_COLUMNS]
+            query = session.query(*columns)
             
-            total = session.query(VerificationResult).count()
-            verified = session.query(VerificationResult).filter(
-                VerificationResult.verified == True
-            ).count()
+            if cursor:
+                cursor_timestamp, cursor_id = decode_history_cursor(cursor)
+                query = query.filter(or_(
+                    VerificationResult.timestamp < cursor_timestamp,
+                    and_(VerificationResult.timestamp == cursor_timestamp, VerificationResult.id < cursor_id)
+                ))
             
-            # Get category breakdown
-            category_stats = {}
-            for category in ['plastic_pollution', 'oil_spill', 'algae_bloom', 
-                           'sewage_discharge', 'turbidity', 'clean_water']:
-                count = session.query(VerificationResult).filter(
-                    VerificationResult.user_category == category
-                ).count()
-                category_stats[category] = count
+            rows = query.order_by(
+                VerificationResult.timestamp.desc(),
+                VerificationResult.id.desc()
+            ).limit(limit + 1).all()
+        finally:
+            session.close()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+        
+        return {
+            'items': [verification_to_dict(row) for row in rows],
+            'next_cursor': next_cursor
+        }
+    
+    def iter_verification_history(self, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the full verification history, oldest first, in constant memory
+        
+        Rows are fetched chunk_size at a time from a server-side cursor and never
+        enter the ORM identity map.
+        """
+        session = get_db_session()
+        try:
+            columns = [getattr(VerificationResult, column) for column in HISTORY_COLUMNS]
+            rows = session.query(*columns).order_by(
+                VerificationResult.timestamp.asc(),
+                VerificationResult.id.asc()
+            ).execution_options(stream_results=True).yield_per(chunk_size)
             
+            for row in rows:
+                yield verification_to_dict(row)
+        finally:
             session.close()
+    
+    def get_verification_stats(self) -> Dict:
+        """Get verification statistics"""
+        try:
+            with _stats_cache_lock:
+                if _stats_cache['value'] is not None and time.monotonic() < _stats_cache['expires']:
+                    return _stats_cache['value']
             
-            return {
+            session = get_db_session()
+            try:
+                if session.query(VerificationStatsRollup.id).first() is None and \
+                        session.query(VerificationResult.id).first() is not None:
+                    # Rollup table was added after results already existed
+                    session.close()
+                    self.rebuild_stats_rollup()
+                    session = get_db_session()
+                
+                rows = session.query(
+                    VerificationStatsRollup.user_category,
+                    VerificationStatsRollup.verified,
+                    func.sum(VerificationStatsRollup.count)
+                ).group_by(
+                    VerificationStatsRollup.user_category,
+                    VerificationStatsRollup.verified
+                ).all()
+            finally:
+                session.close()
+            
+            total = 0
+            verified = 0
+            category_stats = {category: 0 for category in POLLUTION_CATEGORIES}
+            for category, is_verified, count in rows:
+                count = int(count or 0)
+                total += count
+                if is_verified:
+                    verified += count
+                category_stats[category] = category_stats.get(category, 0) + count
+            
+            stats = {
                 'total_verifications': total,
                 'verified_count': verified,
                 'rejected_count': total - verified,
@@ -193,6 +435,12 @@ class VerificationService:
                 'timestamp': datetime.now().isoformat()
             }
             
+            with _stats_cache_lock:
+                _stats_cache['value'] = stats
+                _stats_cache['expires'] = time.monotonic() + STATS_CACHE_TTL_SECONDS
+            
+            return stats
+            
         except Exception as e:
             logger.error(f"Error getting verification stats: {str(e)}")
             return {
@@ -200,17 +448,82 @@ class VerificationService:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def rebuild_stats_rollup(self) -> bool:
+        """Recompute the stats rollup from verification_results with one GROUP BY"""
+        try:
+            session = get_db_session()
+            try:
+                day = func.date(VerificationResult.timestamp)
+                rows = session.query(
+                    day,
+                    VerificationResult.user_category,
+                    VerificationResult.verified,
+                    func.count(VerificationResult.id)
+                ).group_by(day, VerificationResult.user_category, VerificationResult.verified).all()
+                
+                session.query(VerificationStatsRollup).delete(synchronize_session=False)
+                session.add_all([
+                    VerificationStatsRollup(
+                        day=date.fromisoformat(row_day) if isinstance(row_day, str) else row_day,
+                        user_category=category,
+                        verified=bool(is_verified),
+                        count=count
+                    )
+                    for row_day, category, is_verified, count in rows
+                ])
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+            
+            invalidate_stats_cache()
+            logger.info(f"Verification stats rollup rebuilt ({len(rows)} rows)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding verification stats rollup: {str(e)}")
+            return False
+    
+    def rescore_history(self, confidence_threshold: Optional[float] = None,
+                        category_match_threshold: Optional[float] = None,
+                        dry_run: bool = False) -> Dict:
+        """
+        Re-evaluate every stored verification under new thresholds
+        
+        Rescoring is offline: it rewrites stored verdicts and does not change
+        how new reports are verified (that is VERIFICATION_CONFIDENCE_THRESHOLD
+        and VERIFICATION_CATEGORY_MATCH_THRESHOLD). The thresholds are set on
+        this instance to run the rescoring, so call it on a dedicated
+        VerificationService. See rescoring.rescore_verifications.
+        """
+        if confidence_threshold is not None:
+            self.confidence_threshold = confidence_threshold
+        if category_match_threshold is not None:
+            self.category_match_threshold = category_match_threshold
+        
+        from .rescoring import rescore_verifications
+        summary = rescore_verifications(self, dry_run=dry_run)
+        if summary['changed'] and not dry_run:
+            self.rebuild_stats_rollup()
+        return summary
+    
+    def get_batch_engine(self):
+        """Batch verification engine, created on first use"""
+        if self._batch_engine is None:
+            from .batch_verification import BatchVerificationEngine
+            self._batch_engine = BatchVerificationEngine(self)
+        return self._batch_engine
+    
+    def verify_reports(self, report_ids: List[int]) -> Dict:
+        """Verify many reports in one batch; see BatchVerificationEngine.verify_reports"""
+        return self.get_batch_engine().verify_reports(report_ids)
+    
     def verify_single_report(self, report_data: Dict) -> Dict:
         """Verify a single report (used in batch processing)"""
         try:
-            # This would integrate with your existing database to get report details
-            # For now, return a placeholder
-            return {
-                'report_id': report_data.get('id'),
-                'verified': False,
-                'reason': 'Batch verification not fully implemented',
-                'timestamp': datetime.now().isoformat()
-            }
+            return self.verify_reports([report_data['id']])['results'][0]
             
         except Exception as e:
             logger.error(f"Error verifying single report: {str(e)}")
@@ -224,15 +537,7 @@ class VerificationService:
     def get_report_details(self, report_id: int) -> Optional[Dict]:
         """Get report details from your existing database"""
         try:
-            # This would integrate with your existing database
-            # For now, return a placeholder
-            return {
-                'id': report_id,
-                'latitude': 0.0,
-                'longitude': 0.0,
-                'pollution_type': 'unknown',
-                'image_path': ''
-            }
+            return self.get_batch_engine().reports.get_reports([report_id]).get(report_id)
             
         except Exception as e:
             logger.error(f"Error getting report details for {report_id}: {str(e)}")
@@ -0,0 +1,226 @@
+"""
+Write-behind queue for batching database inserts
+Items are buffered in memory and persisted in group commits by a background
+thread, flushing every N items or T milliseconds, whichever comes first.
+Transient failures are retried with backoff; a batch rejected for any other
+reason is persisted row by row, so only the offending items are dropped.
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+def is_transient_error(error: Exception) -> bool:
+    """Failures worth retrying unchanged: lost connections, locks, pool and network timeouts"""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, OperationalError)
+    # Includes ConnectionError, TimeoutError and requests' exceptions
+    return isinstance(error, (PoolTimeoutError, OSError))
+
+class WriteBehindQueue:
+    def __init__(self, persist_batch: Callable[[List[Any]], None], name: str = 'write-behind',
+                 max_batch_rows: int = 500, flush_interval_ms: float = 200, max_queue: int = 10000,
+                 max_retries: int = 3, retry_backoff_ms: float = 100,
+                 is_transient: Callable[[Exception], bool] = is_transient_error):
+        """
+        Args:
+            persist_batch: Called from the writer thread with a list of items; must commit
+                them all or raise having committed none
+            name: Thread name, used in logs
+            max_batch_rows: Flush as soon as this many items are buffered
+            flush_interval_ms: Flush at least this often while items are buffered
+            max_queue: Items buffered beyond this are rejected (backpressure)
+            max_retries: Retries of a transiently failing call, doubling retry_backoff_ms each time
+            is_transient: Whether a persist_batch error is worth retrying unchanged
+        """
+        self.persist_batch = persist_batch
+        self.name = name
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self.is_transient = is_transient
+
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        self.enqueued = 0
+        self.persisted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # Threads don't survive fork: a preloaded queue restarts its writer in each worker
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        """True once close() has been called; enqueue then rejects every item"""
+        return self._stop.is_set()
+
+    def enqueue(self, item: Any) -> bool:
+        """
+        Buffer an item for the next group commit
+
+        Returns:
+            False if the item was not accepted: the queue is full, or closed
+            (shutting down) when self.closed is set
+        """
+        if self._stop.is_set():
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _collect_batch(self) -> List[Any]:
+        """Block for the first item, then gather more until the batch is full or the interval elapses"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _call_with_retry(self, items: List[Any]):
+        """persist_batch(items), retrying transient errors with exponential backoff"""
+        attempt = 0
+        while True:
+            try:
+                self.persist_batch(items)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"{self.name}: retrying {len(items)} items in {delay:.2f}s "
+                               f"({attempt}/{self.max_retries}) after: {str(e)}")
+                time.sleep(delay)
+
+    def _persist(self, batch: List[Any]):
+        try:
+            self._call_with_retry(batch)
+            with self._lock:
+                self.persisted += len(batch)
+                self.batches += 1
+        except Exception as e:
+            if self.is_transient(e):
+                # Still failing after retries: the store is unavailable, not the rows bad
+                with self._lock:
+                    self.failed += len(batch)
+                logger.error(f"{self.name}: dropped batch of {len(batch)}: {str(e)}")
+            elif len(batch) == 1:
+                self._drop_item(batch[0], e)
+            else:
+                logger.warning(f"{self.name}: batch of {len(batch)} rejected ({str(e)}), persisting row by row")
+                self._persist_rows(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _persist_rows(self, batch: List[Any]):
+        """One call per item, so a bad row costs only itself"""
+        persisted = 0
+        for item in batch:
+            try:
+                self._call_with_retry([item])
+                persisted += 1
+            except Exception as e:
+                self._drop_item(item, e)
+        with self._lock:
+            self.persisted += persisted
+
+    def _drop_item(self, item: Any, error: Exception):
+        with self._lock:
+            self.failed += 1
+        logger.error(f"{self.name}: dropped {repr(item)[:200]}: {str(error)}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._persist(batch)
+
+        # Drain whatever is left so shutdown is durable
+        while True:
+            batch = []
+            while len(batch) < self.max_batch_rows:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._persist(batch)
+
+    def flush(self):
+        """Block until every item enqueued so far has been persisted (or dropped)"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.join()
+
+    def close(self, timeout: float = 30.0):
+        """Stop accepting items and flush the remainder"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.error(f"{self.name}: timed out flushing {self._queue.qsize()} items on shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self.max_queue,
+            'enqueued': self.enqueued,
+            'persisted': self.persisted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'batches': self.batches,
+            'retries': self.retries,
+            'closed': self.closed,
+            'writer_running': bool(self._thread and self._thread.is_alive())
+        }
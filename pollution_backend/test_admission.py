@@ -0,0 +1,131 @@
+"""
+Tests for admission control: 503 when an endpoint is saturated, 429 when a
+client is over its rate, both with Retry-After
+"""
+
+import asyncio
+import threading
+
+import pytest
+from flask import Flask, jsonify
+
+from pollution_backend.api.middleware import admission_controlled
+from pollution_backend.services import admission
+from pollution_backend.services.admission import (admission_controller, AsyncConcurrencyLimiter, ClientRateLimiter,
+                                                  ConcurrencyLimiter, Rejected)
+
+entered = threading.Event()
+released = threading.Event()
+
+app = Flask(__name__)
+
+@app.route('/slow')
+@admission_controlled('test_slow', max_concurrent=1, max_queue=0)
+def slow():
+    entered.set()
+    released.wait(10)
+    return jsonify({'ok': True})
+
+@app.route('/queued')
+@admission_controlled('test_queued', max_concurrent=1, max_queue=0, exempt=lambda: True)
+def queued():
+    return jsonify({'ok': True})
+
+@app.route('/fast')
+@admission_controlled('test_fast', max_concurrent=4, max_queue=4)
+def fast():
+    return jsonify({'ok': True})
+
+@pytest.fixture(autouse=True)
+def unlimited_clients(monkeypatch):
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0))
+    entered.clear()
+    released.clear()
+    yield
+    released.set()
+
+def test_saturated_endpoint_returns_503_with_retry_after():
+    first = threading.Thread(target=lambda: app.test_client().get('/slow'))
+    first.start()
+    assert entered.wait(5)
+
+    response = app.test_client().get('/slow')
+    assert response.status_code == 503
+    assert response.get_json()['reason'] == 'queue_full'
+    assert int(response.headers['Retry-After']) >= 1
+
+    released.set()
+    first.join(5)
+    assert app.test_client().get('/slow').status_code == 200
+    assert admission_controller.limiters['test_slow'].stats()['shed_queue_full'] == 1
+
+def test_exempt_requests_take_no_slot_but_are_rate_limited(monkeypatch):
+    limiter = admission_controller.limiters['test_queued']
+    monkeypatch.setattr(limiter, 'max_concurrent', 0)
+    client = app.test_client()
+    assert client.get('/queued').status_code == 200
+    assert limiter.stats()['admitted'] == 0
+
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0.5, burst=1))
+    assert [client.get('/queued').status_code for _ in range(2)] == [200, 429]
+
+def test_queued_request_times_out():
+    limiter = ConcurrencyLimiter('test_timeout', max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(Rejected) as rejected:
+        limiter.acquire()
+    assert rejected.value.reason == 'queue_timeout'
+    limiter.release()
+    limiter.acquire()
+    assert (limiter.stats()['admitted'], limiter.stats()['shed_timeout']) == (2, 1)
+
+def test_async_limiter_queues_sheds_and_times_out():
+    limiter = AsyncConcurrencyLimiter('test_async', max_concurrent=1, max_queue=1, queue_timeout=0.2)
+
+    async def scenario():
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Rejected) as full:
+            await limiter.acquire_async()
+        await limiter.release_async(0.5)
+        await waiter
+        with pytest.raises(Rejected) as timed_out:
+            await limiter.acquire_async()
+        return full.value.reason, timed_out.value.reason
+
+    assert asyncio.run(scenario()) == ('queue_full', 'queue_timeout')
+    stats = limiter.stats()
+    assert (stats['in_flight'], stats['waiting'], stats['admitted']) == (1, 0, 2)
+
+def test_client_over_rate_gets_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0.5, burst=2))
+    client = app.test_client()
+    addr = {'REMOTE_ADDR': '10.0.0.1'}
+
+    assert [client.get('/fast', environ_base=addr).status_code for _ in range(2)] == [200, 200]
+    response = client.get('/fast', environ_base=addr)
+    assert response.status_code == 429
+    assert response.get_json()['reason'] == 'rate_limited'
+    assert response.headers['Retry-After'] == '2'
+
+    # Other clients have their own bucket
+    assert client.get('/fast', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+def test_forwarded_client_cannot_pick_its_bucket(monkeypatch):
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0.5, burst=1))
+    monkeypatch.setattr(admission, 'CLIENT_ID_HEADER', 'X-Forwarded-For')
+    client = app.test_client()
+
+    # The proxy appends the real address; the spoofed entries to its left are ignored
+    statuses = [client.get('/fast', headers={'X-Forwarded-For': f'1.2.3.{i}, 203.0.113.7'}).status_code
+                for i in range(2)]
+    assert statuses == [200, 429]
+
+def test_client_key_uses_trusted_hop_count(monkeypatch):
+    monkeypatch.setattr(admission, 'CLIENT_ID_HEADER', 'X-Forwarded-For')
+    headers = {'X-Forwarded-For': 'spoofed, 203.0.113.7, 10.0.0.5'}
+    assert admission.client_key(headers, '10.0.0.9') == '10.0.0.5'
+    monkeypatch.setattr(admission, 'TRUSTED_PROXY_HOPS', 2)
+    assert admission.client_key(headers, '10.0.0.9') == '203.0.113.7'
+    assert admission.client_key({}, '10.0.0.9') == '10.0.0.9'
@@ -0,0 +1,73 @@
+"""
+Tests for the ASGI app (asgi.py): validation, queued and awaited fetches, the
+job-queue 503 and load shedding, through Starlette's TestClient
+"""
+
+import pytest
+
+pytest.importorskip('a2wsgi')
+from starlette.testclient import TestClient
+
+from pollution_backend.api.jobs import job_service
+from pollution_backend.services.admission import admission_controller, ClientRateLimiter
+
+@pytest.fixture
+def asgi_client(db, monkeypatch):
+    import asgi
+
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0))
+    monkeypatch.setitem(job_service._handlers, 'satellite_fetch',
+                        lambda latitude, longitude, date, consumer=None: {'image_path': 'sat.jpg'})
+    with TestClient(asgi.app) as client:
+        yield client
+
+def test_invalid_fetch_returns_400(asgi_client):
+    assert asgi_client.post('/api/satellite/fetch', json={'latitude': 1}).status_code == 400
+    response = asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2, 'consumer': 'nope'})
+    assert response.status_code == 400
+
+def test_fetch_is_queued_and_polled_through_the_flask_app(asgi_client):
+    response = asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2})
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+
+    job = asgi_client.get(f'/api/jobs/{job_id}?wait=5').json()
+    assert (job['status'], job['result']) == ('succeeded', {'image_path': 'sat.jpg'})
+
+def test_full_job_queue_returns_503_with_retry_after(asgi_client, monkeypatch):
+    monkeypatch.setattr(job_service, 'max_pending', 0)
+    response = asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_awaited_fetch_uses_the_async_service(asgi_client, monkeypatch):
+    satellite = asgi_client.app.state.satellite
+
+    async def fetch(latitude, longitude, date, consumer=None):
+        return 'sat.jpg'
+
+    async def image_id_for(path):
+        return 7
+
+    monkeypatch.setattr(satellite, 'fetch_satellite_image', fetch)
+    monkeypatch.setattr(satellite, 'image_id_for', image_id_for)
+    response = asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2, 'async': False})
+    assert response.status_code == 200
+    assert response.json()['image_url'] == '/api/satellite/images/7'
+
+def test_saturated_fetch_is_shed_but_queued_fetches_are_not(asgi_client, monkeypatch):
+    limiter = admission_controller.limiters['fetch_async']
+    monkeypatch.setattr(limiter, 'max_concurrent', 0)
+    monkeypatch.setattr(limiter, 'max_queue', 0)
+
+    response = asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2, 'async': False})
+    assert response.status_code == 503
+    assert response.json()['reason'] == 'queue_full'
+    assert int(response.headers['Retry-After']) >= 1
+    assert asgi_client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2}).status_code == 202
+
+def test_client_over_rate_gets_429(asgi_client, monkeypatch):
+    monkeypatch.setattr(admission_controller, 'rate_limiter', ClientRateLimiter(rate=0.5, burst=1))
+    statuses = [asgi_client.post('/api/satellite/analyze', json={}).status_code for _ in range(2)]
+    assert statuses == [400, 429]
@@ -0,0 +1,47 @@
+"""
+Tests for the batch verification engine: undecodable images fail their report
+and are not saved
+"""
+
+from pollution_backend.services.batch_verification import BatchVerificationEngine
+
+class FakeReports:
+    def get_reports(self, report_ids):
+        return {report_id: {'id': report_id, 'latitude': 1.0, 'longitude': 2.0, 'date': '2025-01-20'}
+                for report_id in report_ids}
+
+    def get_user_image(self, report):
+        return f"user_{report['id']}.jpg"
+
+class FakeSatelliteService:
+    def fetch_satellite_image(self, latitude, longitude, date, consumer=None):
+        return 'sat.jpg'
+
+class FakeClassifier:
+    def classify_batch(self, paths):
+        return [{'error': 'cannot identify image file'} if path == 'user_2.jpg'
+                else {'category': 'oil_spill', 'confidence': 0.9} for path in paths]
+
+class FakeVerificationService:
+    def __init__(self):
+        self.saved = []
+
+    def compare_predictions(self, user_prediction, satellite_prediction):
+        return {'verified': True, 'reason': 'Categories match'}
+
+    def save_verifications(self, records):
+        self.saved += records
+        return len(records)
+
+def test_classification_errors_fail_the_report_and_are_not_saved():
+    verification_service = FakeVerificationService()
+    engine = BatchVerificationEngine(verification_service, satellite_service=FakeSatelliteService(),
+                                     classifier=FakeClassifier(), reports=FakeReports())
+    outcome = engine.verify_reports([1, 2])
+
+    first, second = outcome['results']
+    assert first['verified'] and first['user_prediction']['category'] == 'oil_spill'
+    assert not second['verified']
+    assert second['reason'] == 'Classification error: cannot identify image file'
+    assert [record.report_id for record in verification_service.saved] == [1]
+    assert outcome['persisted'] == 1
@@ -0,0 +1,97 @@
+"""
+Tests admission control under the real gunicorn.conf.py: a saturated endpoint
+sheds with 503 while /health is still answered
+
+gunicorn imports this module for its app (test_gunicorn:app)
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, jsonify
+
+from pollution_backend.api.middleware import admission_controlled
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+app = Flask(__name__)
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'healthy'})
+
+@app.route('/slow')
+@admission_controlled('test_gunicorn_slow', max_concurrent=1, max_queue=1)
+def slow():
+    # Held until the test creates the release file
+    deadline = time.monotonic() + 20
+    while not os.path.exists(os.environ['TEST_RELEASE_FILE']) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return jsonify({'ok': True})
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _get(url: str, timeout: float = 10):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+@pytest.fixture
+def server(tmp_path):
+    pytest.importorskip('gunicorn')
+    port = _free_port()
+    env = dict(os.environ,
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS='1', GUNICORN_THREADS='4',
+               PYTHONPATH=os.pathsep.join([os.path.dirname(BACKEND_DIR), os.environ.get('PYTHONPATH', '')]),
+               TEST_RELEASE_FILE=str(tmp_path / 'release'),
+               CLIENT_RATE_PER_SECOND='0', ADMISSION_QUEUE_TIMEOUT_MS='20000')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'test_gunicorn:app'],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                _get(f'{base_url}/health', timeout=1)
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    pytest.fail('gunicorn did not start')
+                time.sleep(0.1)
+        yield base_url, tmp_path / 'release'
+    finally:
+        (tmp_path / 'release').touch()
+        process.terminate()
+        process.wait(timeout=30)
+
+def test_saturated_endpoint_sheds_and_health_still_answers(server):
+    base_url, release = server
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        # One request runs and one waits in the queue, each holding a worker thread
+        held = [pool.submit(_get, f'{base_url}/slow', 20) for _ in range(2)]
+        time.sleep(0.5)
+
+        started = time.monotonic()
+        status, headers, body = _get(f'{base_url}/slow')
+        assert status == 503
+        assert body['reason'] == 'queue_full'
+        assert int(headers['Retry-After']) >= 1
+        assert _get(f'{base_url}/health')[0] == 200
+        assert time.monotonic() - started < 2
+
+        release.touch()
+        assert [future.result()[0] for future in held] == [200, 200]
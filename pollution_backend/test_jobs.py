@@ -0,0 +1,85 @@
+"""
+Tests for background jobs: submit, atomic claim and long-poll
+"""
+
+import threading
+
+import pytest
+
+from pollution_backend.api.jobs import job_service
+
+released = threading.Event()
+
+def _echo(value):
+    return {'value': value}
+
+def _blocking(value):
+    released.wait(10)
+    return {'value': value}
+
+def _failing():
+    raise RuntimeError('boom')
+
+@pytest.fixture(autouse=True)
+def handlers(db):
+    job_service.register('test_echo', _echo)
+    job_service.register('test_blocking', _blocking)
+    job_service.register('test_failing', _failing)
+    released.clear()
+    yield
+    released.set()
+
+def test_submit_returns_202_with_status_url(client):
+    response = client.post('/api/jobs', json={'kind': 'test_echo', 'params': {'value': 7}})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+
+    job = client.get(f'/api/jobs/{job_id}?wait=5').get_json()
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'value': 7}
+
+def test_submit_rejects_unknown_kind_and_bad_params(client):
+    assert client.post('/api/jobs', json={'kind': 'nope'}).status_code == 400
+    assert client.post('/api/jobs', json={'kind': 'test_echo', 'params': [1]}).status_code == 400
+
+def test_submit_returns_503_when_queue_full(client, monkeypatch):
+    monkeypatch.setattr(job_service, 'max_pending', 0)
+    response = client.post('/api/jobs', json={'kind': 'test_echo', 'params': {'value': 1}})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+    response = client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_failed_job_reports_error(client):
+    job_id = client.post('/api/jobs', json={'kind': 'test_failing'}).get_json()['job_id']
+    job = client.get(f'/api/jobs/{job_id}?wait=5').get_json()
+    assert job['status'] == 'failed'
+    assert job['error'] == 'boom'
+
+def test_long_poll_returns_on_timeout_then_on_completion(client):
+    job_id = client.post('/api/jobs', json={'kind': 'test_blocking', 'params': {'value': 3}}).get_json()['job_id']
+
+    job = client.get(f'/api/jobs/{job_id}?wait=0.2').get_json()
+    assert job['status'] in ('queued', 'running')
+
+    threading.Timer(0.2, released.set).start()
+    job = client.get(f'/api/jobs/{job_id}?wait=5').get_json()
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'value': 3}
+
+def test_unknown_job_is_404(client):
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.get('/api/jobs/missing?wait=0.1').status_code == 404
+
+def test_claim_is_atomic(db):
+    from pollution_backend.database.connection import get_db_context
+    from pollution_backend.database.models import Job
+
+    with get_db_context() as session:
+        session.add(Job(id='claim-me', kind='test_echo', status='queued', params='{"value": 1}'))
+
+    assert job_service._claim('claim-me').status == 'running'
+    assert job_service._claim('claim-me') is None
@@ -0,0 +1,98 @@
+"""
+Tests for the model manager: leases, swaps, retiring the old model and activation
+"""
+
+import pytest
+
+from pollution_backend.database.connection import get_db_context
+from pollution_backend.database.models import ModelVersion
+from pollution_backend.services import model_manager as model_manager_module
+from pollution_backend.services.model_manager import ModelManager, ServingModel
+
+class FakeClassifier:
+    """Stands in for ClassifierService without TensorFlow"""
+
+    def __init__(self, model_path='fallback.h5'):
+        self.model_path = model_path
+        self.unloaded = False
+
+    def is_loaded(self):
+        return not self.unloaded
+
+    def unload(self):
+        self.unloaded = True
+
+def _add_version(version, is_active, model_path=None):
+    with get_db_context() as session:
+        session.add(ModelVersion(version=version, model_path=model_path or f'{version}.h5', is_active=is_active,
+                                 class_names='["clean", "polluted"]', input_size='224x224'))
+
+@pytest.fixture
+def manager(db, monkeypatch):
+    manager = ModelManager(fallback=FakeClassifier(), poll_seconds=0)
+
+    def fake_load(row, key):
+        if row['model_path'].startswith('broken'):
+            raise ValueError('Model has 3 outputs but 2 class names')
+        return ServingModel(row['version'], FakeClassifier(row['model_path']), key)
+
+    monkeypatch.setattr(manager, '_load', fake_load)
+    return manager
+
+def test_refresh_swaps_and_retires_old_model_after_its_last_lease(manager):
+    with manager.lease() as old:
+        assert old.version == model_manager_module.MODEL_VERSION
+        _add_version('v2', is_active=True)
+        assert manager.refresh()
+
+        # In-flight batches keep the old model until they finish
+        assert old.retired and not old.classifier.unloaded
+        assert [serving['version'] for serving in manager.status()['retiring']] == [old.version]
+        with manager.lease() as new:
+            assert new.version == 'v2'
+
+    assert old.classifier.unloaded
+    assert manager.status()['retiring'] == []
+    assert not manager.refresh()
+    assert manager.swaps == 1
+
+def test_failed_load_keeps_serving_and_is_not_retried(manager):
+    _add_version('v3', is_active=True, model_path='broken.h5')
+    assert not manager.refresh()
+    assert manager.serving().version == model_manager_module.MODEL_VERSION
+    assert 'v3' in manager.status()['last_error']
+    assert not manager.refresh()
+
+def test_activate_flips_is_active_only_after_loading(manager):
+    _add_version('v1', is_active=True)
+    _add_version('v2', is_active=False)
+    _add_version('bad', is_active=False, model_path='broken.h5')
+
+    with pytest.raises(ValueError):
+        manager.activate('bad')
+    with pytest.raises(LookupError):
+        manager.activate('missing')
+    with get_db_context() as session:
+        assert [row.version for row in session.query(ModelVersion).filter(ModelVersion.is_active.is_(True))] == ['v1']
+
+    assert manager.activate('v2')
+    assert manager.serving().version == 'v2'
+    assert not manager.activate('v2')
+    with get_db_context() as session:
+        assert [row.version for row in session.query(ModelVersion).filter(ModelVersion.is_active.is_(True))] == ['v2']
+
+def test_activate_endpoint_reports_load_failure(client, manager, monkeypatch):
+    from pollution_backend.api import admin
+
+    monkeypatch.setattr(admin, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(admin, 'get_model_manager', lambda: manager)
+    _add_version('v1', is_active=True)
+    _add_version('bad', is_active=False, model_path='broken.h5')
+    headers = {'X-Admin-Token': 'secret'}
+
+    response = client.post('/api/admin/model/versions/bad/activate', headers=headers)
+    assert response.status_code == 500
+    assert client.post('/api/admin/model/versions/nope/activate', headers=headers).status_code == 404
+    response = client.post('/api/admin/model/versions/v1/activate', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['serving']['version'] == 'v1'
@@ -0,0 +1,50 @@
+"""
+Tests for request profiling of /api/satellite/fetch: an X-Profile request runs
+inline, a sampled one keeps the 202 and is profiled inside its job
+"""
+
+import pytest
+
+from pollution_backend.api import admin, satellite
+from pollution_backend.services.profiler import ProfileStore, request_profiler
+
+class FakeCache:
+    def image_id_for(self, path):
+        return 1
+
+class FakeSatelliteService:
+    cache = FakeCache()
+
+    def fetch_satellite_image(self, latitude, longitude, date, consumer=None):
+        return 'sat.jpg'
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(admin, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(request_profiler, 'store', ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(satellite, 'get_satellite_service', lambda: FakeSatelliteService())
+    submitted = []
+    monkeypatch.setattr(satellite.job_service, 'submit', lambda kind, params: submitted.append(params) or 'job-1')
+    return submitted
+
+def test_flagged_fetch_runs_inline_with_profile(client, profiling):
+    response = client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2},
+                           headers={'X-Profile': '1', 'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.headers['X-Profile-Id']
+    assert profiling == []
+
+def test_sampled_fetch_is_queued_and_profiled_in_its_job(client, profiling, monkeypatch):
+    monkeypatch.setattr(request_profiler, 'sample_rate', 1.0)
+    response = client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2})
+    assert response.status_code == 202
+    assert 'X-Profile-Id' not in response.headers
+    assert profiling[0]['profile'] is True
+
+    result = satellite._fetch_job(**profiling[0])
+    assert result['image_path'] == 'sat.jpg'
+    assert request_profiler.store.get(result['profile_id'])['trigger'] == 'sample'
+
+def test_unsampled_fetch_is_queued_without_profile(client, profiling):
+    assert client.post('/api/satellite/fetch', json={'latitude': 1, 'longitude': 2}).status_code == 202
+    assert 'profile' not in profiling[0]
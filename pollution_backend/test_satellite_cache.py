@@ -0,0 +1,89 @@
+"""
+Tests for the satellite image cache: store, LRU/TTL sweep and schema upgrade
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, inspect, text
+
+from pollution_backend.database.connection import get_db_context
+from pollution_backend.database.migrations import upgrade_schema
+from pollution_backend.database.models import SatelliteImage
+from pollution_backend.services.cache_manager import SatelliteCacheManager
+
+def _store(cache, name, size=1000):
+    return cache.store(name, b'x' * size, 18.5, 73.8, '2025-01-20', 'sentinel_hub', '224x224')
+
+def _set_last_accessed(path, when):
+    with get_db_context() as session:
+        session.query(SatelliteImage).filter(SatelliteImage.image_path == path).update(
+            {'last_accessed': when}, synchronize_session=False
+        )
+
+def test_store_shards_file_and_records_it(db, tmp_path):
+    cache = SatelliteCacheManager(str(tmp_path), max_bytes=0, ttl_seconds=0)
+    path = _store(cache, 'sentinel_18.5_73.8_20250120_224x224.jpg')
+
+    assert path == cache.path_for('sentinel_18.5_73.8_20250120_224x224.jpg')
+    assert os.path.relpath(path, str(tmp_path)).count(os.sep) == 2
+    assert cache.lookup('missing.jpg', 'sentinel_18.5_73.8_20250120_224x224.jpg') == path
+
+    stats = cache.stats()
+    assert (stats['files'], stats['bytes'], stats['hits'], stats['misses']) == (1, 1000, 1, 0)
+    image = cache.get_image(cache.image_id_for(path))
+    assert image['size_bytes'] == 1000
+    assert len(image['content_hash']) == 64
+
+def test_sweep_evicts_least_recently_used_down_to_low_watermark(db, tmp_path):
+    cache = SatelliteCacheManager(str(tmp_path), max_bytes=3000, ttl_seconds=0)
+    paths = [_store(cache, f'img_{i}.jpg') for i in range(4)]
+    now = datetime.utcnow()
+    for age, path in zip([4, 1, 3, 2], paths):
+        _set_last_accessed(path, now - timedelta(minutes=age))
+
+    # 4000 bytes over a 3000 budget: evict the oldest until at most 0.9 * 3000
+    assert cache.sweep() == 2
+    assert [os.path.exists(path) for path in paths] == [False, True, False, True]
+    assert cache.occupancy_bytes() == 2000
+
+def test_sweep_evicts_expired_images(db, tmp_path):
+    cache = SatelliteCacheManager(str(tmp_path), max_bytes=0, ttl_seconds=60)
+    fresh = _store(cache, 'fresh.jpg')
+    stale = _store(cache, 'stale.jpg')
+    _set_last_accessed(stale, datetime.utcnow() - timedelta(seconds=120))
+
+    assert cache.sweep() == 1
+    assert os.path.exists(fresh) and not os.path.exists(stale)
+    assert cache.image_id_for(stale) is None
+
+def test_upgrade_schema_adds_columns_and_indexes_to_existing_table(tmp_path):
+    image = tmp_path / 'old.jpg'
+    image.write_bytes(b'y' * 42)
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE satellite_images (id INTEGER PRIMARY KEY, latitude FLOAT NOT NULL, "
+            "longitude FLOAT NOT NULL, date VARCHAR(10) NOT NULL, image_path VARCHAR(500) NOT NULL, "
+            "source VARCHAR(50) NOT NULL, resolution VARCHAR(20), cloud_coverage FLOAT, timestamp DATETIME NOT NULL)"
+        ))
+        for path in [str(image), str(image), str(tmp_path / 'gone.jpg')]:
+            connection.execute(text(
+                "INSERT INTO satellite_images (latitude, longitude, date, image_path, source, timestamp) "
+                "VALUES (1, 2, '2025-01-20', :path, 'sentinel_hub', '2025-01-20 00:00:00')"
+            ), {'path': path})
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    columns = {column['name'] for column in inspect(engine).get_columns('satellite_images')}
+    assert {'size_bytes', 'content_hash', 'last_accessed', 'access_count'} <= columns
+    indexes = {index['name']: index for index in inspect(engine).get_indexes('satellite_images')}
+    assert indexes['ix_satellite_images_image_path']['unique']
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT id, image_path, size_bytes, access_count, last_accessed FROM satellite_images"
+        )).all()
+    # Duplicates keep the newest row; rows of missing files are dropped
+    assert [(row[0], row[1], row[2], row[3]) for row in rows] == [(2, str(image), 42, 0)]
+    assert rows[0][4] is not None
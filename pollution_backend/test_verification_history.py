@@ -0,0 +1,36 @@
+"""
+Tests for verification history: keyset paging
+"""
+
+from datetime import datetime, timedelta
+
+from pollution_backend.database.models import VerificationResult
+from pollution_backend.services.verification_service import persist_verifications
+
+def _record(report_id, category='oil_spill', verified=True, timestamp=None):
+    return VerificationResult(
+        report_id=report_id, user_image_path=f'user_{report_id}.jpg', satellite_image_path='sat.jpg',
+        user_category=category, satellite_category=category, user_confidence=0.9,
+        satellite_confidence=0.9, verified=verified, reason='test', timestamp=timestamp
+    )
+
+def test_history_pages_by_keyset_cursor(client, db):
+    # Ties on timestamp must page by id without skipping or repeating rows
+    now = datetime.utcnow()
+    persist_verifications([_record(i, timestamp=now - timedelta(seconds=i // 3)) for i in range(25)])
+
+    seen, cursor = [], None
+    while True:
+        query = '/api/verification/history?limit=10' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(query).get_json()
+        seen += [(item['timestamp'], item['id']) for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == 25
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == 25
+
+def test_history_rejects_malformed_cursor(client, db):
+    assert client.get('/api/verification/history?cursor=not-a-cursor').status_code == 400
@@ -0,0 +1,39 @@
+"""
+Tests for verification stats: served from the rollup and rebuilt when it is missing
+"""
+
+from datetime import datetime, timedelta
+
+from pollution_backend.database.connection import get_db_context
+from pollution_backend.database.models import VerificationResult, VerificationStatsRollup
+from pollution_backend.services.verification_service import persist_verifications
+
+def _record(report_id, category='oil_spill', verified=True, timestamp=None):
+    return VerificationResult(
+        report_id=report_id, user_image_path=f'user_{report_id}.jpg', satellite_image_path='sat.jpg',
+        user_category=category, satellite_category=category, user_confidence=0.9,
+        satellite_confidence=0.9, verified=verified, reason='test', timestamp=timestamp
+    )
+
+def test_stats_come_from_rollup(client, db):
+    persist_verifications([_record(1), _record(2, verified=False), _record(3, 'algae_bloom')])
+    persist_verifications([_record(4, 'algae_bloom', verified=False)])
+
+    stats = client.get('/api/verification/stats').get_json()
+    assert stats['total_verifications'] == 4
+    assert stats['verified_count'] == 2
+    assert stats['rejected_count'] == 2
+    assert stats['verification_rate'] == 50
+    assert stats['category_breakdown']['oil_spill'] == 2
+    assert stats['category_breakdown']['algae_bloom'] == 2
+
+def test_stats_rebuild_missing_rollup(client, db):
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    persist_verifications([_record(1, timestamp=yesterday), _record(2), _record(3, verified=False)])
+    with get_db_context() as session:
+        session.query(VerificationStatsRollup).delete()
+
+    stats = client.get('/api/verification/stats').get_json()
+    assert (stats['total_verifications'], stats['verified_count']) == (3, 2)
+    with get_db_context() as session:
+        assert session.query(VerificationStatsRollup).count() == 3
@@ -0,0 +1,73 @@
+"""
+Tests for write-behind persistence of verification results: batching, bad rows,
+transient failures and shutdown
+"""
+
+import threading
+
+from pollution_backend.database.connection import get_db_context
+from pollution_backend.database.models import VerificationResult, VerificationStatsRollup
+from pollution_backend.services.verification_service import persist_verifications
+from pollution_backend.services.write_behind import WriteBehindQueue
+
+def _record(report_id, category='oil_spill', verified=True, timestamp=None):
+    return VerificationResult(
+        report_id=report_id, user_image_path=f'user_{report_id}.jpg', satellite_image_path='sat.jpg',
+        user_category=category, satellite_category=category, user_confidence=0.9,
+        satellite_confidence=0.9, verified=verified, reason='test', timestamp=timestamp
+    )
+
+def test_write_behind_flushes_in_batches(db):
+    queue = WriteBehindQueue(persist_verifications, max_batch_rows=4, flush_interval_ms=20)
+    assert all(queue.enqueue(_record(i)) for i in range(10))
+    queue.flush()
+
+    stats = queue.stats()
+    assert (stats['persisted'], stats['failed']) == (10, 0)
+    assert stats['batches'] >= 3
+    with get_db_context() as session:
+        assert session.query(VerificationResult).count() == 10
+    queue.close()
+
+def test_write_behind_drops_only_bad_rows(db):
+    queue = WriteBehindQueue(persist_verifications, max_batch_rows=10, flush_interval_ms=20)
+    for i in range(6):
+        # NULL user_category violates NOT NULL and fails the whole batch
+        queue.enqueue(_record(i, category=None if i == 2 else 'oil_spill'))
+    queue.flush()
+
+    stats = queue.stats()
+    assert (stats['persisted'], stats['failed']) == (5, 1)
+    with get_db_context() as session:
+        assert sorted(row.report_id for row in session.query(VerificationResult)) == [0, 1, 3, 4, 5]
+        assert session.query(VerificationStatsRollup.count).scalar() == 5
+    queue.close()
+
+def test_write_behind_retries_transient_failures():
+    calls = []
+
+    def flaky(items):
+        calls.append(list(items))
+        if len(calls) < 3:
+            raise ConnectionError('database unavailable')
+
+    queue = WriteBehindQueue(flaky, flush_interval_ms=20, retry_backoff_ms=1)
+    queue.enqueue('a')
+    queue.enqueue('b')
+    queue.flush()
+
+    assert calls == [['a', 'b']] * 3
+    stats = queue.stats()
+    assert (stats['persisted'], stats['failed'], stats['retries']) == (2, 0, 2)
+    queue.close()
+
+def test_write_behind_rejects_after_close():
+    done = threading.Event()
+    queue = WriteBehindQueue(lambda items: done.set(), flush_interval_ms=20)
+    assert queue.enqueue('a')
+    queue.close()
+
+    assert done.is_set()
+    assert queue.closed
+    assert not queue.enqueue('b')
+    assert queue.stats()['rejected'] == 0
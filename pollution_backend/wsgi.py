@@ -0,0 +1,63 @@
+"""
+WSGI entry point for gunicorn
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (the default in gunicorn.conf.py) this module is imported once in
+the master: the read-only lookup tables, decoders and TensorFlow's modules are
+loaded before fork, so workers share those pages copy-on-write instead of each
+holding a copy. The model itself is loaded in each worker (load_worker_model):
+loading it starts TensorFlow's runtime thread pools, which don't survive fork, and
+inference on a model loaded in the master hangs in the workers.
+"""
+
+import os
+import logging
+
+from app import create_app
+from pollution_backend.database.connection import wait_for_db, DB_READY_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'True').lower() == 'true'
+
+def preload_shared_state():
+    """Load everything workers only read: category tables, image sizes, decoders and TensorFlow's modules"""
+    import numpy  # noqa: F401
+    from PIL import Image
+    Image.init()
+
+    from pollution_backend.services import image_sizes, verification_service  # noqa: F401
+
+    if PRELOAD_MODEL:
+        # Importing is fork-safe; TensorFlow starts its runtime only when a model is loaded
+        try:
+            import tensorflow  # noqa: F401
+        except ImportError as e:
+            logger.warning(f"TensorFlow not preloaded: {str(e)}")
+
+def load_worker_model():
+    """
+    Load and warm up the serving model in a worker (gunicorn's post_worker_init),
+    so the first batch doesn't wait for it
+    """
+    if not PRELOAD_MODEL:
+        return
+    from pollution_backend.services.model_manager import get_model_manager
+
+    # The active ModelVersion if there is one, else MODEL_PATH
+    manager = get_model_manager()
+    if not manager.refresh():
+        try:
+            manager.serving().classifier.get_model()
+        except FileNotFoundError as e:
+            logger.warning(f"Classifier not preloaded: {str(e)}")
+
+# Jobs are recovered and the model poller started per worker (post_worker_init), not in
+# the master, whose threads the workers would not inherit
+app = create_app(recover_jobs=False, start_model_poller=False)
+
+# Workers forked from a preloaded master inherit this readiness; finish it first
+if not wait_for_db(DB_READY_TIMEOUT):
+    logger.error("Database was not ready before fork; requests will wait for it")
+
+preload_shared_state()
@@ -1,6 +1,7 @@
 import os
+import json
 import argparse
-from typing import Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 from PIL import Image
@@ -24,7 +25,10 @@ def _load_model(model_path: str = "model.h5") -> tf.keras.Model:
 
 
 def _prepare_image(image_path: str, size: Tuple[int, int] = (224, 224)) -> np.ndarray:
-    img = Image.open(image_path).convert("RGB")
+    img = Image.open(image_path)
+    # JPEGs can decode straight at a reduced scale that still covers the target size
+    img.draft("RGB", size)
+    img = img.convert("RGB")
     img = _center_crop_to_square(img)
     img = img.resize(size)
     arr = np.asarray(img, dtype=np.float32)
@@ -33,6 +37,93 @@ def _prepare_image(image_path: str, size: Tuple[int, int] = (224, 224)) -> np.nd
     return arr
 
 
+def _sliding_window_origins(length: int, window: int, stride: int) -> List[int]:
+    """Window start offsets along one axis; the last window is snapped to the edge."""
+    if length <= window:
+        return [0]
+    origins = list(range(0, length - window + 1, stride))
+    if origins[-1] != length - window:
+        origins.append(length - window)
+    return origins
+
+
+def _iter_window_batches(
+    arr: np.ndarray, window: int, stride: int, batch_size: int
+) -> Iterator[Tuple[np.ndarray, List[Tuple[int, int]]]]:
+    h, w = arr.shape[:2]
+    batch: List[np.ndarray] = []
+    origins: List[Tuple[int, int]] = []
+    for top in _sliding_window_origins(h, window, stride):
+        for left in _sliding_window_origins(w, window, stride):
+            batch.append(arr[top:top + window, left:left + window])
+            origins.append((top, left))
+            if len(batch) == batch_size:
+                yield np.stack(batch), origins
+                batch, origins = [], []
+    if batch:
+        yield np.stack(batch), origins
+
+
+def _pixel_geotransform(bbox: Sequence[float], width: int, height: int) -> Tuple[float, ...]:
+    """GDAL-style geotransform for a north-up image covering bbox [minx, miny, maxx, maxy]."""
+    minx, miny, maxx, maxy = bbox
+    return (minx, (maxx - minx) / width, 0.0, maxy, 0.0, -(maxy - miny) / height)
+
+
+def predict_heatmap(
+    image_path: str,
+    model_path: str = "model.h5",
+    window: int = 224,
+    stride: int = 112,
+    batch_size: int = 32,
+    bbox: Optional[Sequence[float]] = None,
+    model: Optional[tf.keras.Model] = None,
+) -> Dict:
+    """
+    Scores a whole image with overlapping window x window tiles and returns a
+    per-pixel probability-of-pollution heatmap.
+
+    - stride: step between windows; smaller strides overlap more (slower, smoother)
+    - bbox: optional [minx, miny, maxx, maxy] of the image, used to georeference the heatmap
+    - heatmap: float32 array (H, W), the mean probability of every window covering a pixel
+    - windows: number of windows scored
+    - geotransform: GDAL-style transform of the heatmap (None without bbox)
+    """
+    if stride <= 0 or stride > window:
+        raise ValueError(f"stride must be in (0, {window}], got {stride}")
+    if model is None:
+        model = _load_model(model_path)
+
+    img = Image.open(image_path).convert("RGB")
+    w, h = img.size
+    if min(w, h) < window:
+        # Scenes smaller than one window are upscaled so a single tile covers them
+        scale = window / min(w, h)
+        img = img.resize((max(window, round(w * scale)), max(window, round(h * scale))))
+    arr = mobilenet_preprocess(np.asarray(img, dtype=np.float32))
+
+    height, width = arr.shape[:2]
+    prob_sum = np.zeros((height, width), dtype=np.float32)
+    hits = np.zeros((height, width), dtype=np.float32)
+    windows = 0
+    for batch, origins in _iter_window_batches(arr, window, stride, batch_size):
+        probs = model.predict(batch, verbose=0).reshape(-1)
+        for (top, left), p in zip(origins, probs):
+            prob_sum[top:top + window, left:left + window] += p
+            hits[top:top + window, left:left + window] += 1.0
+        windows += len(origins)
+
+    heatmap = prob_sum / np.maximum(hits, 1.0)
+    return {
+        "heatmap": heatmap,
+        "windows": windows,
+        "window": window,
+        "stride": stride,
+        "bbox": list(bbox) if bbox is not None else None,
+        "geotransform": _pixel_geotransform(bbox, width, height) if bbox is not None else None,
+    }
+
+
 def predict_image(image_path: str, model_path: str = "model.h5") -> Tuple[str, float]:
     """
     Runs prediction on a single image and returns (label, confidence).
@@ -52,8 +143,24 @@ def main():
     parser = argparse.ArgumentParser(description="Predict clean vs polluted for a single image")
     parser.add_argument("--image", required=True, help="Path to image file")
     parser.add_argument("--model", default="model.h5", help="Path to Keras model (.h5)")
+    parser.add_argument("--heatmap", default=None, help="Score the whole image with sliding windows and save the heatmap (.npy) here")
+    parser.add_argument("--stride", type=int, default=112, help="Sliding-window stride in pixels (heatmap mode)")
+    parser.add_argument("--batch_size", type=int, default=32, help="Windows per inference batch (heatmap mode)")
+    parser.add_argument("--bbox", type=float, nargs=4, default=None, metavar=("MINX", "MINY", "MAXX", "MAXY"),
+                        help="Geographic bounds of the image, used to georeference the heatmap")
     args = parser.parse_args()
 
+    if args.heatmap:
+        result = predict_heatmap(args.image, args.model, stride=args.stride, batch_size=args.batch_size, bbox=args.bbox)
+        heatmap = result.pop("heatmap")
+        np.save(args.heatmap, heatmap)
+        with open(os.path.splitext(args.heatmap)[0] + ".json", "w") as f:
+            json.dump(dict(result, shape=list(heatmap.shape)), f)
+        print("windows:", result["windows"])
+        print("max polluted probability:", round(float(heatmap.max()), 4))
+        print("heatmap saved to", args.heatmap)
+        return
+
     label, conf = predict_image(args.image, args.model)
     print("prediction:", label)
     print("confidence:", round(conf, 4))
@@ -9,7 +9,10 @@ import io
 import numpy as np
 
 class SentinelClient:
-    def __init__(self):
+    def __init__(self, output_sizes=None):
+        # Optional {consumer: (width, height)} table, e.g. the backend's
+        # pollution_backend.services.image_sizes.OUTPUT_SIZES
+        self.output_sizes = output_sizes or {}
         self.token = None
         self.token_expires = 0
 
@@ -29,7 +32,14 @@ class SentinelClient:
         self.token_expires = time.time() + obj.get("expires_in", 3600)
         return self.token
 
-    def request_image(self, bbox, time_interval, width, height):
+    def request_image(self, bbox, time_interval, width=None, height=None, consumer="classifier"):
+        # Ask for exactly the pixels the consumer will use unless a size is given
+        if width is None or height is None:
+            if consumer not in self.output_sizes:
+                raise ValueError(f"No output size for consumer {consumer!r}; pass width and height "
+                                 "or give SentinelClient an output_sizes table")
+            width, height = self.output_sizes[consumer]
+
         token = self.authenticate()
         headers = {
             "Authorization": f"Bearer {token}",
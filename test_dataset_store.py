@@ -0,0 +1,101 @@
+"""
+Tests for the training dataset store: incremental compile, shard compaction and
+rebuild at a new size
+"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dataset_store import DatasetStore, _load_resized
+
+IMG_SIZE = (32, 32)
+
+def _write_image(dataset_dir, relpath, shade):
+    path = os.path.join(dataset_dir, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', (48, 40), color=(shade, 255 - shade, shade // 2)).save(path)
+    return path
+
+@pytest.fixture
+def dataset(tmp_path):
+    dataset_dir = str(tmp_path / 'dataset')
+    for i in range(6):
+        _write_image(dataset_dir, f'clean/{i}.png', i * 10)
+        _write_image(dataset_dir, f'polluted/{i}.png', 100 + i * 10)
+    return dataset_dir
+
+def _shards(store_dir):
+    return sorted(name for name in os.listdir(store_dir) if name.startswith('shard_'))
+
+def test_compile_is_incremental(dataset, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    store = DatasetStore(store_dir, IMG_SIZE, shard_size=4)
+    assert store.compile(dataset) == {'added': 12, 'changed': 0, 'unchanged': 0, 'removed': 0, 'compacted': 0}
+    assert len(_shards(store_dir)) == 3
+
+    # A fresh instance reads the manifest and decodes nothing
+    store = DatasetStore(store_dir, IMG_SIZE, shard_size=4)
+    assert store.compile(dataset)['unchanged'] == 12
+    assert len(_shards(store_dir)) == 3
+
+    changed = _write_image(dataset, 'clean/0.png', 200)
+    _write_image(dataset, 'polluted/new.png', 50)
+    stats = store.compile(dataset)
+    assert (stats['added'], stats['changed'], stats['unchanged']) == (1, 1, 11)
+    assert len(_shards(store_dir)) == 4
+
+    np.testing.assert_array_equal(store.images(['clean/0.png'])[0], _load_resized(changed, IMG_SIZE))
+    assert store.labels(['clean/0.png', 'polluted/new.png']).tolist() == [0.0, 1.0]
+
+def test_compile_compacts_mostly_dead_shards(dataset, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    store = DatasetStore(store_dir, IMG_SIZE, shard_size=4)
+    store.compile(dataset)
+    expected = {relpath: store.images([relpath])[0].copy() for relpath in store.files}
+
+    # Shards hold files in sorted order: the first is clean/0..3
+    for i in range(3):
+        os.remove(os.path.join(dataset, f'clean/{i}.png'))
+        del expected[f'clean/{i}.png']
+    stats = store.compile(dataset)
+
+    assert (stats['removed'], stats['compacted']) == (3, 1)
+    assert 'shard_00000.npy' not in _shards(store_dir)
+    assert len(store) == 9
+    for relpath, image in expected.items():
+        np.testing.assert_array_equal(store.images([relpath])[0], image)
+
+def test_compile_rebuilds_when_size_changes(dataset, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    DatasetStore(store_dir, IMG_SIZE).compile(dataset)
+
+    store = DatasetStore(store_dir, (16, 16))
+    assert store.compile(dataset)['added'] == 12
+    assert store.images(['clean/1.png']).shape == (1, 16, 16, 3)
+    assert len(_shards(store_dir)) == 1
+
+def test_split_matches_class_order(dataset, tmp_path):
+    store = DatasetStore(str(tmp_path / 'store'), IMG_SIZE)
+    store.compile(dataset)
+    train_ids, val_ids = store.split(0.5)
+    assert val_ids == ['clean/0.png', 'clean/1.png', 'clean/2.png',
+                       'polluted/0.png', 'polluted/1.png', 'polluted/2.png']
+    assert len(train_ids) == 6
+    assert store.manifest_key(train_ids) != store.manifest_key(val_ids)
+
+@pytest.mark.parametrize("source_size", [(48, 40), (20, 13)])
+def test_load_resized_matches_make_dataset(tmp_path, source_size):
+    pytest.importorskip("tensorflow")
+    from train_model import make_dataset
+
+    path = str(tmp_path / "noise.png")
+    pixels = np.random.default_rng(0).integers(0, 256, source_size[::-1] + (3,), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+
+    batch, _ = next(iter(make_dataset([path], [0], IMG_SIZE, 1, False, 0, cache=False)))
+    # Undo MobileNetV2's scaling to [-1, 1]
+    expected = np.round((batch.numpy()[0] + 1.0) * 127.5)
+    assert np.abs(_load_resized(path, IMG_SIZE).astype(np.float32) - expected).max() <= 1
@@ -0,0 +1,54 @@
+"""
+Tests for multi-head inference: a split model's backbone and numpy head give
+the Keras model's output, and heads round-trip through save_head/load_head
+"""
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from tensorflow.keras import layers, Model
+
+from multi_head import apply_head, backbone_fingerprint, load_head, split_model
+from train_model import save_frozen_head
+
+
+def _small_model(head_layers) -> Model:
+    """build_model's layout (backbone, pooling, Dropout/Dense head) with a tiny random backbone"""
+    inputs = layers.Input(shape=(16, 16, 3))
+    x = layers.Conv2D(8, 3, activation="relu")(inputs)
+    x = layers.GlobalAveragePooling2D()(x)
+    for layer in head_layers:
+        x = layer(x)
+    return Model(inputs, x)
+
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(0).random((5, 16, 16, 3)).astype(np.float32)
+
+
+@pytest.mark.parametrize("head_layers", [
+    lambda: [layers.Dropout(0.2), layers.Dense(1, activation="sigmoid")],
+    lambda: [layers.Dense(6, activation="relu"), layers.Dropout(0.5), layers.Dense(3, activation="softmax")],
+])
+def test_split_model_reproduces_keras_output(head_layers, images):
+    model = _small_model(head_layers())
+    backbone, head = split_model(model)
+
+    expected = model.predict(images, verbose=0)
+    np.testing.assert_allclose(apply_head(head, backbone.predict(images, verbose=0)), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_frozen_head_round_trips_with_backbone_fingerprint(images, tmp_path):
+    model = _small_model([layers.Dropout(0.2), layers.Dense(1, activation="sigmoid")])
+    path = str(tmp_path / "head.npz")
+    save_frozen_head(model, path)
+
+    head, fingerprint, class_names = load_head(path)
+    backbone, _ = split_model(model)
+    assert fingerprint == backbone_fingerprint(backbone)
+    assert class_names is None
+    np.testing.assert_allclose(apply_head(head, backbone.predict(images, verbose=0)),
+                               model.predict(images, verbose=0), rtol=1e-5, atol=1e-6)
@@ -1,13 +1,20 @@
 import os
+import json
+import time
+import hashlib
 import argparse
+from typing import Callable, List, Optional, Tuple
 
 import tensorflow as tf
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.applications.mobilenet_v2 import preprocess_input as mobilenet_preprocess
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import numpy as np
 from tensorflow.keras import layers, Model
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
 
+from dataset_store import DatasetStore
+
 
 def build_model(input_shape=(224, 224, 3)) -> Model:
     base = MobileNetV2(include_top=False, weights="imagenet", input_shape=input_shape)
@@ -17,30 +24,47 @@ def build_model(input_shape=(224, 224, 3)) -> Model:
     x = layers.Lambda(mobilenet_preprocess)(inputs)
     x = base(x, training=False)
     x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.2)(x)
-    outputs = layers.Dense(1, activation="sigmoid")(x)
+    outputs = _head(x)
     model = Model(inputs, outputs)
     return model
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Train MobileNetV2 binary classifier for clean vs polluted water")
-    parser.add_argument("--dataset_dir", type=str, default="dataset", help="Path with subfolders clean/ and polluted/")
-    parser.add_argument("--batch_size", type=int, default=32)
-    parser.add_argument("--epochs", type=int, default=10)
-    parser.add_argument("--val_split", type=float, default=0.2)
-    parser.add_argument("--output", type=str, default="model.h5")
-    parser.add_argument("--seed", type=int, default=42)
-    args = parser.parse_args()
+def _head(x):
+    x = layers.Dropout(0.2)(x)
+    return layers.Dense(1, activation="sigmoid")(x)
 
-    if not os.path.isdir(args.dataset_dir):
-        raise FileNotFoundError(f"Dataset directory not found: {args.dataset_dir}")
 
-    img_size = (224, 224)
+def build_head(feature_dim: int) -> Model:
+    """build_model's layers after pooling, trained on its own on cached features."""
+    inputs = layers.Input(shape=(feature_dim,))
+    return Model(inputs, _head(inputs))
+
+
+def pooling_index(model: Model) -> int:
+    for i, layer in enumerate(model.layers):
+        if isinstance(layer, layers.GlobalAveragePooling2D):
+            return i
+    raise ValueError("Model has no GlobalAveragePooling2D layer; expected the layout of build_model")
+
+
+def feature_extractor(model: Model) -> Model:
+    """The model up to its pooled features (image -> 1280 floats), sharing its layers."""
+    return Model(model.inputs, model.layers[pooling_index(model)].output)
+
 
+EXPECTED_CLASSES = ["clean", "polluted"]
+
+
+def _check_classes(class_names: List[str]) -> None:
+    if set(class_names) != set(EXPECTED_CLASSES):
+        raise ValueError(f"Expected class folders 'clean' and 'polluted'. Found: {list(class_names)}")
+
+
+def make_generators(dataset_dir: str, img_size: Tuple[int, int], batch_size: int, val_split: float, seed: int):
+    """Legacy ImageDataGenerator input: decodes and augments in Python, one batch at a time."""
     train_datagen = ImageDataGenerator(
         preprocessing_function=mobilenet_preprocess,
-        validation_split=args.val_split,
+        validation_split=val_split,
         rotation_range=20,
         width_shift_range=0.1,
         height_shift_range=0.1,
@@ -52,32 +76,298 @@ def main():
 
     val_datagen = ImageDataGenerator(
         preprocessing_function=mobilenet_preprocess,
-        validation_split=args.val_split,
+        validation_split=val_split,
     )
 
     train_gen = train_datagen.flow_from_directory(
-        args.dataset_dir,
+        dataset_dir,
         target_size=img_size,
-        batch_size=args.batch_size,
+        batch_size=batch_size,
         class_mode="binary",
         shuffle=True,
         subset="training",
-        seed=args.seed,
+        seed=seed,
     )
 
     val_gen = val_datagen.flow_from_directory(
-        args.dataset_dir,
+        dataset_dir,
         target_size=img_size,
-        batch_size=args.batch_size,
+        batch_size=batch_size,
         class_mode="binary",
         shuffle=False,
         subset="validation",
-        seed=args.seed,
+        seed=seed,
     )
 
-    expected_classes = set(["clean", "polluted"])
-    if set(train_gen.class_indices.keys()) != expected_classes:
-        raise ValueError(f"Expected class folders 'clean' and 'polluted'. Found: {list(train_gen.class_indices.keys())}")
+    _check_classes(list(train_gen.class_indices.keys()))
+    return train_gen, val_gen
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+
+def list_split(dataset_dir: str, val_split: float) -> Tuple[List[str], List[int], List[str], List[int]]:
+    """
+    Files and labels per subset, split like flow_from_directory: per class, in
+    sorted order, the first val_split fraction is validation.
+    """
+    class_names = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+    _check_classes(class_names)
+    train_paths, train_labels, val_paths, val_labels = [], [], [], []
+    for label, name in enumerate(class_names):
+        class_dir = os.path.join(dataset_dir, name)
+        files = sorted(os.path.join(class_dir, f) for f in os.listdir(class_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        split = int(val_split * len(files))
+        val_paths += files[:split]
+        val_labels += [label] * split
+        train_paths += files[split:]
+        train_labels += [label] * (len(files) - split)
+    return train_paths, train_labels, val_paths, val_labels
+
+
+def build_augmentation(seed: Optional[int] = None) -> tf.keras.Sequential:
+    """The generator's augmentation as batched layers (its 0.1 degree shear is left out)."""
+    return tf.keras.Sequential([
+        layers.RandomRotation(20 / 360, fill_mode="nearest", seed=seed),
+        layers.RandomTranslation(0.1, 0.1, fill_mode="nearest", seed=seed),
+        layers.RandomZoom(0.15, fill_mode="nearest", seed=seed),
+        layers.RandomFlip("horizontal", seed=seed),
+    ], name="augmentation")
+
+
+def make_dataset(paths: List[str], labels: List[int], img_size: Tuple[int, int], batch_size: int,
+                 training: bool, seed: int, cache_file: Optional[str] = None,
+                 augment: Optional[bool] = None, cache: bool = True) -> tf.data.Dataset:
+    """
+    tf.data input: decodes and resizes in parallel, caches the resized uint8
+    images after the first epoch, then augments whole batches and prefetches
+    so the next batch is ready when the model asks for it.
+
+    - training: shuffle each epoch, and augment unless augment says otherwise
+    - cache: False for one-pass datasets, which would only fill memory
+    """
+    autotune = tf.data.AUTOTUNE
+
+    def decode(path, label):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        img = tf.image.resize(img, img_size)
+        return tf.cast(tf.round(img), tf.uint8), tf.cast(label, tf.float32)
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(decode, num_parallel_calls=autotune)
+    if cache:
+        ds = ds.cache(cache_file or "")
+    if training:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    return finish_dataset(ds, batch_size, seed, training if augment is None else augment)
+
+
+def finish_dataset(ds: tf.data.Dataset, batch_size: int, seed: int, augment: bool) -> tf.data.Dataset:
+    """Batches uint8 (image, label) pairs, augments them if asked, scales them for MobileNetV2 and prefetches."""
+    autotune = tf.data.AUTOTUNE
+    ds = ds.batch(batch_size)
+    if augment:
+        augmentation = build_augmentation(seed)
+        ds = ds.map(lambda x, y: (augmentation(tf.cast(x, tf.float32), training=True), y), num_parallel_calls=autotune)
+    ds = ds.map(lambda x, y: (mobilenet_preprocess(tf.cast(x, tf.float32)), y), num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+
+def make_datasets(dataset_dir: str, img_size: Tuple[int, int], batch_size: int, val_split: float, seed: int,
+                  cache_file: Optional[str] = None):
+    train_paths, train_labels, val_paths, val_labels = list_split(dataset_dir, val_split)
+    print(f"Found {len(train_paths)} training and {len(val_paths)} validation images.")
+    train_ds = make_dataset(train_paths, train_labels, img_size, batch_size, True, seed,
+                            cache_file + ".train" if cache_file else None)
+    val_ds = make_dataset(val_paths, val_labels, img_size, batch_size, False, seed,
+                          cache_file + ".val" if cache_file else None)
+    return train_ds, val_ds
+
+
+def dataset_manifest_key(paths: List[str], labels: List[int], img_size: Tuple[int, int], views: int, seed: int) -> str:
+    """Changes whenever a file is added, removed, relabelled or modified, or the views change."""
+    entries = []
+    for path, label in zip(paths, labels):
+        stat = os.stat(path)
+        entries.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, int(label)])
+    manifest = {"files": entries, "img_size": list(img_size), "views": views, "seed": seed,
+                "backbone": "mobilenet_v2_imagenet_frozen"}
+    return hashlib.sha1(json.dumps(manifest).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_bottleneck_features(backbone: Model, key: str, labels: List[int], view_dataset: Callable[[int], tf.data.Dataset],
+                              cache_dir: str, views: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pooled backbone features of every image, computed once and memory-mapped
+    from cache_dir afterwards.
+
+    - key: manifest key of the images, labels and views (names the cache files)
+    - view_dataset: view -> the images in order, batched; view 0 plain, others augmented
+    - views: extra augmented copies of the set; rows [0, N) are the plain images,
+      rows [k * N, (k + 1) * N) the k-th augmented view
+    Returns (features (N * (views + 1), dim) memmap, labels).
+    """
+    features_path = os.path.join(cache_dir, f"features_{key}.npy")
+    labels_path = os.path.join(cache_dir, f"labels_{key}.npy")
+    if os.path.isfile(features_path) and os.path.isfile(labels_path):
+        print(f"Using cached bottleneck features {features_path}")
+        return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    started = time.perf_counter()
+    partial_path = features_path + ".partial"
+    features = np.lib.format.open_memmap(partial_path, mode="w+", dtype=np.float32,
+                                         shape=(len(labels) * (views + 1), backbone.output_shape[-1]))
+    for view in range(views + 1):
+        offset = view * len(labels)
+        for x, _ in view_dataset(view):
+            batch_features = backbone.predict_on_batch(x)
+            features[offset:offset + len(batch_features)] = batch_features
+            offset += len(batch_features)
+    features.flush()
+    del features
+
+    np.save(labels_path, np.tile(np.asarray(labels, dtype=np.float32), views + 1))
+    # The features file appears only once complete, so an interrupted run is recomputed
+    os.replace(partial_path, features_path)
+    print(f"Cached {len(labels) * (views + 1)} bottleneck features in {time.perf_counter() - started:.1f}s")
+    return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+
+def fit_head_on_features(model: Model, dataset_dir: str, img_size: Tuple[int, int], batch_size: int,
+                         val_split: float, seed: int, epochs: int, cache_dir: str, views: int = 0,
+                         store: Optional[DatasetStore] = None) -> None:
+    """
+    Frozen phase on cached features: with the backbone frozen, only the head
+    learns, so it is trained on the pooled features and copied into model.
+    Images come from store when given, otherwise from dataset_dir.
+    """
+    backbone = feature_extractor(model)
+
+    def features(subset_views: int, paths: List[str], labels: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if store is not None:
+            # paths are store ids here
+            key = store.manifest_key(paths, subset_views, seed)
+            view_dataset = lambda view: store.as_dataset(paths, batch_size, False, seed + view, augment=view > 0)
+        else:
+            key = dataset_manifest_key(paths, labels, img_size, subset_views, seed)
+            view_dataset = lambda view: make_dataset(paths, labels, img_size, batch_size, False, seed + view,
+                                                     augment=view > 0, cache=False)
+        return cache_bottleneck_features(backbone, key, labels, view_dataset, cache_dir, subset_views)
+
+    if store is not None:
+        train_ids, val_ids = store.split(val_split)
+        x_train, y_train = features(views, train_ids, list(store.labels(train_ids)))
+        x_val, y_val = features(0, val_ids, list(store.labels(val_ids)))
+    else:
+        train_paths, train_labels, val_paths, val_labels = list_split(dataset_dir, val_split)
+        x_train, y_train = features(views, train_paths, train_labels)
+        x_val, y_val = features(0, val_paths, val_labels)
+
+    head = build_head(backbone.output_shape[-1])
+    head.compile(optimizer=tf.keras.optimizers.Adam(1e-3), loss="binary_crossentropy", metrics=["accuracy", tf.keras.metrics.AUC(name="auc")])
+    started = time.perf_counter()
+    head.fit(x_train, y_train, validation_data=(x_val, y_val), batch_size=batch_size, epochs=epochs, shuffle=True,
+             callbacks=[
+                 EarlyStopping(monitor="val_accuracy", patience=3, restore_best_weights=True),
+                 ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2, verbose=1),
+             ])
+    print(f"Trained head on cached features in {time.perf_counter() - started:.1f}s")
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
+
+
+def save_frozen_head(model: Model, path: str) -> None:
+    """
+    Saves the head as a multi_head .npz while the backbone is still the frozen
+    ImageNet one, which MultiHeadPredictor shares. Fine-tuning changes the
+    backbone, so the head of the final model.h5 does not fit those features.
+    """
+    from multi_head import backbone_fingerprint, save_head, split_model  # multi_head imports this module
+
+    backbone, head = split_model(model)
+    save_head(path, head, backbone_fingerprint(backbone))
+    print(f"Saved frozen-phase head to {path}")
+
+
+def _images_per_second(batches) -> float:
+    images = 0
+    started = time.perf_counter()
+    for x, _ in batches:
+        images += len(x)
+    return images / (time.perf_counter() - started)
+
+
+def benchmark_input(dataset_dir: str, img_size: Tuple[int, int], batch_size: int, val_split: float, seed: int,
+                    cache_file: Optional[str] = None) -> None:
+    """Training-set images/sec of each pipeline, for a first epoch and a second one."""
+    train_gen, _ = make_generators(dataset_dir, img_size, batch_size, val_split, seed)
+    # DirectoryIterator loops forever; len() is the batches in one epoch
+    generator_rates = [_images_per_second(next(train_gen) for _ in range(len(train_gen))) for _ in range(2)]
+
+    train_ds, _ = make_datasets(dataset_dir, img_size, batch_size, val_split, seed, cache_file)
+    tfdata_rates = [_images_per_second(train_ds) for _ in range(2)]
+
+    # Decode, resize and cache alone, to tell input cost from augmentation cost
+    train_paths, train_labels, _, _ = list_split(dataset_dir, val_split)
+    plain_ds = make_dataset(train_paths, train_labels, img_size, batch_size, True, seed,
+                            cache_file + ".plain" if cache_file else None, augment=False)
+    plain_rates = [_images_per_second(plain_ds) for _ in range(2)]
+
+    print(f"{'pipeline':<28}{'epoch 1 img/s':>15}{'epoch 2 img/s':>15}")
+    print(f"{'ImageDataGenerator':<28}{generator_rates[0]:>15.1f}{generator_rates[1]:>15.1f}")
+    print(f"{'tf.data (cached)':<28}{tfdata_rates[0]:>15.1f}{tfdata_rates[1]:>15.1f}")
+    print(f"{'tf.data (no augmentation)':<28}{plain_rates[0]:>15.1f}{plain_rates[1]:>15.1f}")
+    print(f"tf.data speedup: {tfdata_rates[0] / generator_rates[0]:.1f}x epoch 1, "
+          f"{tfdata_rates[1] / generator_rates[1]:.1f}x epoch 2")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train MobileNetV2 binary classifier for clean vs polluted water")
+    parser.add_argument("--dataset_dir", type=str, default="dataset", help="Path with subfolders clean/ and polluted/")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--val_split", type=float, default=0.2)
+    parser.add_argument("--output", type=str, default="model.h5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--input_pipeline", choices=["tfdata", "generator"], default="tfdata",
+                        help="tf.data (parallel decode, cached) or the legacy ImageDataGenerator")
+    parser.add_argument("--cache_file", type=str, default=None,
+                        help="Cache decoded images in this file instead of memory (tf.data pipeline)")
+    parser.add_argument("--benchmark_input", action="store_true",
+                        help="Print images/sec of both input pipelines over two epochs and exit")
+    parser.add_argument("--bottleneck_cache", type=str, default=None,
+                        help="Train the frozen phase on backbone features cached in this directory")
+    parser.add_argument("--augmented_views", type=int, default=0,
+                        help="Augmented copies of the training set to cache features for (--bottleneck_cache)")
+    parser.add_argument("--store_dir", type=str, default=None,
+                        help="Compile --dataset_dir into a pre-resized shard store here (incrementally) and train from it")
+    parser.add_argument("--head_output", type=str, default=None,
+                        help="Also save the head after the frozen phase to this .npz, for multi_head.py --head")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset_dir):
+        raise FileNotFoundError(f"Dataset directory not found: {args.dataset_dir}")
+
+    img_size = (224, 224)
+
+    if args.benchmark_input:
+        benchmark_input(args.dataset_dir, img_size, args.batch_size, args.val_split, args.seed, args.cache_file)
+        return
+
+    store = None
+    if args.store_dir:
+        store = DatasetStore(args.store_dir, img_size)
+        stats = store.compile(args.dataset_dir)
+        print("Dataset store: " + ", ".join(f"{name} {count}" for name, count in stats.items()))
+        train_ids, val_ids = store.split(args.val_split)
+        print(f"Found {len(train_ids)} training and {len(val_ids)} validation images.")
+        train_data = store.as_dataset(train_ids, args.batch_size, True, args.seed)
+        val_data = store.as_dataset(val_ids, args.batch_size, False, args.seed)
+    elif args.input_pipeline == "generator":
+        train_data, val_data = make_generators(args.dataset_dir, img_size, args.batch_size, args.val_split, args.seed)
+    else:
+        train_data, val_data = make_datasets(args.dataset_dir, img_size, args.batch_size, args.val_split, args.seed,
+                                             args.cache_file)
 
     model = build_model(input_shape=(224, 224, 3))
     model.compile(optimizer=tf.keras.optimizers.Adam(1e-3), loss="binary_crossentropy", metrics=["accuracy", tf.keras.metrics.AUC(name="auc")])
@@ -88,14 +378,20 @@ def main():
         ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2, verbose=1),
     ]
 
-    model.fit(train_gen, validation_data=val_gen, epochs=args.epochs, callbacks=callbacks)
+    if args.bottleneck_cache:
+        fit_head_on_features(model, args.dataset_dir, img_size, args.batch_size, args.val_split, args.seed,
+                             args.epochs, args.bottleneck_cache, args.augmented_views, store)
+    else:
+        model.fit(train_data, validation_data=val_data, epochs=args.epochs, callbacks=callbacks)
+    if args.head_output:
+        save_frozen_head(model, args.head_output)
 
     # Optional light fine-tuning
     model.layers[2].trainable = True  # unfreeze MobileNetV2 base
     for layer in model.layers[2].layers[:-30]:
         layer.trainable = False
     model.compile(optimizer=tf.keras.optimizers.Adam(1e-4), loss="binary_crossentropy", metrics=["accuracy", tf.keras.metrics.AUC(name="auc")])
-    model.fit(train_gen, validation_data=val_gen, epochs=max(2, args.epochs // 3), callbacks=callbacks)
+    model.fit(train_data, validation_data=val_data, epochs=max(2, args.epochs // 3), callbacks=callbacks)
 
     model.save(args.output)
     print(f"Saved model to {args.output}")
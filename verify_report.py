@@ -3,7 +3,7 @@ import sys
 import json
 import tempfile
 import argparse
-from typing import Tuple
+from typing import Optional, Tuple
 
 from PIL import Image
 
@@ -11,16 +11,21 @@ from PIL import Image
 sys.path.append(os.path.join(os.path.dirname(__file__), "satdata_client", "satdata_client"))
 from sentinel_client import SentinelClient  # type: ignore
 
+from pollution_backend.services.image_sizes import OUTPUT_SIZES
 from predict import predict_image
 
 
-def fetch_satellite_image(lat: float, lon: float, date: str, size: Tuple[int, int]) -> Image.Image:
+def fetch_satellite_image(lat: float, lon: float, date: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
     # Build a small bbox around the point (~0.02 degrees box)
     delta = 0.02
     bbox = [lon - delta, lat - delta, lon + delta, lat + delta]
     time_interval = (date, date)
-    client = SentinelClient()
-    arr, pil_img = client.request_image(bbox, time_interval, size[1], size[0])
+    client = SentinelClient(output_sizes=OUTPUT_SIZES)
+    if size is None:
+        # Classifier input size from the backend's output size registry
+        arr, pil_img = client.request_image(bbox, time_interval, consumer="classifier")
+    else:
+        arr, pil_img = client.request_image(bbox, time_interval, size[0], size[1])
     if isinstance(pil_img, Image.Image):
         return pil_img.convert("RGB")
     return Image.fromarray(arr).convert("RGB")
@@ -50,7 +55,7 @@ def main():
     user_pred = predict_image(args.user_img, args.model)
 
     # Fetch satellite image and predict
-    sat_img = fetch_satellite_image(args.lat, args.lon, args.date, (224, 224))
+    sat_img = fetch_satellite_image(args.lat, args.lon, args.date)
     with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
         tmp_path = tmp.name
         sat_img.save(tmp_path)